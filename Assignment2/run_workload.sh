@@ -16,6 +16,9 @@ if [ $# -gt 0 ]; then
         echo "  $0                    # 使用系统默认JDK"
         echo "  $0 [JDK名称]          # 使用指定JDK"
         echo ""
+        echo "环境变量:"
+        echo "  WORKLOADS             # 要运行的工作负载 (空格分隔), 默认为完整测试套件"
+        echo ""
         echo "可用的JDK版本:"
         ls -1 "/home/miller/zju/sp_camp/Assignment2/JDK" 2>/dev/null | grep -v install_packet | sed 's/^/  /'
         echo ""
@@ -57,8 +60,13 @@ else
     echo "使用系统默认JDK"
 fi
 
-# 要运行的 workload 列表
-workloads=("derby")
+# 要运行的 workload 列表, 默认为完整的 SPECjvm2008 测试套件 (不含 startup.*),
+# 可通过环境变量覆盖, 例如: WORKLOADS="derby compress" ./run_workload.sh
+default_workloads="compiler.compiler compiler.sunflow compress crypto.aes crypto.rsa crypto.signverify \
+derby mpegaudio scimark.fft.large scimark.lu.large scimark.sor.large scimark.sparse.large \
+scimark.fft.small scimark.lu.small scimark.sor.small scimark.sparse.small scimark.monte_carlo \
+serial sunflow xml.transform xml.validation"
+read -r -a workloads <<< "${WORKLOADS:-$default_workloads}"
 
 # 配置文件路径
 config_file="/home/miller/zju/sp_camp/Assignment2/config/path_config.properties"
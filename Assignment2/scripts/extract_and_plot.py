@@ -3,75 +3,56 @@
 
 """
 SPECjvm2008 日志数据提取和可视化工具
-从 log_compress.txt 文件中提取 iteration 数据并生成性能对比图表
+从结果库 (results_store.py 解析的 log_*.txt iteration 数据) 中读取得分并生成性能对比图表
+多工作负载运行生成综合得分图表、各工作负载相对性能图, 以及每个工作负载单独的图表
+均值/标准差只使用稳态 iteration, 自动检测并去掉 JIT 预热阶段 (steady_state.py)
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
+import argparse
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import re
 
-def find_run_directories(base_output_dir="/home/miller/zju/sp_camp/Assignment2/output"):
-    """查找所有run_*目录"""
-    base_path = Path(base_output_dir)
-    run_dirs = []
-    
-    if base_path.exists():
-        for item in base_path.iterdir():
-            if item.is_dir() and item.name.startswith('run_'):
-                run_dirs.append(item)
-    
-    return sorted(run_dirs)
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import style
+from matplotlib.figure import Figure
+import numpy as np
 
-def extract_iteration_scores(run_dir):
-    """从指定run目录中提取 iteration 得分"""
-    run_path = Path(run_dir)
-    jdk_data = {}
-    
-    print(f"处理运行目录: {run_path.name}")
-    
-    for jdk_dir in run_path.iterdir():
-        if not jdk_dir.is_dir():
-            continue
-            
-        # 查找日志文件
-        log_files = list(jdk_dir.glob("log_*.txt"))
-        if not log_files:
-            print(f"  {jdk_dir.name}: 未找到日志文件")
-            continue
-            
-        log_file = log_files[0]
-        workload_name = log_file.stem.replace('log_', '')
-        
-        with open(log_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 提取 iteration 结果
-        pattern = r'Iteration \d+ \((?:\d+s|\d+ operation)\) result: (\d+\.\d+) ops/m'
-        matches = re.findall(pattern, content)
-        
-        if matches:
-            scores = [float(score) for score in matches]
-            jdk_data[jdk_dir.name] = {
-                'scores': scores,
-                'mean': np.mean(scores),
-                'std': np.std(scores, ddof=1) if len(scores) > 1 else 0,
-                'workload': workload_name
-            }
-            print(f"  {jdk_dir.name}: {len(scores)} iterations, 均值: {np.mean(scores):.2f} ops/m")
-        else:
-            print(f"  {jdk_dir.name}: 在 {log_file.name} 中未找到iteration结果")
-    
-    return jdk_data
+from results_store import (
+    DEFAULT_OUTPUT_DIR, default_store_path, open_store, sync_store, find_run_directories,
+    load_score_matrix, print_run_matrix, run_workloads, workload_data, composite_data
+)
+from raw_results import load_invalid_results, sync_raw_results
+from steady_state import parse_warmup, steady_state_data, warmup_summary
+
+IMG_OUTPUT_DIR = "/home/miller/zju/sp_camp/Assignment2/img"
+
+# 图表参数, 任何一项变化都会使图表缓存失效
+CHART_STYLE = 'seaborn-v0_8'
+CHART_DPI = 300
+CHART_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57', '#FF9FF3']
+CHART_VERSION = 1    # 修改绘图代码时递增
+
+# 图表缓存清单, 与图片放在同一目录: {图片文件名: 缓存键}
+CHART_CACHE_FILE = '.chart_cache.json'
 
-def create_performance_chart(jdk_data, run_name, output_dir="/home/miller/zju/sp_camp/Assignment2/img"):
-    """绘制性能对比柱状图"""
+def workload_title(jdk_data):
+    """图表标题中的工作负载说明"""
+    data = next(iter(jdk_data.values()))
+    if 'workloads' in data:
+        return f"geometric mean of {len(data['workloads'])} workloads"
+    return f"{data.get('workload', 'unknown')} workload"
+
+def create_performance_chart(jdk_data, run_name, run_img_dir):
+    """绘制性能对比柱状图, 保存到 run_img_dir, 返回图片路径"""
     if not jdk_data:
         print("No data found")
-        return
+        return None
     
     # 创建输出目录
-    run_img_dir = Path(output_dir) / run_name
+    run_img_dir = Path(run_img_dir)
     run_img_dir.mkdir(parents=True, exist_ok=True)
     
     # 准备数据
@@ -79,9 +60,9 @@ def create_performance_chart(jdk_data, run_name, output_dir="/home/miller/zju/sp
     mean_scores = [data['mean'] for data in jdk_data.values()]
     std_scores = [data['std'] for data in jdk_data.values()]
     
-    # 创建图表
-    plt.style.use('seaborn-v0_8')
-    fig, ax = plt.subplots(figsize=(12, 8))
+    # 创建图表 (使用独立的 Figure 对象, 不依赖 pyplot 全局状态, 可在子进程中并行绘制)
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
     
     # 计算Y轴范围以突出差异
     min_score, max_score = min(mean_scores), max(mean_scores)
@@ -97,7 +78,7 @@ def create_performance_chart(jdk_data, run_name, output_dir="/home/miller/zju/sp
         y_max = max_score + max_std + max_score * 0.1
     
     # 绘制柱状图
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57', '#FF9FF3']
+    colors = CHART_COLORS
     bars = ax.bar(jdk_names, mean_scores, yerr=std_scores, capsize=8, 
                  color=colors[:len(jdk_names)], alpha=0.8, 
                  edgecolor='black', linewidth=1.5)
@@ -124,33 +105,30 @@ def create_performance_chart(jdk_data, run_name, output_dir="/home/miller/zju/sp
                fontweight='bold', bbox=dict(boxstyle='round,pad=0.3', 
                facecolor=color, alpha=0.7))
     
-    # 获取工作负载名称
-    workload_name = next(iter(jdk_data.values())).get('workload', 'unknown')
-    
     # 设置图表格式
-    ax.set_title(f'SPECjvm2008 Performance Comparison - {run_name}\n({workload_name} workload)', 
+    ax.set_title(f'SPECjvm2008 Performance Comparison - {run_name}\n({workload_title(jdk_data)})', 
                 fontsize=16, fontweight='bold', pad=20)
     ax.set_xlabel('JVM Implementation', fontsize=12, fontweight='bold')
     ax.set_ylabel('Performance Score (ops/m)', fontsize=12, fontweight='bold')
     ax.grid(True, alpha=0.3, linestyle='--')
     
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    for label in ax.get_xticklabels():
+        label.set(rotation=45, ha='right')
+    fig.tight_layout()
     
     # 保存图表
     output_path = run_img_dir / 'jvm_performance_comparison.png'
-    plt.savefig(output_path, dpi=300, bbox_inches='tight', facecolor='white')
-    print(f"  Chart saved to: {output_path}")
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, bbox_inches='tight', facecolor='white')
+    return output_path
 
-def create_simple_boxplot(jdk_data, run_name, output_dir="/home/miller/zju/sp_camp/Assignment2/img"):
-    """生成箱线图"""
+def create_simple_boxplot(jdk_data, run_name, run_img_dir):
+    """生成箱线图, 保存到 run_img_dir, 返回图片路径"""
     if not jdk_data:
         print("No data found for boxplot")
-        return
+        return None
     
     # 创建输出目录
-    run_img_dir = Path(output_dir) / run_name
+    run_img_dir = Path(run_img_dir)
     run_img_dir.mkdir(parents=True, exist_ok=True)
     
     # 准备数据
@@ -158,38 +136,199 @@ def create_simple_boxplot(jdk_data, run_name, output_dir="/home/miller/zju/sp_ca
     all_scores = [data['scores'] for data in jdk_data.values()]
     
     # 创建箱线图
-    plt.figure(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
     
     # 绘制箱线图
-    bp = plt.boxplot(all_scores, tick_labels=jdk_names, patch_artist=True,
-                     notch=False, showmeans=True)
+    bp = ax.boxplot(all_scores, tick_labels=jdk_names, patch_artist=True,
+                    notch=False, showmeans=True)
     
     # 设置颜色
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57', '#FF9FF3']
+    colors = CHART_COLORS
     for patch, color in zip(bp['boxes'], colors[:len(bp['boxes'])]):
         patch.set_facecolor(color)
         patch.set_alpha(0.7)
     
-    # 获取工作负载名称
-    workload_name = next(iter(jdk_data.values())).get('workload', 'unknown')
-    
     # 设置样式
-    plt.title(f'JVM Performance Distribution - {run_name}\n({workload_name} workload)', 
-              fontsize=14, fontweight='bold')
-    plt.xlabel('JVM Implementation', fontweight='bold')
-    plt.ylabel('Performance Score (ops/m)', fontweight='bold')
-    plt.grid(True, alpha=0.3)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    ax.set_title(f'JVM Performance Distribution - {run_name}\n({workload_title(jdk_data)})', 
+                 fontsize=14, fontweight='bold')
+    ax.set_xlabel('JVM Implementation', fontweight='bold')
+    ax.set_ylabel('Performance Score (ops/m)', fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    for label in ax.get_xticklabels():
+        label.set(rotation=45, ha='right')
+    fig.tight_layout()
     
     # 保存图表
     output_path = run_img_dir / 'jvm_boxplot.png'
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    print(f"  Boxplot saved to: {output_path}")
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, bbox_inches='tight')
+    return output_path
+
+def create_suite_chart(columns, run_name, run_img_dir):
+    """各工作负载及综合得分的相对性能分组柱状图 (以该工作负载上最好的 JDK 为 100%), 返回图片路径
+    
+    columns 为 [(工作负载, jdk_data)], 综合得分列的 workload 为 'composite'。
+    """
+    run_img_dir = Path(run_img_dir)
+    run_img_dir.mkdir(parents=True, exist_ok=True)
+    
+    common = next((data['workloads'] for _, jdk_data in columns for data in jdk_data.values()
+                   if 'workloads' in data), [])
+    jdks = sorted({jdk for _, jdk_data in columns for jdk in jdk_data})
+    best = [max(data['mean'] for data in jdk_data.values()) for _, jdk_data in columns]
+    
+    fig = Figure(figsize=(max(12, 1.2 * len(columns) + 4), 8))
+    ax = fig.add_subplot()
+    
+    positions = np.arange(len(columns))
+    width = 0.8 / len(jdks)
+    for index, jdk in enumerate(jdks):
+        relative = [jdk_data[jdk]['mean'] / best_score * 100 if jdk in jdk_data else np.nan
+                    for (_, jdk_data), best_score in zip(columns, best)]
+        ax.bar(positions + (index - (len(jdks) - 1) / 2) * width, relative, width,
+               label=jdk.replace('-', ' ').replace('_', ' '), color=CHART_COLORS[index % len(CHART_COLORS)],
+               alpha=0.8, edgecolor='black', linewidth=0.8)
+    
+    ax.axhline(100, color='black', linestyle='--', linewidth=1)
+    ax.set_xticks(positions, [name for name, _ in columns])
+    lowest = np.nanmin([data['mean'] / best_score * 100
+                        for (_, jdk_data), best_score in zip(columns, best) for data in jdk_data.values()])
+    ax.set_ylim(max(0, lowest - 10), 105)
+    
+    ax.set_title(f'SPECjvm2008 Relative Performance by Workload - {run_name}\n'
+                 f'(100% = best JVM per workload, composite = geometric mean of {len(common)} workloads)',
+                 fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel('Workload', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Relative Performance (%)', fontsize=12, fontweight='bold')
+    ax.grid(True, axis='y', alpha=0.3, linestyle='--')
+    ax.legend()
+    
+    for label in ax.get_xticklabels():
+        label.set(rotation=45, ha='right')
+    fig.tight_layout()
+    
+    output_path = run_img_dir / 'jvm_suite_comparison.png'
+    fig.savefig(output_path, dpi=CHART_DPI, bbox_inches='tight', facecolor='white')
+    return output_path
+
+CHARTS = {
+    'jvm_performance_comparison.png': create_performance_chart,
+    'jvm_boxplot.png': create_simple_boxplot,
+}
+
+def score_rows(jdk_data):
+    """图表数据的可哈希表示: [(jdk, workload, [score, ...])]"""
+    return [(jdk, data['workload'], [float(score) for score in data['scores']])
+            for jdk, data in jdk_data.items()]
+
+def column_rows(columns):
+    """相对性能图数据的可哈希表示"""
+    return [row for _, jdk_data in columns for row in score_rows(jdk_data)]
+
+def chart_cache_key(rows, run_name, chart_name):
+    """图表缓存键: 得分数据和绘图参数的 SHA-256"""
+    content = {
+        'run': run_name,
+        'chart': chart_name,
+        'data': rows,
+        'style': CHART_STYLE,
+        'dpi': CHART_DPI,
+        'colors': CHART_COLORS,
+        'version': CHART_VERSION,
+        'matplotlib': matplotlib.__version__,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_chart_cache(run_img_dir):
+    """读取图表缓存清单"""
+    cache_file = run_img_dir / CHART_CACHE_FILE
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_chart_cache(run_img_dir, cache):
+    """写出图表缓存清单"""
+    with open(run_img_dir / CHART_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def render_charts(charts, run_name, run_img_dir, force=False):
+    """绘制同一目录下的一组图表, charts 为 {图片文件名: (绘图函数, 数据, 缓存数据行)}
+    
+    返回 [(图片路径, 是否命中缓存)]。数据和绘图参数都没有变化且图片仍存在时直接复用, force 为 True 时总是重新绘制。
+    """
+    run_img_dir = Path(run_img_dir)
+    cache = load_chart_cache(run_img_dir)
+    results = []
+    
+    for chart_name, (create_chart, data, rows) in charts.items():
+        key = chart_cache_key(rows, run_name, chart_name)
+        output_path = run_img_dir / chart_name
+        if not force and cache.get(chart_name) == key and output_path.exists():
+            results.append((output_path, True))
+            continue
+        
+        output_path = create_chart(data, run_name, run_img_dir)
+        cache[chart_name] = key
+        results.append((output_path, False))
+    
+    save_chart_cache(run_img_dir, cache)
+    return results
+
+def chart_views(run_matrix, warmup='auto'):
+    """一次运行的绘图数据 (已去掉预热 iteration), 返回 (综合得分 jdk_data, [(工作负载, jdk_data)])
+    
+    只有一个工作负载时工作负载列表为空, 综合得分即为该工作负载的数据。
+    """
+    composite, _ = composite_data(run_matrix)
+    if composite:
+        composite = steady_state_data(composite, warmup)
+    workloads = run_workloads(run_matrix)
+    if len(workloads) <= 1:
+        return composite, []
+    return composite, [(workload, steady_state_data(workload_data(run_matrix, workload), warmup))
+                       for workload in workloads]
+
+def render_run_charts(run_matrix, run_name, force=False, warmup='auto', output_dir=IMG_OUTPUT_DIR):
+    """绘制一次运行的全部图表, 返回 [(图片路径, 是否命中缓存)]
+    
+    运行目录下为综合得分的柱状图和箱线图 (只有一个工作负载时即为该工作负载的图表);
+    有多个工作负载时另外生成相对性能分组柱状图, 并在 <工作负载>/ 子目录中生成各工作负载的图表。
+    样式只在本次绘制中生效, 串行和并行模式下每张图的绘制环境完全相同, 输出逐字节一致。
+    """
+    run_img_dir = Path(output_dir) / run_name
+    composite, workload_views = chart_views(run_matrix, warmup)
+    results = []
+    
+    with style.context(CHART_STYLE):
+        charts = {}
+        if composite:
+            rows = score_rows(composite)
+            charts.update((chart_name, (create_chart, composite, rows)) for chart_name, create_chart in CHARTS.items())
+        if workload_views:
+            columns = workload_views + ([('composite', composite)] if composite else [])
+            charts['jvm_suite_comparison.png'] = (create_suite_chart, columns, column_rows(columns))
+        results += render_charts(charts, run_name, run_img_dir, force)
+        
+        for workload, jdk_data in workload_views:
+            rows = score_rows(jdk_data)
+            charts = {chart_name: (create_chart, jdk_data, rows) for chart_name, create_chart in CHARTS.items()}
+            results += render_charts(charts, run_name, run_img_dir / workload, force)
+    
+    return results
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='SPECjvm2008 日志数据提取和可视化')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='并行绘图的进程数, 每个 run 目录一个任务 (默认: 1, 串行)')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略图表缓存, 重新绘制所有图表')
+    parser.add_argument('--warmup', type=parse_warmup, default='auto',
+                        help='预热 iteration 数: auto 自动检测 (默认), 整数表示固定去掉前 N 轮, 0 表示使用全部 iteration')
+    args = parser.parse_args()
+    
     print("=== SPECjvm2008 Log Data Analysis ===")
     print("正在查找和分析所有运行结果...")
     
@@ -206,25 +345,57 @@ def main():
         print(f"  - {run_dir.name}")
     print()
     
-    # 处理每个run目录
+    # 同步结果库, 只解析新增或变化的日志
+    store = open_store(default_store_path(DEFAULT_OUTPUT_DIR))
+    parsed, total = sync_store(store, DEFAULT_OUTPUT_DIR)
+    print(f"结果库已同步: {total} 个日志, 本次解析 {parsed} 个")
+    raw_parsed, raw_total = sync_raw_results(store, DEFAULT_OUTPUT_DIR)
+    if raw_total:
+        print(f"SPECjvm2008 raw 结果文件: {raw_total} 个, 本次解析 {raw_parsed} 个")
+    print()
+    
+    # 一次读出所有运行的 JDK × 工作负载 得分矩阵
+    matrix = load_score_matrix(store)
+    invalid = load_invalid_results(store)
+    store.close()
+    
+    tasks = []
     for run_dir in run_dirs:
         print(f"======== 分析 {run_dir.name} ========")
         
-        # 提取数据
-        jdk_data = extract_iteration_scores(run_dir)
-        
-        if not jdk_data:
+        run_matrix = matrix.get(run_dir.name)
+        if not run_matrix:
             print(f"  {run_dir.name} 中没有找到测试数据!")
             continue
         
-        # 创建图表
-        print(f"  创建性能对比柱状图...")
-        create_performance_chart(jdk_data, run_dir.name)
-        
-        print(f"  创建箱线图...")
-        create_simple_boxplot(jdk_data, run_dir.name)
+        print_run_matrix(run_dir.name, run_matrix, invalid)
+        composite, workload_views = chart_views(run_matrix, args.warmup)
+        if composite:
+            label = 'composite' if workload_views else next(iter(composite.values()))['workload']
+            print(f"  预热检测 ({label}): {warmup_summary(composite)}")
+        for workload, jdk_data in workload_views:
+            print(f"  预热检测 ({workload}): {warmup_summary(jdk_data)}")
+        tasks.append((run_matrix, run_dir.name, args.force, args.warmup))
+    
+    # 绘制图表, 每个run目录一个任务
+    print(f"\n创建性能对比柱状图和箱线图 ({len(tasks)} 个运行, {max(args.jobs, 1)} 个进程)...")
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(render_run_charts, *zip(*tasks)))
+    else:
+        results = [render_run_charts(*task) for task in tasks]
+    
+    cached_count = 0
+    for (_, run_name, _, _), charts in zip(tasks, results):
+        print(f"  {run_name}:")
+        for output_path, cached in charts:
+            cached_count += cached
+            print(f"    {'Cached' if cached else 'Saved to'}: {output_path}")
+    if cached_count:
+        print(f"  {cached_count} 张图表数据未变化, 直接复用 (使用 --force 重新绘制)")
     
     print("\n=== 所有分析完成! ===")
     print(f"结果图表保存在 img/ 目录下的各个子目录中")
+
 if __name__ == "__main__":
     main()
@@ -3,69 +3,44 @@
 
 """
 JVM性能统计显著性检验
-核心统计方法：配对t检验、ANOVA、多重比较校正
+核心统计方法：配对t检验、ANOVA、多重比较校正 (Bonferroni / Holm / Benjamini-Hochberg)
+重抽样模式：自助法置信区间 (均值比/中位数比) 和置换检验
 自动处理output中的每个run子目录，并将结果输出到Analysis中对应的子目录
+多工作负载运行在run目录下分析综合得分 (分层几何平均), 在<工作负载>子目录下分析各工作负载
+检验只使用稳态 iteration, 预热阶段由 steady_state.py 自动检测并去掉
 """
 
+import argparse
 import numpy as np
 from pathlib import Path
-import re
-from scipy.stats import ttest_rel, f_oneway, shapiro
+from scipy.stats import f_oneway, shapiro
 from datetime import datetime
-from itertools import combinations
 
-def find_run_directories(base_output_dir="/home/miller/zju/sp_camp/Assignment2/output"):
-    """查找所有run_*目录"""
-    base_path = Path(base_output_dir)
-    run_dirs = []
-    
-    if base_path.exists():
-        for item in base_path.iterdir():
-            if item.is_dir() and item.name.startswith('run_'):
-                run_dirs.append(item)
-    
-    return sorted(run_dirs)
+from pairwise_stats import pairwise_t_tests, pairwise_resampling, write_pairwise_json
 
-def extract_performance_data(run_dir):
-    """提取指定run目录中的JVM性能数据"""
-    jvm_data = {}
-    run_path = Path(run_dir)
-    
-    print(f"处理运行目录: {run_path.name}")
-    
-    for jdk_dir in run_path.iterdir():
-        if not jdk_dir.is_dir():
-            continue
-            
-        # 查找日志文件
-        log_files = list(jdk_dir.glob("log_*.txt"))
-        if not log_files:
-            print(f"  {jdk_dir.name}: 未找到日志文件")
-            continue
-            
-        log_file = log_files[0]
-        workload_name = log_file.stem.replace('log_', '')
-        
-        with open(log_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 提取iteration结果
-        pattern = r'Iteration \d+ \((?:\d+s|\d+ operation)\) result: (\d+\.\d+) ops/m'
-        matches = re.findall(pattern, content)
-        
-        if matches:
-            scores = [float(score) for score in matches]
-            jvm_data[jdk_dir.name] = {
-                'scores': scores,
-                'workload': workload_name,
-                'mean': np.mean(scores),
-                'std': np.std(scores, ddof=1) if len(scores) > 1 else 0
-            }
-            print(f"  {jdk_dir.name}: {len(scores)} iterations, 均值: {np.mean(scores):.2f} ops/m")
-        else:
-            print(f"  {jdk_dir.name}: 在 {log_file.name} 中未找到iteration结果")
-    
-    return jvm_data
+from results_store import (
+    DEFAULT_OUTPUT_DIR, default_store_path, open_store, sync_store, find_run_directories,
+    load_score_matrix, print_run_matrix, run_workloads, workload_data, composite_data
+)
+from raw_results import load_invalid_results, sync_raw_results
+from steady_state import parse_warmup, steady_state_data
+
+def describe_workload(jvm_data):
+    """报告中的工作负载说明, 综合得分列出参与计算的工作负载"""
+    data = next(iter(jvm_data.values()))
+    if 'workloads' in data:
+        return f"综合得分 (分层几何平均, {len(data['workloads'])} 个工作负载: {', '.join(data['workloads'])})"
+    return data.get('workload', 'unknown')
+
+def log_warmup(log, jvm_data):
+    """输出各JVM的预热检测结果"""
+    if 'warmup' not in next(iter(jvm_data.values())):
+        return
+    log("预热检测 (稳态之前的 iteration 不参与统计):")
+    log("-" * 40)
+    for name, data in jvm_data.items():
+        log(f"  {name}: 检测到预热 {data['warmup']} 轮, 截去 {data['excluded']} 轮, 稳态 {len(data['scores'])} 轮")
+    log()
 
 def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
     """执行统计假设检验"""
@@ -77,7 +52,7 @@ def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
         output_lines.append(text)
     
     # 基本信息
-    workload_name = next(iter(jvm_data.values())).get('workload', 'unknown')
+    workload_name = describe_workload(jvm_data)
     jvm_names = list(jvm_data.keys())
     
     log("=" * 60)
@@ -87,6 +62,8 @@ def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
     log(f"分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     log()
     
+    log_warmup(log, jvm_data)
+    
     # 1. 基本统计信息
     log("基本统计信息:")
     log("-" * 40)
@@ -117,23 +94,20 @@ def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
     log(f"  p值: {p_anova:.6f}")
     log(f"  结论: {'有显著差异' if anova_significant else '无显著差异'}")
     
-    # 4. 配对t检验（如果样本量相同）
+    # 4. 配对t检验（如果样本量相同）, 所有JVM对一次向量化计算
     sample_sizes = [len(data['scores']) for data in jvm_data.values()]
-    t_test_results = []
+    pairwise = []
     corrected_significant = []
     
     if len(set(sample_sizes)) == 1 and sample_sizes[0] > 1:
         log(f"\n配对t检验:")
         log("-" * 40)
         
-        n_comparisons = len(list(combinations(jvm_names, 2)))
+        pairwise = pairwise_t_tests(jvm_data, alpha)
+        n_comparisons = len(pairwise)
+        t_test_results = [(row['jvm1'], row['jvm2'], row['t'], row['p']) for row in pairwise]
         
-        for jvm1, jvm2 in combinations(jvm_names, 2):
-            data1, data2 = jvm_data[jvm1]['scores'], jvm_data[jvm2]['scores']
-            t_stat, p_value = ttest_rel(data1, data2)
-            
-            t_test_results.append((jvm1, jvm2, t_stat, p_value))
-            
+        for jvm1, jvm2, t_stat, p_value in t_test_results:
             significant = p_value < alpha
             status = "显著" if significant else "不显著"
             log(f"  {jvm1} vs {jvm2}: t={t_stat:.4f}, p={p_value:.6f}, {status}")
@@ -155,6 +129,15 @@ def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
             
             status = "显著" if significant else "不显著"
             log(f"    {jvm1} vs {jvm2}: p={p_value:.6f}, {status}")
+        
+        # Holm (控制FWER) 与 Benjamini-Hochberg (控制FDR) 校正
+        log(f"\nHolm / Benjamini-Hochberg 多重比较校正 (校正后p值, α={alpha}):")
+        log("-" * 40)
+        for row in pairwise:
+            holm_status = "显著" if row['significant_holm'] else "不显著"
+            bh_status = "显著" if row['significant_bh'] else "不显著"
+            log(f"  {row['jvm1']} vs {row['jvm2']}: Holm p={row['p_holm']:.6f} {holm_status}, "
+                f"BH p={row['p_bh']:.6f} {bh_status}")
     else:
         log(f"\n配对t检验: 样本量不同，无法进行")
     
@@ -187,15 +170,100 @@ def statistical_tests(jvm_data, run_name, output_file=None, alpha=0.05):
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write('\n'.join(output_lines))
         log(f"\n结果已保存到: {output_file}")
+        
+        if pairwise:
+            json_file = output_file.with_name("pairwise_tests.json")
+            write_pairwise_json(pairwise, json_file, run_name, alpha)
+            log(f"两两比较结果表已保存到: {json_file}")
     
     return {
+        'warmup': {name: data['warmup'] for name, data in jvm_data.items() if 'warmup' in data},
         'anova_significant': anova_significant,
         'corrected_significant_pairs': corrected_significant,
-        'ranking': sorted_jvms
+        'ranking': sorted_jvms,
+        'pairwise': pairwise
     }
 
+def resampling_tests(jvm_data, run_name, output_file=None, alpha=0.05, n_resamples=10000,
+                     confidence=0.95, seed=0, jobs=1):
+    """自助法置信区间和置换检验, 不依赖正态性假设"""
+    
+    output_lines = []
+    
+    def log(text=""):
+        print(text)
+        output_lines.append(text)
+    
+    workload_name = describe_workload(jvm_data)
+    
+    log("=" * 60)
+    log(f"重抽样分析结果 - {run_name}")
+    log("=" * 60)
+    log(f"工作负载: {workload_name}")
+    log(f"分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log(f"重抽样次数: {n_resamples}, 置信水平: {confidence:.0%}, 随机种子: {seed}")
+    log()
+    
+    log_warmup(log, jvm_data)
+    
+    table = pairwise_resampling(jvm_data, n_resamples, confidence, alpha, seed, jobs)
+    
+    # 1. 自助法置信区间
+    log(f"自助法置信区间 (比值 = 前者 / 后者):")
+    log("-" * 40)
+    for row in table:
+        mean_low, mean_high = row['mean_ratio_ci']
+        median_low, median_high = row['median_ratio_ci']
+        log(f"  {row['jvm1']} vs {row['jvm2']}:")
+        log(f"    均值比={row['mean_ratio']:.4f} [{mean_low:.4f}, {mean_high:.4f}]")
+        log(f"    中位数比={row['median_ratio']:.4f} [{median_low:.4f}, {median_high:.4f}]")
+    
+    # 2. 置换检验
+    log(f"\n置换检验 (均值差, 双侧, α={alpha}):")
+    log("-" * 40)
+    for row in table:
+        status = "显著" if row['significant'] else "不显著"
+        holm_status = "显著" if row['significant_holm'] else "不显著"
+        bh_status = "显著" if row['significant_bh'] else "不显著"
+        log(f"  {row['jvm1']} vs {row['jvm2']}: 均值差={row['mean_diff']:.2f}, p={row['p_permutation']:.6f} {status}, "
+            f"Holm p={row['p_holm']:.6f} {holm_status}, BH p={row['p_bh']:.6f} {bh_status}")
+    
+    # 3. 结论: 置信区间不包含 1 的JVM对
+    log(f"\n均值比置信区间不包含1的JVM对:")
+    log("-" * 40)
+    excluded = [row for row in table if row['mean_ratio_ci'][0] > 1 or row['mean_ratio_ci'][1] < 1]
+    for row in excluded:
+        log(f"  - {row['jvm1']} vs {row['jvm2']}: 均值比={row['mean_ratio']:.4f}")
+    if not excluded:
+        log(f"○ 所有JVM对的均值比置信区间均包含1")
+    
+    if output_file:
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(output_lines))
+        log(f"\n结果已保存到: {output_file}")
+        
+        json_file = output_file.with_name("resampling_tests.json")
+        write_pairwise_json(table, json_file, run_name, alpha, test='bootstrap_permutation',
+                            n_resamples=n_resamples, confidence=confidence, seed=seed)
+        log(f"重抽样结果表已保存到: {json_file}")
+    
+    return table
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='JVM性能统计假设检验分析')
+    parser.add_argument('--mode', choices=['ttest', 'resampling', 'all'], default='ttest',
+                        help='ttest: 正态性检验/ANOVA/配对t检验 (默认); resampling: 自助法置信区间和置换检验; all: 两者都做')
+    parser.add_argument('--alpha', type=float, default=0.05, help='显著性水平 (默认: 0.05)')
+    parser.add_argument('--resamples', type=int, default=10000, help='重抽样次数 (默认: 10000)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信水平 (默认: 0.95)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子, 相同种子结果可复现 (默认: 0)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='重抽样使用的进程数 (默认: 1)')
+    parser.add_argument('--warmup', type=parse_warmup, default='auto',
+                        help='预热 iteration 数: auto 自动检测 (默认), 整数表示固定去掉前 N 轮, 0 表示使用全部 iteration')
+    args = parser.parse_args()
+    
     print("JVM性能统计假设检验分析")
     print("=" * 60)
     
@@ -212,10 +280,23 @@ def main():
         print(f"  - {run_dir.name}")
     print()
     
+    # 同步结果库, 只解析新增或变化的日志
+    store = open_store(default_store_path(DEFAULT_OUTPUT_DIR))
+    parsed, total = sync_store(store, DEFAULT_OUTPUT_DIR)
+    print(f"结果库已同步: {total} 个日志, 本次解析 {parsed} 个")
+    raw_parsed, raw_total = sync_raw_results(store, DEFAULT_OUTPUT_DIR)
+    if raw_total:
+        print(f"SPECjvm2008 raw 结果文件: {raw_total} 个, 本次解析 {raw_parsed} 个")
+    
     # 创建Analysis目录
     analysis_base_dir = Path("/home/miller/zju/sp_camp/Assignment2/Analysis")
     analysis_base_dir.mkdir(parents=True, exist_ok=True)
     
+    # 一次读出所有运行的 JDK × 工作负载 得分矩阵
+    matrix = load_score_matrix(store)
+    invalid = load_invalid_results(store)
+    store.close()
+    
     # 处理每个run目录
     all_results = {}
     
@@ -224,17 +305,33 @@ def main():
         print(f"分析运行: {run_dir.name}")
         print('='*60)
         
-        # 提取数据
-        jvm_data = extract_performance_data(run_dir)
+        run_matrix = matrix.get(run_dir.name, {})
+        print_run_matrix(run_dir.name, run_matrix, invalid)
         
-        if len(jvm_data) < 2:
-            print(f"  跳过: JVM数量不足 (需要至少2个JVM)")
-            continue
+        # run目录下分析综合得分, 多个工作负载时每个工作负载另外分析
+        run_analysis_dir = analysis_base_dir / run_dir.name
+        views = [(run_analysis_dir, composite_data(run_matrix)[0])]
+        workloads = run_workloads(run_matrix)
+        if len(workloads) > 1:
+            views += [(run_analysis_dir / workload, workload_data(run_matrix, workload)) for workload in workloads]
         
-        # 执行统计检验
-        output_file = analysis_base_dir / run_dir.name / "statistical_analysis.txt"
-        results = statistical_tests(jvm_data, run_dir.name, output_file)
-        all_results[run_dir.name] = results
+        for view_dir, jvm_data in views:
+            if len(jvm_data) < 2:
+                print(f"  跳过 {view_dir.relative_to(analysis_base_dir)}: JVM数量不足 (需要至少2个JVM)")
+                continue
+            
+            # 去掉预热 iteration, 各JVM截去相同轮数以保持配对
+            jvm_data = steady_state_data(jvm_data, args.warmup, align=True, alpha=args.alpha)
+            
+            # 执行统计检验
+            if args.mode in ('ttest', 'all'):
+                results = statistical_tests(jvm_data, run_dir.name, view_dir / "statistical_analysis.txt", args.alpha)
+                if view_dir == run_analysis_dir:
+                    all_results[run_dir.name] = results
+            
+            if args.mode in ('resampling', 'all'):
+                resampling_tests(jvm_data, run_dir.name, view_dir / "resampling_analysis.txt", args.alpha,
+                                 args.resamples, args.confidence, args.seed, args.jobs)
     
     # 生成总结报告
     if all_results:
@@ -256,6 +353,8 @@ def main():
                 f"运行: {run_name}",
                 "-" * 40
             ])
+            if results['warmup']:
+                summary_lines.append("预热轮数: " + ", ".join(f"{name} {count}" for name, count in results['warmup'].items()))
             
             if results['anova_significant']:
                 summary_lines.append(" ANOVA显示JVM间存在显著差异")
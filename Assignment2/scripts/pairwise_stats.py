@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JVM 两两比较统计引擎
+把各 JVM 的得分排成矩阵, 一次向量化计算所有 JVM 对的配对t检验, 并给出多重比较校正后的 p 值
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from math import comb
+
+import numpy as np
+from scipy.stats import t as t_dist
+
+def score_matrix(jvm_data):
+    """把 {jvm: {'scores': [...]}} 转成 (JVM名称列表, k×n 得分矩阵), 要求各 JVM 样本量相同"""
+    names = list(jvm_data.keys())
+    matrix = np.array([jvm_data[name]['scores'] for name in names], dtype=float)
+    return names, matrix
+
+def paired_t_matrix(matrix):
+    """对矩阵的所有行对 (i < j) 做配对t检验
+    
+    返回 (i 下标, j 下标, 均值差, t 统计量, 双侧 p 值), 顺序与 itertools.combinations 一致。
+    与 scipy.stats.ttest_rel 相同: 差值恒定且非零时 t 为 ±inf, 完全相同时为 nan。
+    """
+    k, n = matrix.shape
+    i, j = np.triu_indices(k, 1)
+    diff = matrix[i] - matrix[j]
+    
+    mean_diff = diff.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std_err = diff.std(axis=1, ddof=1) / np.sqrt(n)
+        t_stat = mean_diff / std_err
+    p_value = 2 * t_dist.sf(np.abs(t_stat), n - 1)
+    return i, j, mean_diff, t_stat, p_value
+
+def mean_confidence_interval(scores, confidence=0.95):
+    """基于 t 分布的均值置信区间, 返回 (均值, 半宽); 样本不足两个时半宽为 inf"""
+    scores = np.asarray(scores, dtype=float)
+    n = len(scores)
+    mean = float(scores.mean()) if n else float('nan')
+    if n < 2:
+        return mean, float('inf')
+    half_width = t_dist.ppf((1 + confidence) / 2, n - 1) * scores.std(ddof=1) / np.sqrt(n)
+    return mean, float(half_width)
+
+def bonferroni_correction(p_values):
+    """Bonferroni 校正后的 p 值"""
+    p_values = np.asarray(p_values, dtype=float)
+    m = np.count_nonzero(~np.isnan(p_values))
+    return np.minimum(p_values * m, 1.0)
+
+def holm_correction(p_values):
+    """Holm 逐步下降校正后的 p 值 (控制 FWER, 比 Bonferroni 更有检验力)"""
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    
+    order = valid[np.argsort(p_values[valid], kind='stable')]
+    scaled = (m - np.arange(m)) * p_values[order]
+    adjusted[order] = np.minimum(np.maximum.accumulate(scaled), 1.0)
+    return adjusted
+
+def bh_correction(p_values):
+    """Benjamini-Hochberg 校正后的 p 值 (控制 FDR)"""
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    
+    order = valid[np.argsort(p_values[valid], kind='stable')]
+    scaled = p_values[order] * m / np.arange(1, m + 1)
+    adjusted[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return adjusted
+
+def pairwise_t_tests(jvm_data, alpha=0.05):
+    """所有 JVM 对的配对t检验结果表
+    
+    每行是一个字典: jvm1, jvm2, mean_diff, t, p 以及 Bonferroni/Holm/BH 校正后的 p 值和显著性。
+    """
+    names, matrix = score_matrix(jvm_data)
+    i, j, mean_diff, t_stat, p_value = paired_t_matrix(matrix)
+    corrections = {
+        'bonferroni': bonferroni_correction(p_value),
+        'holm': holm_correction(p_value),
+        'bh': bh_correction(p_value),
+    }
+    
+    table = []
+    for row in range(len(i)):
+        entry = {
+            'jvm1': names[i[row]],
+            'jvm2': names[j[row]],
+            'mean_diff': float(mean_diff[row]),
+            't': float(t_stat[row]),
+            'p': float(p_value[row]),
+            'significant': bool(p_value[row] < alpha),
+        }
+        for method, adjusted in corrections.items():
+            entry[f'p_{method}'] = float(adjusted[row])
+            entry[f'significant_{method}'] = bool(adjusted[row] < alpha)
+        table.append(entry)
+    return table
+
+def write_pairwise_json(table, output_file, run_name, alpha, test='paired_t', **extra):
+    """把两两比较结果表写成 JSON (nan/inf 写为 null), extra 为附加的检验参数"""
+    def clean(value):
+        if isinstance(value, list):
+            return [clean(item) for item in value]
+        if isinstance(value, float) and not np.isfinite(value):
+            return None
+        return value
+    
+    payload = {
+        'run': run_name,
+        'alpha': alpha,
+        'test': test,
+        **extra,
+        'comparisons': [{key: clean(value) for key, value in entry.items()} for entry in table],
+    }
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+# 对比数量达到该值时才启用进程池, 少量对比时进程启动开销大于计算本身
+PARALLEL_MIN_PAIRS = 8
+
+def bootstrap_ratio_ci(scores1, scores2, n_resamples, confidence, rng):
+    """自助法估计 均值比 和 中位数比 (scores1 / scores2) 的百分位置信区间
+    
+    两组分别有放回重抽样, 全部 n_resamples 次一次性向量化计算。
+    返回 {'mean': (点估计, 下限, 上限), 'median': (...)}
+    """
+    scores1 = np.asarray(scores1, dtype=float)
+    scores2 = np.asarray(scores2, dtype=float)
+    sample1 = scores1[rng.integers(0, len(scores1), size=(n_resamples, len(scores1)))]
+    sample2 = scores2[rng.integers(0, len(scores2), size=(n_resamples, len(scores2)))]
+    
+    tail = (1 - confidence) / 2 * 100
+    result = {}
+    for name, statistic in (('mean', np.mean), ('median', np.median)):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = statistic(sample1, axis=1) / statistic(sample2, axis=1)
+        point = statistic(scores1) / statistic(scores2)
+        low, high = np.nanpercentile(ratios, [tail, 100 - tail])
+        result[name] = (float(point), float(low), float(high))
+    return result
+
+def permutation_test(scores1, scores2, n_permutations, rng):
+    """均值差的双侧置换检验, 返回 (观测均值差, p 值)
+    
+    所有分组方式的数量 C(n1+n2, n1) 不超过 n_permutations 时逐一枚举, 给出精确 p 值
+    (不小于观测值的分组数 / 分组总数, 观测分组本身也计入);
+    否则随机置换 n_permutations 次, p 值按 (超过观测值的次数 + 1) / (置换次数 + 1) 计算, 不会为 0。
+    """
+    scores1 = np.asarray(scores1, dtype=float)
+    scores2 = np.asarray(scores2, dtype=float)
+    pooled = np.concatenate([scores1, scores2])
+    n1 = len(scores1)
+    n2 = len(scores2)
+    observed = scores1.mean() - scores2.mean()
+    threshold = abs(observed) - 1e-12 * max(abs(observed), 1.0)
+    
+    n_splits = comb(n1 + n2, n1)
+    if n_splits <= n_permutations:
+        groups = np.array(list(combinations(range(n1 + n2), n1)), dtype=np.intp).reshape(n_splits, n1)
+        sum1 = pooled[groups].sum(axis=1)
+        diffs = sum1 / n1 - (pooled.sum() - sum1) / n2
+        extreme = np.count_nonzero(np.abs(diffs) >= threshold)
+        return float(observed), float(extreme / n_splits)
+    
+    permuted = rng.permuted(np.broadcast_to(pooled, (n_permutations, len(pooled))), axis=1)
+    diffs = permuted[:, :n1].mean(axis=1) - permuted[:, n1:].mean(axis=1)
+    extreme = np.count_nonzero(np.abs(diffs) >= threshold)
+    return float(observed), float((extreme + 1) / (n_permutations + 1))
+
+def resample_pair(scores1, scores2, n_resamples, confidence, seed_sequence):
+    """对一对 JVM 计算自助法置信区间和置换检验 (进程池任务)"""
+    bootstrap_rng, permutation_rng = [np.random.default_rng(s) for s in seed_sequence.spawn(2)]
+    ci = bootstrap_ratio_ci(scores1, scores2, n_resamples, confidence, bootstrap_rng)
+    mean_diff, p_value = permutation_test(scores1, scores2, n_resamples, permutation_rng)
+    return ci, mean_diff, p_value
+
+def pairwise_resampling(jvm_data, n_resamples=10000, confidence=0.95, alpha=0.05, seed=0, jobs=1):
+    """所有 JVM 对的自助法置信区间 (均值比/中位数比) 和置换检验结果表
+    
+    每对使用由 seed 派生的独立随机流, 结果与 jobs 无关, 可复现。
+    置换检验 p 值另给出 Holm 和 BH 校正。
+    """
+    names = list(jvm_data.keys())
+    pairs = [(a, b) for index, a in enumerate(names) for b in names[index + 1:]]
+    seeds = np.random.SeedSequence(seed).spawn(len(pairs))
+    tasks = [(jvm_data[a]['scores'], jvm_data[b]['scores'], n_resamples, confidence, seed_sequence)
+             for (a, b), seed_sequence in zip(pairs, seeds)]
+    
+    if jobs > 1 and len(pairs) >= PARALLEL_MIN_PAIRS:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(resample_pair, *zip(*tasks)))
+    else:
+        results = [resample_pair(*task) for task in tasks]
+    
+    p_values = np.array([p_value for _, _, p_value in results])
+    holm = holm_correction(p_values)
+    bh = bh_correction(p_values)
+    
+    table = []
+    for row, ((a, b), (ci, mean_diff, p_value)) in enumerate(zip(pairs, results)):
+        table.append({
+            'jvm1': a,
+            'jvm2': b,
+            'mean_ratio': ci['mean'][0],
+            'mean_ratio_ci': [ci['mean'][1], ci['mean'][2]],
+            'median_ratio': ci['median'][0],
+            'median_ratio_ci': [ci['median'][1], ci['median'][2]],
+            'mean_diff': mean_diff,
+            'p_permutation': p_value,
+            'p_holm': float(holm[row]),
+            'p_bh': float(bh[row]),
+            'significant': bool(p_value < alpha),
+            'significant_holm': bool(holm[row] < alpha),
+            'significant_bh': bool(bh[row] < alpha),
+        })
+    return table
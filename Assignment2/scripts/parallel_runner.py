@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SPECjvm2008 多 JDK 并发测试调度
+把本机 CPU 划分为互不相交的若干组, 每个 JDK×workload 任务绑定一组 CPU 并发运行,
+支持并发上限和单任务超时; 输出目录结构和 all_jdks_summary.txt 与 run_all_jdks.sh 相同
+"""
+
+import argparse
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from results_store import DEFAULT_OUTPUT_DIR, SPECJVM2008_WORKLOADS
+from sequential_runner import (DEFAULT_CONFIG_FILE, DEFAULT_JDK_BASE_PATH, DEFAULT_SPEC_PATH,
+                               build_command, find_java_executable)
+
+# run_workload.sh 未指定 JDK 时的输出目录名
+SYSTEM_DEFAULT_LABEL = "openjdk"
+
+SCORE_PATTERN = re.compile(r'Score on (\S+): ([0-9]+(?:\.[0-9]+)? ops/m)')
+RESULT_PATTERN = re.compile(r'result:.*?([0-9]+(?:\.[0-9]+)? ops/m)')
+
+def list_jdks(jdk_base_path=DEFAULT_JDK_BASE_PATH):
+    """JDK 目录下所有可用的 JDK (排除 install_packet)"""
+    base = Path(jdk_base_path)
+    if not base.is_dir():
+        return []
+    return sorted(item.name for item in base.iterdir() if item.name != 'install_packet')
+
+def partition_cpus(cpus, parts):
+    """把 CPU 列表尽量均匀地切成 parts 组互不相交的连续区间"""
+    cpus = sorted(cpus)
+    size, extra = divmod(len(cpus), parts)
+    groups = []
+    start = 0
+    for index in range(parts):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+def format_cpu_list(cpus):
+    """把 CPU 编号写成 taskset -c 接受的列表, 如 [0, 2, 3] -> '0,2-3'"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+def extract_score(log_file, workload):
+    """按 run_workload.sh 的规则提取最终得分: 优先 "Score on", 否则取最后一个 result 行"""
+    try:
+        text = Path(log_file).read_text(errors='replace')
+    except OSError:
+        return None
+    
+    for name, score in SCORE_PATTERN.findall(text):
+        if name.rstrip(':') == workload:
+            return score
+    results = RESULT_PATTERN.findall(text)
+    return results[-1] if results else None
+
+def command_output(command):
+    """运行辅助命令并返回输出, 命令不存在时返回空串"""
+    try:
+        return subprocess.run(command, capture_output=True, text=True).stdout
+    except OSError:
+        return ''
+
+def write_jdk_header(output_file, label, java):
+    """写入单个 JDK 的 spec_results_summary.txt 头部和系统信息"""
+    lines = [f"SPECjvm2008 自动测试汇总 - JDK: {label}", f"时间: {time.strftime('%c')}", ""]
+    
+    lines.append("=== 系统信息 ===")
+    lines.append("JRE 版本:")
+    try:
+        version = subprocess.run([java, '-version'], capture_output=True, text=True)
+        lines.append((version.stderr + version.stdout).rstrip('\n'))
+    except OSError as e:
+        lines.append(str(e))
+    lines.append("")
+    
+    lines.append("操作系统:")
+    lines += [line for line in command_output(['cat', '/etc/os-release']).splitlines()
+              if line.startswith('PRETTY_NAME')]
+    lines.append("")
+    
+    lines.append("CPU 信息:")
+    lines += [line for line in command_output(['lscpu']).splitlines()
+              if re.search(r'Model name|CPU\(s\)|Thread|Core|Socket', line)]
+    lines.append("")
+    
+    lines.append("内存信息:")
+    lines += [line for line in command_output(['free', '-h']).splitlines() if 'Mem' in line]
+    lines.append("")
+    
+    with open(output_file, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+class Job:
+    """一个 JDK×workload 测试任务"""
+    
+    def __init__(self, label, java, java_home, workload, output_dir):
+        self.label = label
+        self.java = java
+        self.java_home = java_home
+        self.workload = workload
+        self.output_dir = output_dir
+        self.log_file = output_dir / f"log_{workload}.txt"
+        self.score = None
+        self.status = 'pending'
+        self.duration = 0.0
+
+def run_job(job, spec_path, config_file, iterations, timeout, cpu_slots, pin):
+    """运行单个任务: 从 cpu_slots 取一组 CPU, 经 taskset 绑定后运行 SPECjvm2008, 结束后归还"""
+    cpus = cpu_slots.get()
+    try:
+        command = build_command(job.java, job.workload, job.output_dir, iterations, config_file)
+        env = dict(os.environ)
+        if job.java_home:
+            env['JAVA_HOME'] = str(job.java_home)
+        cpu_text = ""
+        if pin:
+            # 多线程中 fork 后执行 preexec_fn 不安全, 交给 taskset 在新进程里绑定
+            cpu_list = format_cpu_list(cpus)
+            command = ['taskset', '-c', cpu_list] + command
+            cpu_text = f" (CPU {cpu_list})"
+        
+        print(f"开始: {job.label} / {job.workload}{cpu_text}")
+        sys.stdout.flush()
+        
+        start_time = time.time()
+        with open(job.log_file, 'wb') as log:
+            try:
+                process = subprocess.Popen(command, cwd=spec_path, env=env, stdout=log,
+                                           stderr=subprocess.STDOUT)
+            except OSError as e:
+                log.write(f"无法启动 {job.java}: {e}\n".encode())
+                job.status = 'failed'
+                return job
+            try:
+                process.wait(timeout=timeout)
+                job.status = 'done'
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                job.status = 'timeout'
+        job.duration = time.time() - start_time
+        
+        if job.status == 'done':
+            job.score = extract_score(job.log_file, job.workload)
+        return job
+    finally:
+        cpu_slots.put(cpus)
+
+def score_line(job, timeout):
+    """spec_results_summary.txt 中的得分行, 格式与 run_workload.sh 相同"""
+    if job.score:
+        return f"[{job.workload}] 分数: {job.score}"
+    if job.status == 'timeout':
+        return f"[{job.workload}] 分数: 超时 ({timeout:g}秒)，请检查 {job.log_file}"
+    return f"[{job.workload}] 分数: 获取失败，请检查 {job.log_file}"
+
+def run_jobs(jobs, spec_path, config_file, iterations, timeout, cpu_groups, pin, max_concurrent):
+    """并发运行所有任务
+    
+    同一 JDK 的任务依次运行: SPECjvm2008 在同一个结果目录中为每次运行编号,
+    并发写入同一目录会冲突。不同 JDK 的任务最多 max_concurrent 个同时运行。
+    """
+    cpu_slots = queue.Queue()
+    for cpus in cpu_groups:
+        cpu_slots.put(cpus)
+    
+    pending = list(jobs)
+    busy_jdks = set()
+    running = {}
+    
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= max_concurrent:
+                    break
+                if job.label in busy_jdks:
+                    continue
+                pending.remove(job)
+                busy_jdks.add(job.label)
+                future = executor.submit(run_job, job, spec_path, config_file, iterations,
+                                         timeout, cpu_slots, pin)
+                running[future] = job
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                busy_jdks.discard(job.label)
+                future.result()
+                
+                with open(job.output_dir / "spec_results_summary.txt", 'a') as f:
+                    f.write(score_line(job, timeout) + "\n\n")
+                status = {'done': '完成', 'timeout': '超时', 'failed': '失败'}[job.status]
+                print(f"{status}: {job.label} / {job.workload}, 分数: {job.score or '无'}, "
+                      f"耗时 {job.duration:.0f}秒")
+                sys.stdout.flush()
+
+def write_summary(summary_file, run_dir, labels, jobs, total_duration, timeout, start_text):
+    """写入 all_jdks_summary.txt, 格式与 run_all_jdks.sh 相同"""
+    lines = [
+        "SPECjvm2008 所有JDK基准测试总结",
+        f"测试时间: {start_text}",
+        f"运行目录: {run_dir}",
+        f"测试的JDK版本: {' '.join(labels)}",
+        "",
+    ]
+    for label in labels:
+        jdk_jobs = [job for job in jobs if job.label == label]
+        lines.append(f"=== {label} 测试结果 ===")
+        if all(job.status == 'failed' for job in jdk_jobs):
+            lines.append("错误：测试失败")
+        else:
+            lines += [score_line(job, timeout) for job in jdk_jobs]
+            lines.append(f"测试耗时: {sum(job.duration for job in jdk_jobs):.0f}秒")
+        lines.append("")
+    
+    lines.append("=== 测试总结 ===")
+    lines.append(f"总耗时: {total_duration:.0f}秒")
+    lines.append(f"测试完成时间: {time.strftime('%c')}")
+    
+    with open(summary_file, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='SPECjvm2008 多 JDK 并发基准测试 (CPU 分组绑定)')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='run_* 目录所在的 output 目录')
+    parser.add_argument('--jdk-base-path', default=DEFAULT_JDK_BASE_PATH, help='JDK 所在目录')
+    parser.add_argument('--spec-path', default=DEFAULT_SPEC_PATH, help='SPECjvm2008 安装目录')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_FILE, help='SPECjvm2008 属性文件 (-pf)')
+    parser.add_argument('--jdk', action='append', help='只测试指定的 JDK, 可重复 (默认: 全部)')
+    parser.add_argument('--java', default='java', help='系统默认 JDK 的 java 可执行文件 (默认: java)')
+    parser.add_argument('--no-system-default', action='store_true', help='不测试系统默认 JDK')
+    parser.add_argument('-w', '--workload', action='append', help='工作负载, 可重复 (默认: 完整的 SPECjvm2008 测试套件)')
+    parser.add_argument('-i', '--iterations', type=int, default=3, help='每个工作负载的迭代次数 (默认: 3)')
+    parser.add_argument('-j', '--max-concurrent', type=int, default=1, help='同时运行的任务数上限 (默认: 1)')
+    parser.add_argument('--timeout', type=float, help='单个任务的超时时间 (秒)')
+    parser.add_argument('--no-pin', action='store_true', help='不绑定 CPU')
+    args = parser.parse_args()
+    
+    if not Path(args.spec_path, "run-specjvm.sh").is_file():
+        print(f"错误：找不到 {args.spec_path}/run-specjvm.sh，请检查 spec_path 是否正确。")
+        sys.exit(1)
+    
+    targets = []
+    for jdk in args.jdk or list_jdks(args.jdk_base_path):
+        java = find_java_executable(jdk, args.jdk_base_path)
+        if java is None:
+            print(f"错误：在 {Path(args.jdk_base_path) / jdk} 中找不到java可执行文件")
+            sys.exit(1)
+        targets.append((jdk, java, Path(args.jdk_base_path) / jdk))
+    if not args.no_system_default:
+        targets.append((SYSTEM_DEFAULT_LABEL, args.java, None))
+    if not targets:
+        print(f"错误：在 {args.jdk_base_path} 中没有找到任何JDK")
+        sys.exit(1)
+    
+    pin = not args.no_pin and hasattr(os, 'sched_getaffinity')
+    if pin and shutil.which('taskset') is None:
+        print("警告：找不到 taskset, 不绑定CPU")
+        pin = False
+    max_concurrent = max(1, min(args.max_concurrent, len(targets)))
+    if pin:
+        cpus = sorted(os.sched_getaffinity(0))
+        if max_concurrent > len(cpus):
+            print(f"警告：只有 {len(cpus)} 个可用CPU, 并发数降为 {len(cpus)}")
+            max_concurrent = len(cpus)
+        cpu_groups = partition_cpus(cpus, max_concurrent)
+    else:
+        cpu_groups = [[] for _ in range(max_concurrent)]
+    
+    start_text = time.strftime('%c')
+    run_dir = Path(args.output_dir) / f"run_{time.strftime('%Y%m%d_%H%M%S')}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+    print(f"本次运行结果将保存在: {run_dir}")
+    
+    workloads = args.workload or SPECJVM2008_WORKLOADS
+    jobs = []
+    for label, java, java_home in targets:
+        output_dir = (run_dir / label).resolve()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        write_jdk_header(output_dir / "spec_results_summary.txt", label, java)
+        jobs += [Job(label, java, java_home, workload, output_dir) for workload in workloads]
+    
+    print("==========================================")
+    print("SPECjvm2008 并发基准测试")
+    print("==========================================")
+    print(f"JDK: {len(targets)} 个, 工作负载: {' '.join(workloads)}, 任务: {len(jobs)} 个")
+    print(f"并发数: {max_concurrent}")
+    if pin:
+        for index, group in enumerate(cpu_groups):
+            print(f"  CPU 组 {index}: {','.join(map(str, group))}")
+    print("")
+    
+    start_time = time.time()
+    run_jobs(jobs, args.spec_path, args.config, args.iterations, args.timeout,
+             cpu_groups, pin, max_concurrent)
+    total_duration = time.time() - start_time
+    
+    summary_file = run_dir / "all_jdks_summary.txt"
+    labels = [label for label, _, _ in targets]
+    write_summary(summary_file, run_dir, labels, jobs, total_duration, args.timeout, start_text)
+    
+    print("")
+    print("==========================================")
+    print("所有测试完成!")
+    print("==========================================")
+    print(f"总耗时: {total_duration:.0f}秒")
+    print(f"本次运行目录: {run_dir}")
+    print(f"结果汇总文件: {summary_file}")
+
+if __name__ == "__main__":
+    main()
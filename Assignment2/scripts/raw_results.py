@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SPECjvm2008 原始结果 (raw XML) 导入
+SPECjvm2008 在 -Dspecjvm.result.dir 下为每次运行生成 SPECjvm2008.NNN/SPECjvm2008.NNN.raw,
+其中包含每轮 iteration 的操作数与起止时间、JVM/系统信息以及错误和违规信息。
+用 iterparse 流式解析 (处理完的元素立即清除, 内存占用与文件大小无关), 写入结果库:
+每个得分都关联其 JVM 配置和有效性标记, 之后可直接按配置筛选, 无需重新读取原始文件
+"""
+
+import argparse
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from results_store import DEFAULT_OUTPUT_DIR, STORE_FILE_NAME, default_store_path, find_run_directories, open_store
+
+RAW_FILE_PATTERN = "SPECjvm2008.*/SPECjvm2008.*.raw"
+
+# raw 文件中的元素和属性名, 与 SPECjvm2008 harness 的写出代码一致
+# (spec/harness/Constants.java 与 results/SuiteResult、BenchmarkResult、IterationResult 的 toXml)
+BENCHMARK_TAG = 'benchmark-result'
+WARMUP_TAG = 'warmup-result'
+ITERATION_TAG = 'iteration-result'
+ERROR_TAGS = ('error', 'violation')
+ITERATION_ATTRIBUTE = 'iteration'
+START_TIME_ATTRIBUTE = 'startTime'
+END_TIME_ATTRIBUTE = 'endTime'
+OPERATIONS_ATTRIBUTE = 'operations'
+
+# 记录为 JVM 配置的头部区段, 每个属性写成以属性名命名的子元素, 例如
+# <jvm-info><spec.jvm2008.report.jvm.name>...</spec.jvm2008.report.jvm.name></jvm-info>
+# run-info (运行日期、测试人员等) 每次运行都不同, 不属于 JVM 配置
+CONFIG_SECTIONS = ('jvm-info', 'sw-info', 'hw-info')
+JVM_NAME_PROPERTY = 'spec.jvm2008.report.jvm.name'
+JVM_VERSION_PROPERTY = 'spec.jvm2008.report.jvm.version'
+JVM_VENDOR_PROPERTY = 'spec.jvm2008.report.jvm.vendor'
+
+def local_name(tag):
+    """去掉命名空间后的元素名"""
+    return tag.rsplit('}', 1)[-1]
+
+def iteration_score(attributes):
+    """iteration 得分 (ops/m), 与 IterationResult.getScore 相同: 操作数 * 60000 / 耗时 (毫秒)"""
+    try:
+        operations = float(attributes[OPERATIONS_ATTRIBUTE])
+        elapsed = float(attributes[END_TIME_ATTRIBUTE]) - float(attributes[START_TIME_ATTRIBUTE])
+    except (KeyError, ValueError):
+        return None
+    return operations * 60000 / elapsed if elapsed > 0 else None
+
+def parse_raw_file(raw_file):
+    """流式解析一个 raw 文件
+    
+    返回 {'properties': {name: value}, 'errors': [run 级错误],
+          'benchmarks': {workload: {'errors': [...], 'iterations': [(iteration, score, operations, elapsed_ms)]}}}
+    warmup-result 中的 iteration 不计入得分, 但其中的错误同样使该 workload 无效 (与 BenchmarkResult.isValid 一致)。
+    """
+    properties = {}
+    errors = []
+    benchmarks = {}
+    benchmark = None
+    section = None
+    in_warmup = False
+    depth = 0
+    root = None
+    
+    for event, elem in ET.iterparse(raw_file, events=('start', 'end')):
+        tag = local_name(elem.tag)
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+            if tag == BENCHMARK_TAG:
+                benchmark = benchmarks.setdefault(elem.get('name', 'unknown'), {'errors': [], 'iterations': []})
+            elif tag == WARMUP_TAG:
+                in_warmup = True
+            elif tag in CONFIG_SECTIONS and benchmark is None:
+                section = tag
+            continue
+        
+        depth -= 1
+        if tag == ITERATION_TAG and benchmark is not None:
+            if not in_warmup:
+                score = iteration_score(elem.attrib)
+                if score is not None:
+                    elapsed = float(elem.get(END_TIME_ATTRIBUTE)) - float(elem.get(START_TIME_ATTRIBUTE))
+                    operations = float(elem.get(OPERATIONS_ATTRIBUTE))
+                    iteration = int(elem.get(ITERATION_ATTRIBUTE, len(benchmark['iterations']) + 1))
+                    benchmark['iterations'].append((iteration, score, operations, elapsed))
+        elif section is not None:
+            if tag == section:
+                section = None
+            else:
+                properties[tag] = (elem.text or '').strip()
+        elif tag in ERROR_TAGS:
+            message = (elem.text or tag).strip()
+            (benchmark['errors'] if benchmark is not None else errors).append(message)
+        elif tag == WARMUP_TAG:
+            in_warmup = False
+        elif tag == BENCHMARK_TAG:
+            benchmark = None
+        
+        # 已处理的元素立即释放; 回到根元素的直接子元素结束时清空根元素, 保证内存占用恒定
+        elem.clear()
+        if depth == 1 and root is not None:
+            root.clear()
+    
+    return {'properties': properties, 'errors': errors, 'benchmarks': benchmarks}
+
+def ensure_raw_schema(conn):
+    """创建原始结果相关的表"""
+    # JVM 配置, 相同的属性集合只保存一份
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jvm_configs (
+            id INTEGER PRIMARY KEY,
+            digest TEXT NOT NULL UNIQUE,
+            vm_name TEXT,
+            vm_version TEXT,
+            vm_vendor TEXT,
+            properties TEXT NOT NULL
+        )
+    ''')
+    
+    # 已导入的 raw 文件及其有效性
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS raw_files (
+            path TEXT PRIMARY KEY,
+            run TEXT NOT NULL,
+            jdk TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            valid INTEGER NOT NULL,
+            errors TEXT NOT NULL,
+            config_id INTEGER REFERENCES jvm_configs (id)
+        )
+    ''')
+    
+    # raw 文件中每轮 iteration 的得分, 带有效性和 JVM 配置
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS raw_scores (
+            raw_path TEXT NOT NULL REFERENCES raw_files (path) ON DELETE CASCADE,
+            run TEXT NOT NULL,
+            jdk TEXT NOT NULL,
+            workload TEXT NOT NULL,
+            iteration INTEGER NOT NULL,
+            score REAL NOT NULL,
+            operations REAL,
+            elapsed_ms REAL,
+            valid INTEGER NOT NULL,
+            errors TEXT NOT NULL,
+            config_id INTEGER REFERENCES jvm_configs (id),
+            PRIMARY KEY (raw_path, workload, iteration)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_raw_scores_run ON raw_scores(run, jdk, workload)')
+    conn.commit()
+
+def store_config(conn, properties):
+    """保存 JVM 配置, 返回配置 id"""
+    text = json.dumps(properties, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    row = conn.execute('SELECT id FROM jvm_configs WHERE digest = ?', (digest,)).fetchone()
+    if row:
+        return row[0]
+    cursor = conn.execute('INSERT INTO jvm_configs (digest, vm_name, vm_version, vm_vendor, properties) '
+                          'VALUES (?, ?, ?, ?, ?)',
+                          (digest, properties.get(JVM_NAME_PROPERTY), properties.get(JVM_VERSION_PROPERTY),
+                           properties.get(JVM_VENDOR_PROPERTY), text))
+    return cursor.lastrowid
+
+def sync_raw_file(conn, raw_file, run, jdk):
+    """同步单个 raw 文件, 返回 True 表示重新解析了该文件"""
+    path = str(raw_file.resolve())
+    stat = raw_file.stat()
+    
+    row = conn.execute('SELECT mtime, size FROM raw_files WHERE path = ?', (path,)).fetchone()
+    if row and row[0] == stat.st_mtime and row[1] == stat.st_size:
+        return False
+    
+    try:
+        result = parse_raw_file(raw_file)
+    except ET.ParseError as e:
+        # 未写完或损坏的文件同样记录为无效
+        result = {'properties': {}, 'errors': [f"XML 解析失败: {e}"], 'benchmarks': {}}
+    
+    config_id = store_config(conn, result['properties'])
+    run_valid = not result['errors']
+    conn.execute('DELETE FROM raw_files WHERE path = ?', (path,))
+    conn.execute('INSERT INTO raw_files (path, run, jdk, mtime, size, valid, errors, config_id) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                 (path, run, jdk, stat.st_mtime, stat.st_size, int(run_valid),
+                  json.dumps(result['errors'], ensure_ascii=False), config_id))
+    
+    rows = []
+    for workload, benchmark in result['benchmarks'].items():
+        errors = result['errors'] + benchmark['errors']
+        for iteration, score, operations, elapsed in benchmark['iterations']:
+            rows.append((path, run, jdk, workload, iteration, score, operations, elapsed, int(not errors),
+                         json.dumps(errors, ensure_ascii=False), config_id))
+    conn.executemany('INSERT OR REPLACE INTO raw_scores (raw_path, run, jdk, workload, iteration, score, '
+                     'operations, elapsed_ms, valid, errors, config_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     rows)
+    return True
+
+def sync_raw_results(conn, base_output_dir=DEFAULT_OUTPUT_DIR):
+    """扫描 output/run_*/<JDK>/SPECjvm2008.*/ 下的 raw 文件并更新结果库, 返回 (重新解析的文件数, 文件总数)"""
+    ensure_raw_schema(conn)
+    seen = set()
+    parsed = 0
+    
+    for run_dir in find_run_directories(base_output_dir):
+        for jdk_dir in sorted(run_dir.iterdir()):
+            if not jdk_dir.is_dir():
+                continue
+            for raw_file in sorted(jdk_dir.glob(RAW_FILE_PATTERN)):
+                seen.add(str(raw_file.resolve()))
+                if sync_raw_file(conn, raw_file, run_dir.name, jdk_dir.name):
+                    parsed += 1
+    
+    # 删除已经不存在的 raw 文件对应的记录
+    base_path = str(Path(base_output_dir).resolve())
+    stale = [path for (path,) in conn.execute('SELECT path FROM raw_files')
+             if path.startswith(base_path + '/') and path not in seen]
+    conn.executemany('DELETE FROM raw_files WHERE path = ?', [(path,) for path in stale])
+    
+    conn.commit()
+    return parsed, len(seen)
+
+def load_invalid_results(conn):
+    """被 SPECjvm2008 判定为无效的结果, 返回 {(run, jdk, workload): [错误信息]}
+    
+    整个 raw 文件无效 (运行级错误或文件损坏) 时另有 workload 为 None 的条目。
+    """
+    ensure_raw_schema(conn)
+    invalid = {}
+    for run, jdk, errors in conn.execute('SELECT run, jdk, errors FROM raw_files WHERE valid = 0'):
+        invalid.setdefault((run, jdk, None), []).extend(json.loads(errors))
+    for run, jdk, workload, errors in conn.execute(
+            'SELECT DISTINCT run, jdk, workload, errors FROM raw_scores WHERE valid = 0'):
+        invalid.setdefault((run, jdk, workload), []).extend(json.loads(errors))
+    return invalid
+
+def load_raw_scores(conn, run_name=None, valid_only=True, config=None):
+    """按运行、有效性和 JVM 配置筛选 raw 得分, 返回 {run: {jdk: {workload: [score, ...]}}}
+    
+    config 为 {属性名: 值}, 例如 {'spec.jvm2008.report.jvm.version': '25.452-b09 mixed mode'},
+    只返回配置完全匹配的得分。
+    """
+    ensure_raw_schema(conn)
+    query = ('SELECT s.run, s.jdk, s.workload, s.score FROM raw_scores s '
+             'LEFT JOIN jvm_configs c ON c.id = s.config_id WHERE 1 = 1')
+    params = []
+    if run_name is not None:
+        query += ' AND s.run = ?'
+        params.append(run_name)
+    if valid_only:
+        query += ' AND s.valid = 1'
+    for name, value in (config or {}).items():
+        query += ' AND json_extract(c.properties, ?) = ?'
+        params += [f'$."{name}"', value]
+    query += ' ORDER BY s.run, s.jdk, s.workload, s.raw_path, s.iteration'
+    
+    matrix = {}
+    for run, jdk, workload, score in conn.execute(query, params):
+        matrix.setdefault(run, {}).setdefault(jdk, {}).setdefault(workload, []).append(score)
+    return matrix
+
+def main():
+    parser = argparse.ArgumentParser(description='导入 SPECjvm2008 raw 结果文件到结果库')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='run_* 目录所在的 output 目录')
+    parser.add_argument('--store', help=f'结果库路径 (默认: <output-dir>/{STORE_FILE_NAME})')
+    args = parser.parse_args()
+    
+    store_path = args.store or default_store_path(args.output_dir)
+    conn = open_store(store_path)
+    try:
+        parsed, total = sync_raw_results(conn, args.output_dir)
+        rows = conn.execute('SELECT COUNT(*) FROM raw_scores').fetchone()[0]
+        configs = conn.execute('SELECT vm_name, vm_version, COUNT(DISTINCT r.path) FROM jvm_configs c '
+                               'JOIN raw_files r ON r.config_id = c.id GROUP BY c.id ORDER BY vm_name').fetchall()
+        invalid = load_invalid_results(conn)
+    finally:
+        conn.close()
+    
+    print(f"结果库: {store_path}")
+    print(f"raw 文件: {total} 个, 本次解析 {parsed} 个")
+    print(f"iteration 记录: {rows} 条")
+    print(f"JVM 配置: {len(configs)} 种")
+    for vm_name, vm_version, count in configs:
+        print(f"  {vm_name or '未知'} {vm_version or ''}: {count} 个文件")
+    if invalid:
+        print("无效结果:")
+        for (run, jdk, workload), errors in sorted(invalid.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] or '')):
+            print(f"  {run} / {jdk} / {workload or '整个文件'}: {'; '.join(dict.fromkeys(errors))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SPECjvm2008 测试结果存储
+扫描 output/run_*/<JDK>/log_*.txt, 将每轮 iteration 得分写入 SQLite,
+只重新解析新增或内容发生变化的日志; extract_and_plot.py 和 hypothesis_testing.py 共用
+数据模型为 运行 → JDK → 工作负载 → iteration 得分 矩阵, 多个工作负载用分层几何平均计算综合得分
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_OUTPUT_DIR = "/home/miller/zju/sp_camp/Assignment2/output"
+STORE_FILE_NAME = "results.sqlite"
+
+# 直接在 bytes 上匹配, 日志按块读取, 内存占用与文件大小无关
+ITERATION_PATTERN = re.compile(rb'Iteration (\d+) \((?:\d+s|\d+ operation)\) result: (\d+\.\d+) ops/m')
+READ_CHUNK_SIZE = 1024 * 1024
+# 没有换行时最多保留的行尾长度, 远大于任何一条 iteration 结果行
+MAX_CARRY_SIZE = 64 * 1024
+
+# SPECjvm2008 完整测试套件 (不含 startup.*) 及计算综合得分时的分组, scimark.monte_carlo 同时属于两个 scimark 组
+SPECJVM2008_GROUPS = {
+    'compiler': ['compiler.compiler', 'compiler.sunflow'],
+    'compress': ['compress'],
+    'crypto': ['crypto.aes', 'crypto.rsa', 'crypto.signverify'],
+    'derby': ['derby'],
+    'mpegaudio': ['mpegaudio'],
+    'scimark.large': ['scimark.fft.large', 'scimark.lu.large', 'scimark.sor.large', 'scimark.sparse.large',
+                      'scimark.monte_carlo'],
+    'scimark.small': ['scimark.fft.small', 'scimark.lu.small', 'scimark.sor.small', 'scimark.sparse.small',
+                      'scimark.monte_carlo'],
+    'serial': ['serial'],
+    'sunflow': ['sunflow'],
+    'xml': ['xml.transform', 'xml.validation'],
+}
+SPECJVM2008_WORKLOADS = list(dict.fromkeys(workload for members in SPECJVM2008_GROUPS.values()
+                                           for workload in members))
+
+# 综合得分数据的 workload 名称
+COMPOSITE_WORKLOAD = 'composite'
+
+def default_store_path(base_output_dir=DEFAULT_OUTPUT_DIR):
+    """结果库默认放在 output 目录下"""
+    return Path(base_output_dir) / STORE_FILE_NAME
+
+def open_store(store_path):
+    """打开 (必要时创建) 结果库"""
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(store_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    
+    # 已解析的日志文件, mtime/size 用于快速判断是否变化, sha1 用于确认内容变化
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_files (
+            path TEXT PRIMARY KEY,
+            run TEXT NOT NULL,
+            jdk TEXT NOT NULL,
+            workload TEXT NOT NULL,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            sha1 TEXT NOT NULL
+        )
+    ''')
+    
+    # 每轮 iteration 的得分
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS iteration_scores (
+            log_path TEXT NOT NULL REFERENCES log_files (path) ON DELETE CASCADE,
+            run TEXT NOT NULL,
+            jdk TEXT NOT NULL,
+            workload TEXT NOT NULL,
+            iteration INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (run, jdk, workload, iteration)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_scores_log ON iteration_scores(log_path)')
+    conn.commit()
+    return conn
+
+def find_run_directories(base_output_dir=DEFAULT_OUTPUT_DIR):
+    """查找所有run_*目录"""
+    base_path = Path(base_output_dir)
+    run_dirs = []
+    
+    if base_path.exists():
+        for item in base_path.iterdir():
+            if item.is_dir() and item.name.startswith('run_'):
+                run_dirs.append(item)
+    
+    return sorted(run_dirs)
+
+def scan_log(log_file, chunk_size=READ_CHUNK_SIZE):
+    """按块扫描日志, 一次读取同时得到内容 SHA-1 和 [(iteration, score)]
+    
+    结果行不会跨行, 每块只匹配到最后一个换行为止, 剩余的半行并入下一块,
+    因此跨块边界的匹配不会丢失或重复。
+    """
+    digest = hashlib.sha1()
+    scores = []
+    carry = b''
+    
+    with open(log_file, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+            data = carry + block
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                carry = data[-MAX_CARRY_SIZE:]
+                continue
+            for iteration, score in ITERATION_PATTERN.findall(data, 0, end):
+                scores.append((int(iteration), float(score)))
+            carry = data[end:]
+    
+    for iteration, score in ITERATION_PATTERN.findall(carry):
+        scores.append((int(iteration), float(score)))
+    return digest.hexdigest(), scores
+
+def extract_scores_from_log(log_file):
+    """从单个日志文件中提取 [(iteration, score)]"""
+    return scan_log(log_file)[1]
+
+def sync_log(conn, log_file, run, jdk, workload):
+    """同步单个日志文件, 返回 True 表示重新解析了该文件"""
+    path = str(log_file.resolve())
+    stat = log_file.stat()
+    
+    row = conn.execute('SELECT mtime, size, sha1 FROM log_files WHERE path = ?', (path,)).fetchone()
+    if row and row[0] == stat.st_mtime and row[1] == stat.st_size:
+        return False
+    
+    sha1, scores = scan_log(log_file)
+    if row and row[2] == sha1:
+        # 只是被 touch 过, 内容没有变化
+        conn.execute('UPDATE log_files SET mtime = ?, size = ? WHERE path = ?',
+                     (stat.st_mtime, stat.st_size, path))
+        return False
+    
+    conn.execute('DELETE FROM log_files WHERE path = ?', (path,))
+    conn.execute('INSERT INTO log_files (path, run, jdk, workload, mtime, size, sha1) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                 (path, run, jdk, workload, stat.st_mtime, stat.st_size, sha1))
+    conn.executemany('INSERT OR REPLACE INTO iteration_scores (log_path, run, jdk, workload, iteration, score) '
+                     'VALUES (?, ?, ?, ?, ?, ?)',
+                     [(path, run, jdk, workload, iteration, score) for iteration, score in scores])
+    return True
+
+def sync_store(conn, base_output_dir=DEFAULT_OUTPUT_DIR):
+    """扫描 output 目录并更新结果库, 返回 (重新解析的日志数, 日志总数)"""
+    seen = set()
+    parsed = 0
+    
+    for run_dir in find_run_directories(base_output_dir):
+        for jdk_dir in sorted(run_dir.iterdir()):
+            if not jdk_dir.is_dir():
+                continue
+            for log_file in sorted(jdk_dir.glob("log_*.txt")):
+                workload = log_file.stem.replace('log_', '')
+                seen.add(str(log_file.resolve()))
+                if sync_log(conn, log_file, run_dir.name, jdk_dir.name, workload):
+                    parsed += 1
+    
+    # 删除已经不存在的日志对应的记录
+    base_path = str(Path(base_output_dir).resolve())
+    stale = [path for (path,) in conn.execute('SELECT path FROM log_files')
+             if path.startswith(base_path + '/') and path not in seen]
+    conn.executemany('DELETE FROM log_files WHERE path = ?', [(path,) for path in stale])
+    
+    conn.commit()
+    return parsed, len(seen)
+
+def load_score_matrix(conn, run_name=None):
+    """一次查询读出 运行 → JDK → 工作负载 → 各轮 iteration 得分 的完整矩阵
+    
+    返回 {run: {jdk: {workload: [score, ...]}}}, 各层按名称排序, 得分按 iteration 排序;
+    指定 run_name 时只读取该次运行。
+    """
+    query = 'SELECT run, jdk, workload, score FROM iteration_scores'
+    params = ()
+    if run_name is not None:
+        query += ' WHERE run = ?'
+        params = (run_name,)
+    query += ' ORDER BY run, jdk, workload, iteration'
+    
+    matrix = {}
+    for run, jdk, workload, score in conn.execute(query, params):
+        matrix.setdefault(run, {}).setdefault(jdk, {}).setdefault(workload, []).append(score)
+    return matrix
+
+def run_workloads(run_matrix):
+    """一次运行中出现过的所有工作负载, 按名称排序"""
+    return sorted({workload for workloads in run_matrix.values() for workload in workloads})
+
+def common_workloads(run_matrix):
+    """一次运行中所有 JDK 都有结果的工作负载, 按名称排序"""
+    workload_sets = [set(workloads) for workloads in run_matrix.values()]
+    return sorted(set.intersection(*workload_sets)) if workload_sets else []
+
+def summarize_scores(scores, workload):
+    """单个 JDK 在单个工作负载上的得分统计"""
+    return {
+        'scores': scores,
+        'mean': np.mean(scores),
+        'std': np.std(scores, ddof=1) if len(scores) > 1 else 0,
+        'workload': workload
+    }
+
+def workload_data(run_matrix, workload):
+    """单个工作负载的各 JDK 数据 {jdk: {'scores', 'mean', 'std', 'workload'}}"""
+    return {jdk: summarize_scores(workloads[workload], workload)
+            for jdk, workloads in run_matrix.items() if workloads.get(workload)}
+
+def workload_groups(workloads):
+    """按 SPECjvm2008 的分组归类工作负载, 返回 {组名: [工作负载]}, 表中没有的工作负载单独成组"""
+    groups = {}
+    for group, members in SPECJVM2008_GROUPS.items():
+        selected = [workload for workload in workloads if workload in members]
+        if selected:
+            groups[group] = selected
+    for workload in workloads:
+        if workload not in SPECJVM2008_WORKLOADS:
+            groups[workload] = [workload]
+    return groups
+
+def geometric_mean(values, axis=0):
+    """几何平均 (对数均值的指数)"""
+    return np.exp(np.mean(np.log(values), axis=axis))
+
+def composite_score(workload_scores):
+    """SPECjvm2008 式分层几何平均: 组内先求几何平均, 再对各组求几何平均
+    
+    workload_scores 为 {workload: 得分或得分数组}, 数组时逐元素计算。
+    """
+    groups = workload_groups(list(workload_scores))
+    group_scores = [geometric_mean(np.array([workload_scores[workload] for workload in members], dtype=float))
+                    for members in groups.values()]
+    return geometric_mean(np.array(group_scores))
+
+def composite_data(run_matrix):
+    """各 JDK 的综合得分数据, 返回 (jdk_data, 参与计算的工作负载)
+    
+    只使用所有 JDK 都有结果的工作负载, 保证综合得分可比。只有一个工作负载时直接返回该工作负载的数据;
+    否则第 i 个综合样本是各工作负载第 i 轮得分的分层几何平均 (轮数取各工作负载的最小值),
+    每个 JDK 的数据额外带有 'workloads' 键。
+    """
+    workloads = common_workloads(run_matrix)
+    if len(workloads) <= 1:
+        return (workload_data(run_matrix, workloads[0]) if workloads else {}), workloads
+    
+    jdk_data = {}
+    for jdk, scores_by_workload in run_matrix.items():
+        n = min(len(scores_by_workload[workload]) for workload in workloads)
+        series = {workload: scores_by_workload[workload][:n] for workload in workloads}
+        jdk_data[jdk] = summarize_scores([float(score) for score in composite_score(series)], COMPOSITE_WORKLOAD)
+        jdk_data[jdk]['workloads'] = workloads
+    return jdk_data, workloads
+
+def print_run_matrix(run_name, run_matrix, invalid=None):
+    """打印一次运行中每个 JDK、每个工作负载的 iteration 数和均值
+    
+    invalid 为 {(run, jdk, workload): [错误信息]} (见 raw_results.load_invalid_results), 无效结果会被标出。
+    """
+    invalid = invalid or {}
+    print(f"处理运行目录: {run_name}")
+    for jdk, scores_by_workload in run_matrix.items():
+        for workload, scores in scores_by_workload.items():
+            print(f"  {jdk} / {workload}: {len(scores)} iterations, 均值: {np.mean(scores):.2f} ops/m")
+            errors = invalid.get((run_name, jdk, workload)) or invalid.get((run_name, jdk, None))
+            if errors:
+                print(f"    ⚠ SPECjvm2008 raw 结果无效: {'; '.join(dict.fromkeys(errors))}")
+    
+    missing = [workload for workload in run_workloads(run_matrix) if workload not in common_workloads(run_matrix)]
+    if missing:
+        print(f"  以下工作负载并非所有 JDK 都有结果, 不计入综合得分: {', '.join(missing)}")
+
+def main():
+    parser = argparse.ArgumentParser(description='同步 SPECjvm2008 日志得分到结果库')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='run_* 目录所在的 output 目录')
+    parser.add_argument('--store', help=f'结果库路径 (默认: <output-dir>/{STORE_FILE_NAME})')
+    args = parser.parse_args()
+    
+    store_path = args.store or default_store_path(args.output_dir)
+    conn = open_store(store_path)
+    try:
+        parsed, total = sync_store(conn, args.output_dir)
+        rows = conn.execute('SELECT COUNT(*) FROM iteration_scores').fetchone()[0]
+    finally:
+        conn.close()
+    
+    print(f"结果库: {store_path}")
+    print(f"日志文件: {total} 个, 本次解析 {parsed} 个")
+    print(f"iteration 记录: {rows} 条")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SPECjvm2008 序贯测试驱动
+以最大迭代次数启动 SPECjvm2008, 边运行边解析 "Iteration N ... result" 行,
+当稳态部分 (去掉预热 iteration) 均值置信区间的相对半宽达到目标时提前结束, 节省不必要的迭代
+日志写入 <output-dir>/log_<workload>.txt, 与 run_workload.sh 的目录结构一致, 可直接被 results_store.py 读取
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from pairwise_stats import mean_confidence_interval
+from results_store import ITERATION_PATTERN
+from steady_state import parse_warmup, warmup_count
+
+DEFAULT_SPEC_PATH = "/home/miller/zju/sp_camp/SPEC/SPECjvm2008"
+DEFAULT_CONFIG_FILE = "/home/miller/zju/sp_camp/Assignment2/config/path_config.properties"
+DEFAULT_JDK_BASE_PATH = "/home/miller/zju/sp_camp/Assignment2/JDK"
+
+def find_java_executable(jdk_name, jdk_base_path=DEFAULT_JDK_BASE_PATH):
+    """按 run_workload.sh 的规则查找 JDK 中的 java 可执行文件"""
+    java_home = Path(jdk_base_path) / jdk_name
+    for candidate in (java_home / "bin" / "java", java_home / "jre" / "bin" / "java"):
+        if candidate.is_file():
+            return str(candidate)
+    return None
+
+def build_command(java, workload, result_dir, max_iterations, config_file=None, jvm_args=()):
+    """构造 SPECjvm2008 命令行"""
+    command = [java, *jvm_args, '-jar', 'SPECjvm2008.jar', f'-Dspecjvm.result.dir={result_dir}']
+    if config_file:
+        command += ['-pf', str(config_file)]
+    command += ['-i', str(max_iterations), workload]
+    return command
+
+def relative_ci_half_width(scores, confidence=0.95):
+    """均值置信区间半宽与均值之比, 样本不足两个时为 inf"""
+    mean, half_width = mean_confidence_interval(scores, confidence)
+    return half_width / mean if mean > 0 else float('inf')
+
+def steady_scores(scores, warmup='auto'):
+    """去掉预热 iteration 后的得分, 与 hypothesis_testing.py 分析的稳态数据一致"""
+    return scores[warmup_count(scores, warmup):]
+
+def stop_reason(scores, min_iterations, max_iterations, target_width, confidence, warmup='auto'):
+    """判断是否可以停止, 返回停止原因或 None
+    
+    置信区间只用稳态部分计算, 稳态 iteration 达到 min_iterations 轮后才能提前停止。
+    """
+    if len(scores) >= max_iterations:
+        return 'budget'
+    steady = steady_scores(scores, warmup)
+    if len(steady) >= min_iterations and relative_ci_half_width(steady, confidence) <= target_width:
+        return 'converged'
+    return None
+
+def terminate(process, grace_seconds=10):
+    """先 SIGTERM, 超时后 SIGKILL"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def run_sequential(command, cwd, log_file, min_iterations, max_iterations, target_width,
+                   confidence=0.95, max_seconds=None, warmup='auto'):
+    """运行一次序贯测试, 返回 (得分列表, 停止原因)
+    
+    得分列表包含全部 iteration; 停止规则按 warmup 去掉预热 iteration 后再计算置信区间。
+    停止原因: converged (置信区间达标), budget (用完最大迭代次数),
+    timeout (超过最长运行时间), exited (进程自行退出)。
+    """
+    scores = []
+    reason = None
+    timed_out = threading.Event()
+    
+    with open(log_file, 'wb') as log:
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        
+        timer = None
+        if max_seconds:
+            def on_timeout():
+                timed_out.set()
+                terminate(process)
+            timer = threading.Timer(max_seconds, on_timeout)
+            timer.daemon = True
+            timer.start()
+        
+        try:
+            for line in process.stdout:
+                log.write(line)
+                match = ITERATION_PATTERN.search(line)
+                if not match:
+                    continue
+                
+                scores.append(float(match.group(2)))
+                steady = steady_scores(scores, warmup)
+                width = relative_ci_half_width(steady, confidence)
+                print(f"  Iteration {match.group(1).decode()}: {scores[-1]:.2f} ops/m, "
+                      f"预热 {len(scores) - len(steady)} 轮, 稳态均值 {np.mean(steady):.2f}, "
+                      f"置信区间相对半宽 {width:.2%}")
+                sys.stdout.flush()
+                
+                reason = stop_reason(scores, min_iterations, max_iterations, target_width, confidence, warmup)
+                if reason:
+                    log.flush()
+                    terminate(process)
+                    break
+        finally:
+            if timer:
+                timer.cancel()
+            terminate(process)
+            process.stdout.close()
+    
+    if reason is None:
+        reason = 'timeout' if timed_out.is_set() else 'exited'
+    return scores, reason
+
+def main():
+    parser = argparse.ArgumentParser(description='SPECjvm2008 序贯测试: 置信区间达标后提前停止迭代')
+    parser.add_argument('workload', help='工作负载名称, 例如 derby')
+    parser.add_argument('output_dir', help='结果目录, 日志写入 <output_dir>/log_<workload>.txt')
+    parser.add_argument('--jdk', help='JDK 目录名 (位于 JDK 目录下), 未指定时使用 --java')
+    parser.add_argument('--java', default='java', help='java 可执行文件 (默认: java, 可指向测试用的桩程序)')
+    parser.add_argument('--jdk-base-path', default=DEFAULT_JDK_BASE_PATH, help='JDK 所在目录')
+    parser.add_argument('--spec-path', default=DEFAULT_SPEC_PATH, help='SPECjvm2008 安装目录')
+    parser.add_argument('--config', default=DEFAULT_CONFIG_FILE, help='SPECjvm2008 属性文件 (-pf)')
+    parser.add_argument('--min-iterations', type=int, default=3, help='提前停止前至少需要的稳态 (预热之后) 迭代次数 (默认: 3)')
+    parser.add_argument('--max-iterations', type=int, default=20, help='最多迭代次数 (默认: 20)')
+    parser.add_argument('--target-width', type=float, default=0.02,
+                        help='置信区间相对半宽目标, 0.02 表示均值的 ±2%% (默认: 0.02)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信水平 (默认: 0.95)')
+    parser.add_argument('--max-seconds', type=float, help='最长运行时间 (秒)')
+    parser.add_argument('--warmup', type=parse_warmup, default='auto',
+                        help='预热 iteration 数: auto 自动检测 (默认), 整数表示固定去掉前 N 轮, '
+                             '0 表示使用全部 iteration; 停止规则只用其余 iteration 计算置信区间')
+    parser.add_argument('--jvm-arg', action='append', default=[], help='额外的 JVM 参数, 可重复')
+    args = parser.parse_args()
+    
+    java = args.java
+    if args.jdk:
+        java = find_java_executable(args.jdk, args.jdk_base_path)
+        if java is None:
+            print(f"错误：在 {Path(args.jdk_base_path) / args.jdk} 中找不到java可执行文件")
+            sys.exit(1)
+    
+    output_dir = Path(args.output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    log_file = output_dir / f"log_{args.workload}.txt"
+    
+    command = build_command(java, args.workload, output_dir, args.max_iterations,
+                            args.config, args.jvm_arg)
+    print(f"=== 序贯测试: {args.workload} ===")
+    print(f"命令: {' '.join(command)}")
+    print(f"停止条件: {args.confidence:.0%} 置信区间相对半宽 <= {args.target_width:.2%}, "
+          f"迭代 {args.min_iterations}~{args.max_iterations} 次")
+    
+    start_time = time.time()
+    try:
+        scores, reason = run_sequential(command, args.spec_path, log_file, args.min_iterations,
+                                        args.max_iterations, args.target_width, args.confidence,
+                                        args.max_seconds, args.warmup)
+    except OSError as e:
+        print(f"错误：无法启动 {java}: {e}")
+        sys.exit(1)
+    elapsed = time.time() - start_time
+    
+    reasons = {
+        'converged': '置信区间达到目标',
+        'budget': '达到最大迭代次数',
+        'timeout': '超过最长运行时间',
+        'exited': '进程已退出',
+    }
+    print()
+    print(f"停止原因: {reasons[reason]}")
+    print(f"完成迭代: {len(scores)} 次, 耗时 {elapsed:.1f} 秒")
+    if scores:
+        steady = steady_scores(scores, args.warmup)
+        print(f"预热: {len(scores) - len(steady)} 轮, 稳态均值: {np.mean(steady):.2f} ops/m, "
+              f"置信区间相对半宽: {relative_ci_half_width(steady, args.confidence):.2%}")
+    print(f"日志: {log_file}")
+    
+    if not scores:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+预热 (warm-up) / 稳态检测
+JIT 预热使前几轮 iteration 系统性偏慢, 直接平均会拉低均值、放大标准差。
+按 iteration 顺序检测预热段, 只用稳态部分计算均值/标准差和做统计检验
+"""
+
+import argparse
+
+import numpy as np
+from scipy.stats import t as t_dist
+
+from results_store import summarize_scores
+
+# 稳态部分至少保留的 iteration 数 (计算标准差需要至少 2 个)
+MIN_STEADY_ITERATIONS = 2
+# 预热段最多占整个序列的比例
+MAX_WARMUP_FRACTION = 0.5
+
+def detect_warmup(scores, alpha=0.05, max_fraction=MAX_WARMUP_FRACTION):
+    """检测预热段长度 (被截去的前几轮 iteration 数)
+    
+    1. 变点位置: MSER 规则, 在 k ≤ n·max_fraction 中选使 Σ(x[k:] - 均值)² / (n-k)² 最小的截断点 k,
+       预热段末尾不低于稳态均值的 iteration 不算预热;
+    2. 显著性: 前 k 轮均值必须显著低于稳态均值 (以稳态部分的方差做单侧 t 检验, 水平 alpha),
+       否则认为没有预热, 避免把随机波动当成预热截掉。
+    """
+    x = np.asarray(scores, dtype=float)
+    n = len(x)
+    max_k = min(int(n * max_fraction), n - MIN_STEADY_ITERATIONS)
+    if max_k <= 0:
+        return 0
+    
+    # 各截断点之后的和与平方和, 一次向量化得到所有候选 k 的 MSER 统计量
+    k = np.arange(max_k + 1)
+    m = n - k
+    suffix_sum = np.cumsum(x[::-1])[::-1][k]
+    suffix_sq = np.cumsum((x * x)[::-1])[::-1][k]
+    steady_mean = suffix_sum / m
+    sse = np.maximum(suffix_sq - m * steady_mean ** 2, 0)
+    best = int(np.argmin(sse / m ** 2))
+    
+    # 预热段末尾不低于稳态均值的 iteration (偏高的离群值) 不算预热, 归还给稳态部分
+    while best > 0 and x[best - 1] >= x[best:].mean():
+        best -= 1
+    if best == 0:
+        return 0
+    
+    steady = x[best:]
+    std = np.std(steady, ddof=1)
+    margin = t_dist.ppf(1 - alpha, len(steady) - 1) * std * np.sqrt(1 / best + 1 / len(steady))
+    return best if x[:best].mean() < steady.mean() - margin else 0
+
+def parse_warmup(value):
+    """命令行 --warmup 参数 (argparse type): auto 表示自动检测, 整数表示固定截去的轮数"""
+    if value == 'auto':
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"应为 auto 或非负整数: {value}")
+    return count
+
+def warmup_count(scores, warmup='auto', alpha=0.05):
+    """单个序列的预热轮数: warmup 为 'auto' 时自动检测, 为整数时固定截去该轮数 (至少保留 MIN_STEADY_ITERATIONS 轮)"""
+    if warmup == 'auto':
+        return detect_warmup(scores, alpha)
+    return min(warmup, max(len(scores) - MIN_STEADY_ITERATIONS, 0))
+
+def steady_state_data(jdk_data, warmup='auto', align=False, alpha=0.05):
+    """去掉预热 iteration 后的 jdk_data, 每个 JDK 的均值/标准差按稳态部分重新计算
+    
+    warmup 为 'auto' 时逐个 JDK 检测, 为整数时固定截去该轮数 (至少保留 MIN_STEADY_ITERATIONS 轮)。
+    align 为 True 时所有 JDK 截去相同的轮数 (检测结果的最大值), 各 JDK 的 iteration 仍一一对应,
+    供配对检验使用。每个 JDK 的数据增加 'warmup' (检测到的预热轮数) 和 'excluded' (实际截去的轮数)。
+    """
+    detected = {jdk: warmup_count(data['scores'], warmup, alpha) for jdk, data in jdk_data.items()}
+    
+    common = max(detected.values(), default=0)
+    result = {}
+    for jdk, data in jdk_data.items():
+        excluded = common if align else detected[jdk]
+        excluded = min(excluded, max(len(data['scores']) - MIN_STEADY_ITERATIONS, 0))
+        steady = summarize_scores(data['scores'][excluded:], data['workload'])
+        steady.update({key: value for key, value in data.items() if key not in steady})
+        steady['warmup'] = detected[jdk]
+        steady['excluded'] = excluded
+        result[jdk] = steady
+    return result
+
+def warmup_summary(jdk_data):
+    """一行预热检测结果: "jdk: 预热 k 轮 (截去 e 轮), ..." """
+    parts = []
+    for jdk, data in jdk_data.items():
+        text = f"{jdk} {data['warmup']} 轮"
+        if data['excluded'] != data['warmup']:
+            text += f" (截去 {data['excluded']} 轮)"
+        parts.append(text)
+    return ', '.join(parts)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+"""测试直接导入 scripts 目录下的模块"""
+
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+sys.path.insert(0, str(SCRIPTS_DIR))
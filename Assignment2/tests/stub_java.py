@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试用的 java 桩程序: 接受 SPECjvm2008 的命令行, 按 -i 指定的次数输出 iteration 结果行
+得分取自环境变量 STUB_JAVA_SCORES (逗号分隔, 循环使用), 可通过 sequential_runner.py --java 指定
+"""
+
+import os
+import sys
+import time
+
+DEFAULT_SCORES = "100.10,101.50,99.80,100.40,100.90,100.20"
+
+def main():
+    args = sys.argv[1:]
+    iterations = int(args[args.index('-i') + 1]) if '-i' in args else 1
+    scores = [float(score) for score in os.environ.get('STUB_JAVA_SCORES', DEFAULT_SCORES).split(',')]
+    delay = float(os.environ.get('STUB_JAVA_DELAY', '0'))
+    
+    print(f"SPECjvm2008 stub: {' '.join(args)}", flush=True)
+    for iteration in range(1, iterations + 1):
+        time.sleep(delay)
+        score = scores[(iteration - 1) % len(scores)]
+        print(f"Iteration {iteration} (240s) result: {score:.2f} ops/m", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+"""pairwise_stats.py: 置换检验"""
+
+import numpy as np
+import pytest
+
+from pairwise_stats import permutation_test
+
+def test_exact_permutation_p_value():
+    # C(6, 3) = 20 种分组, 只有观测分组和对调后的分组 |均值差| >= 3
+    observed, p_value = permutation_test([1, 2, 3], [4, 5, 6], 10000, np.random.default_rng(0))
+    assert observed == pytest.approx(-3.0)
+    assert p_value == pytest.approx(2 / 20)
+
+def test_exact_p_value_does_not_depend_on_rng():
+    results = {permutation_test([10, 12, 11, 13], [9, 8, 12], 1000, np.random.default_rng(seed))
+               for seed in range(5)}
+    assert len(results) == 1
+
+def test_random_permutations_when_splits_exceed_budget():
+    # 分组数 20 > 置换次数 10, 使用随机置换, p 值不会为 0
+    observed, p_value = permutation_test([1, 2, 3], [4, 5, 6], 10, np.random.default_rng(0))
+    assert 1 / 11 <= p_value <= 1
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+"""parallel_runner.py: CPU 划分与 taskset 列表"""
+
+from parallel_runner import format_cpu_list, partition_cpus
+
+def test_partition_cpus_disjoint():
+    assert partition_cpus([3, 0, 1, 2, 4], 2) == [[0, 1, 2], [3, 4]]
+
+def test_format_cpu_list():
+    assert format_cpu_list([0, 2, 3]) == '0,2-3'
+    assert format_cpu_list([5]) == '5'
+    assert format_cpu_list([4, 5, 6, 7, 9, 10]) == '4-7,9-10'
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""raw_results.py: 按 SPECjvm2008 harness 的写出格式解析 raw 文件"""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from raw_results import load_invalid_results, load_raw_scores, parse_raw_file, sync_raw_file, ensure_raw_schema
+
+RAW_FILE = Path(__file__).resolve().parent / 'fixtures' / 'SPECjvm2008.001.raw'
+
+def test_iteration_scores_from_start_end_operations():
+    result = parse_raw_file(RAW_FILE)
+    iterations = result['benchmarks']['compress']['iterations']
+    # 1000 ops / 240 s 与 1200 ops / 240 s
+    assert [(i, score) for i, score, _, _ in iterations] == [(1, pytest.approx(250.0)), (2, pytest.approx(300.0))]
+    assert iterations[0][2:] == (1000.0, 240000.0)
+
+def test_warmup_iterations_are_skipped():
+    result = parse_raw_file(RAW_FILE)
+    assert 0 not in [i for i, *_ in result['benchmarks']['compress']['iterations']]
+
+def test_jvm_config_from_header_sections():
+    properties = parse_raw_file(RAW_FILE)['properties']
+    assert properties['spec.jvm2008.report.jvm.name'] == 'OpenJDK 64-Bit Server VM'
+    assert properties['spec.jvm2008.report.jvm.version'] == '25.452-b09 mixed mode'
+    assert properties['spec.jvm2008.report.jvm.command.line'] == '-Xmx2g -XX:+UseG1GC & more'
+    assert properties['spec.jvm2008.report.os.name'] == 'Linux'
+    # run-info 每次运行都不同, 不属于 JVM 配置
+    assert 'spec.jvm2008.report.run.date' not in properties
+
+def test_iteration_errors_mark_workload_invalid():
+    result = parse_raw_file(RAW_FILE)
+    assert result['errors'] == []
+    assert result['benchmarks']['compress']['errors'] == []
+    assert 'Validity check failed: output mismatch' in result['benchmarks']['derby']['errors']
+
+def test_sync_and_filter_by_config():
+    conn = sqlite3.connect(':memory:')
+    ensure_raw_schema(conn)
+    assert sync_raw_file(conn, RAW_FILE, 'run1', 'bisheng')
+    
+    vm_name, vm_version = conn.execute('SELECT vm_name, vm_version FROM jvm_configs').fetchone()
+    assert (vm_name, vm_version) == ('OpenJDK 64-Bit Server VM', '25.452-b09 mixed mode')
+    
+    scores = load_raw_scores(conn, 'run1', config={'spec.jvm2008.report.jvm.version': '25.452-b09 mixed mode'})
+    assert scores == {'run1': {'bisheng': {'compress': [pytest.approx(250.0), pytest.approx(300.0)]}}}
+    assert load_raw_scores(conn, 'run1', config={'spec.jvm2008.report.jvm.version': 'other'}) == {}
+    assert ('run1', 'bisheng', 'derby') in load_invalid_results(conn)
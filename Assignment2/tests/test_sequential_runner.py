@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""sequential_runner.py: 用 java 桩程序验证序贯停止规则"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy.stats import t as t_dist
+
+from pairwise_stats import mean_confidence_interval
+from sequential_runner import build_command, relative_ci_half_width, run_sequential, steady_scores
+
+STUB_JAVA = Path(__file__).resolve().parent / 'stub_java.py'
+
+def run_stub(tmp_path, monkeypatch, scores, max_iterations=20, warmup='auto'):
+    monkeypatch.setenv('STUB_JAVA_SCORES', ','.join(str(score) for score in scores))
+    command = [sys.executable] + build_command(str(STUB_JAVA), 'compress', tmp_path, max_iterations)
+    return run_sequential(command, tmp_path, tmp_path / 'log_compress.txt', min_iterations=3,
+                          max_iterations=max_iterations, target_width=0.02, warmup=warmup)
+
+def test_mean_confidence_interval_matches_t_interval():
+    scores = [100.1, 101.5, 99.8, 100.4]
+    mean, half_width = mean_confidence_interval(scores, 0.95)
+    n = len(scores)
+    expected = t_dist.ppf(0.975, n - 1) * np.std(scores, ddof=1) / n ** 0.5
+    assert mean == pytest.approx(100.45)
+    assert half_width == pytest.approx(expected)
+    assert relative_ci_half_width([100.0]) == float('inf')
+
+def test_stops_early_on_stable_series(tmp_path, monkeypatch):
+    scores, reason = run_stub(tmp_path, monkeypatch, [100.1, 101.5, 99.8, 100.4, 100.9, 100.2])
+    assert reason == 'converged'
+    assert 3 <= len(scores) < 20
+    assert relative_ci_half_width(scores) <= 0.02
+    assert b'Iteration 1 (240s) result: 100.10 ops/m' in (tmp_path / 'log_compress.txt').read_bytes()
+
+def test_runs_to_max_on_noisy_series(tmp_path, monkeypatch):
+    scores, reason = run_stub(tmp_path, monkeypatch, [50, 150, 80, 130], max_iterations=8)
+    assert reason == 'budget'
+    assert len(scores) == 8
+
+# JIT 预热: 前两轮明显偏慢, 之后稳定在 100 ops/m 左右
+WARMUP_SERIES = [60.0, 80.0] + [100.1, 99.9, 100.2, 100.0, 99.8, 100.1, 99.9, 100.2, 100.0] * 2
+
+def test_warmup_excluded_from_stop_rule(tmp_path, monkeypatch):
+    scores, reason = run_stub(tmp_path, monkeypatch, WARMUP_SERIES)
+    assert reason == 'converged'
+    # 2 轮预热 + 至少 3 轮稳态
+    assert 5 <= len(scores) < 10
+    assert steady_scores(scores) == scores[2:]
+
+def test_fixed_warmup_count(tmp_path, monkeypatch):
+    scores, reason = run_stub(tmp_path, monkeypatch, WARMUP_SERIES, warmup=2)
+    assert reason == 'converged'
+    assert len(scores) < 10
+
+def test_warmup_widens_interval_when_kept(tmp_path, monkeypatch):
+    # 不截去预热轮时, 慢的前两轮使置信区间一直达不到目标
+    scores, reason = run_stub(tmp_path, monkeypatch, WARMUP_SERIES, warmup=0)
+    assert reason == 'budget'
+    assert len(scores) == 20
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+"""steady_state.py: 预热检测与 --warmup 参数"""
+
+import argparse
+
+import pytest
+
+from steady_state import detect_warmup, parse_warmup
+
+def test_detect_warmup():
+    assert detect_warmup([60.0, 80.0, 100.2, 99.8, 100.1, 99.9, 100.0, 100.3]) == 2
+    assert detect_warmup([100.2, 99.8, 100.1, 99.9, 100.0, 100.3]) == 0
+
+def test_parse_warmup():
+    assert parse_warmup('auto') == 'auto'
+    assert parse_warmup('3') == 3
+
+@pytest.mark.parametrize('value', ['x', '-1', '1.5'])
+def test_invalid_warmup_message_reaches_user(value, capsys):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--warmup', type=parse_warmup, default='auto')
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--warmup', value])
+    assert f"argument --warmup: 应为 auto 或非负整数: {value}" in capsys.readouterr().err
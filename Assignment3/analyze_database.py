@@ -4,83 +4,306 @@
 分析SQLite数据库中的性能数据，识别热点函数和分析执行时间
 """
 
+import argparse
+import itertools
+import json
+import re
 import sqlite3
+from collections import Counter
 from pathlib import Path
 import sys
 
-def analyze_hotspots(cursor):
+from flamegraph import (folded_stacks, diff_folded, write_folded, write_flamegraph,
+                        DEFAULT_WIDTH, DEFAULT_FONT_SIZE)
+
+# 差分分析时对比数据库 ATTACH 后的 schema 名
+DIFF_SCHEMA = 'other'
+
+# JVM 线程分类, 按优先级排列: (类别, 显示名称, 线程名模式, 栈帧符号模式)
+# 线程名为内核保存的 comm, 最长 15 个字符 (如 "C2 CompilerThre")
+THREAD_CATEGORIES = [
+    ('compiler', 'JIT 编译',
+     re.compile(r'CompilerThre|^Sweeper thread|^JVMCI'),
+     re.compile(r'CompileBroker::|C2Compiler::|Compilation::Compilation|Compile::Compile')),
+    ('gc', 'GC',
+     re.compile(r'GC|^G1 |^Gang worker|^Concurrent |^Z[A-Z][a-z]|^Shenandoah'),
+     re.compile(r'GCTaskThread::|GangWorker::|WorkerThread::run|ConcurrentGCThread::|G1ParScan|'
+                r'G1Concurrent|G1CollectedHeap::|PSScavenge|PSParallelCompact|GenCollectedHeap::|'
+                r'ShenandoahHeap::|ZDriver|ZWorker')),
+    ('vm', 'VM',
+     re.compile(r'^VM |^Service Thread|^Signal Dispatch|^Finalizer|^Reference Handl|^Common-Cleaner|'
+                r'^Attach Listener|^Monitor Deflati|^Notification Th'),
+     re.compile(r'VMThread::')),
+]
+APPLICATION_CATEGORY = ('application', '应用')
+
+def symbol_stats_source(cursor, where=''):
+    """返回按 (symbol, dso) 汇总 self/inclusive 样本数的子查询
+    
+    优先读取导入时生成的 symbol_stats 表; 旧数据库没有该表时从 call_stacks 现场统计。
+    where 非空时 (作用于 perf_samples 的过滤条件) symbol_stats 不再适用, 先按 stack_id 统计
+    符合条件的样本数, 再按主键查找这些调用栈的栈帧汇总。
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    
+    if 'symbol_stats' in tables or 'stack_frames' in tables:
+        cursor.execute('PRAGMA table_info(symbols)')
+        if 'is_java' in [row[1] for row in cursor.fetchall()]:
+            is_java = 's.is_java'
+        else:
+            is_java = "instr(s.name, '::') > 0"
+    
+    if where and 'stack_frames' in tables:
+        # 同一调用栈内重复出现的 (符号, DSO) 只计一次, 与 symbol_stats 的口径一致
+        return f'''
+            SELECT s.name AS symbol, d.name AS dso, {is_java} AS is_java,
+                   SUM(CASE WHEN t.min_level = 0 THEN t.samples ELSE 0 END) AS self_samples,
+                   SUM(t.samples) AS inclusive_samples
+            FROM (
+                SELECT f.symbol_id, f.dso_id, c.samples, MIN(f.level) AS min_level
+                FROM (
+                    SELECT stack_id, COUNT(*) AS samples
+                    FROM perf_samples
+                    WHERE {where}
+                    GROUP BY stack_id
+                ) c
+                JOIN stack_frames f ON f.stack_id = c.stack_id
+                GROUP BY c.stack_id, f.symbol_id, f.dso_id
+            ) t
+            JOIN symbols s ON s.id = t.symbol_id
+            JOIN dsos d ON d.id = t.dso_id
+            GROUP BY t.symbol_id, t.dso_id
+        '''
+    if where:
+        return f'''
+            SELECT symbol, dso, instr(symbol, '::') > 0 AS is_java,
+                   SUM(level = 0) AS self_samples,
+                   COUNT(DISTINCT sample_id) AS inclusive_samples
+            FROM call_stacks
+            WHERE sample_id IN (SELECT id FROM perf_samples WHERE {where})
+            GROUP BY symbol, dso
+        '''
+    if 'symbol_stats' in tables:
+        return f'''
+            SELECT s.name AS symbol, d.name AS dso, {is_java} AS is_java,
+                   t.self_samples, t.inclusive_samples
+            FROM symbol_stats t
+            JOIN symbols s ON s.id = t.symbol_id
+            JOIN dsos d ON d.id = t.dso_id
+        '''
+    return '''
+        SELECT symbol, dso, instr(symbol, '::') > 0 AS is_java,
+               SUM(level = 0) AS self_samples,
+               COUNT(DISTINCT sample_id) AS inclusive_samples
+        FROM call_stacks
+        GROUP BY symbol, dso
+    '''
+
+def get_total_samples(cursor, where='', params=(), schema='main'):
+    """样本总数, 优先使用导入时记录的元数据, 避免对大表做 COUNT(*)
+    
+    有过滤条件时统计符合条件的样本数; schema 指定 ATTACH 的数据库。
+    """
+    if where:
+        cursor.execute(f'SELECT COUNT(*) FROM {schema}.perf_samples WHERE {where}', params)
+        return cursor.fetchone()[0]
+    
+    cursor.execute(f"SELECT value FROM {schema}.metadata WHERE key = 'sample_count'")
+    row = cursor.fetchone()
+    if row and row[0].isdigit():
+        return int(row[0])
+    cursor.execute(f'SELECT COUNT(*) FROM {schema}.perf_samples')
+    return cursor.fetchone()[0]
+
+def analyze_hotspots(cursor, stats_source, total_samples, params=()):
     """分析热点函数"""
     print(f"\n=== 热点函数分析 (Top 10) ===")
     
-    # 统计函数出现频率
-    cursor.execute('''
-        SELECT symbol, dso, COUNT(*) as count,
-               ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM call_stacks), 2) as percentage
-        FROM call_stacks 
+    # self: 函数位于栈顶的样本数; inclusive: 函数出现在调用栈中的样本数
+    cursor.execute(f'''
+        SELECT symbol, dso, self_samples, inclusive_samples
+        FROM ({stats_source})
         WHERE symbol != '' AND symbol != '[unknown]'
-        GROUP BY symbol, dso
-        ORDER BY count DESC
+        ORDER BY self_samples DESC, inclusive_samples DESC
         LIMIT 10
-    ''')
+    ''', params)
     
-    results = cursor.fetchall()
-    
-    print(f"{'排名':<4} {'函数名':<50} {'调用次数':<8} {'占比%':<8} {'DSO'}")
+    print_hotspots(cursor.fetchall(), total_samples)
+
+def print_hotspots(results, total_samples):
+    """打印热点函数表, results 为 [(symbol, dso, self_samples, inclusive_samples)]"""
+    print(f"{'排名':<4} {'函数名':<50} {'自身样本':<8} {'自身%':<8} {'累计样本':<8} {'累计%':<8} {'DSO'}")
     print("-" * 120)
     
-    for i, (symbol, dso, count, percentage) in enumerate(results, 1):
+    for i, (symbol, dso, self_samples, inclusive_samples) in enumerate(results, 1):
         # 截断过长的函数名
         short_symbol = symbol[:47] + "..." if len(symbol) > 50 else symbol
         short_dso = dso[:30] + "..." if dso and len(dso) > 30 else (dso or "")
+        self_pct = round(self_samples * 100.0 / total_samples, 2) if total_samples else 0
+        inclusive_pct = round(inclusive_samples * 100.0 / total_samples, 2) if total_samples else 0
         
-        print(f"{i:<4} {short_symbol:<50} {count:<8} {percentage:<8} {short_dso}")
+        print(f"{i:<4} {short_symbol:<50} {self_samples:<8} {self_pct:<8} "
+              f"{inclusive_samples:<8} {inclusive_pct:<8} {short_dso}")
 
-def analyze_java_hotspots(cursor):
+def analyze_java_hotspots(cursor, stats_source, total_samples, params=()):
     """分析Java热点函数"""
     print(f"\n=== Java 热点函数分析 (Top 10) ===")
     
-    cursor.execute('''
-        SELECT symbol, COUNT(*) as count,
-               ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM call_stacks), 2) as percentage
-        FROM call_stacks 
-        WHERE symbol LIKE '%L%::%' OR symbol LIKE '%::%'
+    # 同一方法极少同时出现在多个 DSO 中, 按方法名直接累加各 DSO 的样本数
+    cursor.execute(f'''
+        SELECT symbol, SUM(self_samples) AS self_samples, SUM(inclusive_samples) AS inclusive_samples
+        FROM ({stats_source})
+        WHERE is_java = 1
         GROUP BY symbol
-        ORDER BY count DESC
+        ORDER BY self_samples DESC, inclusive_samples DESC
         LIMIT 10
-    ''')
+    ''', params)
     
     results = cursor.fetchall()
     
-    print(f"{'排名':<4} {'Java方法':<60} {'调用次数':<8} {'占比%':<8}")
-    print("-" * 90)
+    print(f"{'排名':<4} {'Java方法':<60} {'自身样本':<8} {'自身%':<8} {'累计样本':<8} {'累计%':<8}")
+    print("-" * 110)
     
-    for i, (symbol, count, percentage) in enumerate(results, 1):
+    for i, (symbol, self_samples, inclusive_samples) in enumerate(results, 1):
         # 清理Java方法名显示
         clean_symbol = symbol.replace('L', '').replace(';::', '.')
         short_symbol = clean_symbol[:57] + "..." if len(clean_symbol) > 60 else clean_symbol
+        self_pct = round(self_samples * 100.0 / total_samples, 2) if total_samples else 0
+        inclusive_pct = round(inclusive_samples * 100.0 / total_samples, 2) if total_samples else 0
         
-        print(f"{i:<4} {short_symbol:<60} {count:<8} {percentage:<8}")
+        print(f"{i:<4} {short_symbol:<60} {self_samples:<8} {self_pct:<8} "
+              f"{inclusive_samples:<8} {inclusive_pct:<8}")
 
-def analyze_process_info(cursor):
+def analyze_process_info(cursor, where='', params=()):
     """分析进程信息"""
     print(f"\n=== 进程信息分析 ===")
     
-    cursor.execute('''
+    # 占比的分母用窗口函数在同一次分组结果上求和, 过滤条件只需出现一次
+    cursor.execute(f'''
         SELECT comm, COUNT(*) as samples, 
-               ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM perf_samples), 2) as percentage
+               ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as percentage
         FROM perf_samples
+        {'WHERE ' + where if where else ''}
         GROUP BY comm
         ORDER BY samples DESC
-    ''')
-    
-    results = cursor.fetchall()
+    ''', params)
     
+    print_process_info(cursor.fetchall())
+
+def print_process_info(results):
+    """打印进程信息表, results 为 [(comm, samples, percentage)]"""
     print(f"{'进程名':<20} {'样本数':<8} {'占比%':<8}")
     print("-" * 40)
     
     for comm, samples, percentage in results:
         print(f"{comm:<20} {samples:<8} {percentage:<8}")
 
+def analyze_diff(cursor, base_file, other_file, top, rank_by):
+    """差分分析: 比较两个数据库中各函数的自身/累计样本占比, 列出占比上升 (回退) 和下降 (改进) 最多的函数
+    
+    符号 id 在两个数据库中各自编号, 只能按名称对齐; JIT 符号所在的 perf-PID.map 随进程号变化,
+    因此不区分 DSO。两边的 symbol_stats 合并后按符号名一次分组 (等价于全外连接),
+    工作量只与不同符号数有关, 与调用栈帧数无关。占比以各自的样本总数归一化, 变化量单位为百分点。
+    """
+    base_total = get_total_samples(cursor)
+    other_total = get_total_samples(cursor, schema=DIFF_SCHEMA)
+    
+    print(f"\n=== 差异分析 ===")
+    print(f"基准: {base_file} ({base_total} 样本)")
+    print(f"对比: {other_file} ({other_total} 样本)")
+    if not base_total or not other_total:
+        print("错误: 数据库中没有样本")
+        return
+    
+    cursor.execute(f'''
+        SELECT symbol,
+               SUM(base_self) * 100.0 / ? AS base_self_pct,
+               SUM(other_self) * 100.0 / ? AS other_self_pct,
+               SUM(base_inclusive) * 100.0 / ? AS base_inclusive_pct,
+               SUM(other_inclusive) * 100.0 / ? AS other_inclusive_pct
+        FROM (
+            SELECT s.name AS symbol, t.self_samples AS base_self, t.inclusive_samples AS base_inclusive,
+                   0 AS other_self, 0 AS other_inclusive
+            FROM main.symbol_stats t
+            JOIN main.symbols s ON s.id = t.symbol_id
+            UNION ALL
+            SELECT s.name, 0, 0, t.self_samples, t.inclusive_samples
+            FROM {DIFF_SCHEMA}.symbol_stats t
+            JOIN {DIFF_SCHEMA}.symbols s ON s.id = t.symbol_id
+        )
+        WHERE symbol != '' AND symbol != '[unknown]'
+        GROUP BY symbol
+    ''', (base_total, other_total, base_total, other_total))
+    
+    rows = [(symbol, base_self, other_self, other_self - base_self,
+             base_inclusive, other_inclusive, other_inclusive - base_inclusive)
+            for symbol, base_self, other_self, base_inclusive, other_inclusive in cursor.fetchall()]
+    key_index = 3 if rank_by == 'self' else 6
+    rows.sort(key=lambda row: (row[key_index], row[0]))
+    
+    regressions = [row for row in reversed(rows) if row[key_index] > 0][:top]
+    improvements = [row for row in rows if row[key_index] < 0][:top]
+    
+    for title, results in ((f"回退 (占比上升 Top {top})", regressions),
+                           (f"改进 (占比下降 Top {top})", improvements)):
+        print(f"\n--- {title} ---")
+        print(f"{'排名':<4} {'函数名':<50} {'基准自身%':<10} {'对比自身%':<10} {'自身变化':<10} "
+              f"{'基准累计%':<10} {'对比累计%':<10} {'累计变化':<10}")
+        print("-" * 130)
+        for i, (symbol, *pcts) in enumerate(results, 1):
+            short_symbol = symbol[:47] + "..." if len(symbol) > 50 else symbol
+            base_self, other_self, self_delta, base_inclusive, other_inclusive, inclusive_delta = pcts
+            print(f"{i:<4} {short_symbol:<50} {base_self:<10.2f} {other_self:<10.2f} {self_delta:<+10.2f} "
+                  f"{base_inclusive:<10.2f} {other_inclusive:<10.2f} {inclusive_delta:<+10.2f}")
+        if not results:
+            print("无")
+
+def export_diff_flamegraph(cursor, other_file, args):
+    """生成两个数据库之间的差分折叠栈文件和/或红蓝差分火焰图 (基准 -> 对比)"""
+    other_conn = sqlite3.connect(f'file:{other_file}?mode=ro', uri=True)
+    try:
+        folded = diff_folded(folded_stacks(cursor), folded_stacks(other_conn.cursor()),
+                             normalize=not args.no_normalize)
+    finally:
+        other_conn.close()
+    
+    if args.folded:
+        write_folded(folded, args.folded)
+        print(f"差分折叠栈已生成: {args.folded} ({len(folded)} 条)")
+    
+    if args.flamegraph:
+        write_flamegraph(folded, args.flamegraph, title=args.title, subtitle=args.subtitle,
+                         width=args.width, font_size=args.fontsize)
+        print(f"差分火焰图已生成: {args.flamegraph}")
+
+def print_query_plan(explain_cursor, sql):
+    """打印一条查询的 EXPLAIN QUERY PLAN 结果 (树形缩进)"""
+    explain_cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    depth = {0: 0}
+    print(f"\n[查询计划] {' '.join(sql.split())}")
+    for node_id, parent, _, detail in explain_cursor.fetchall():
+        depth[node_id] = depth.get(parent, 0) + 1
+        print(f"{'  ' * depth[node_id]}{detail}")
+
+def enable_explain(conn, db_file, diff_file=None):
+    """在每条 SELECT 执行前打印其查询计划
+    
+    通过 trace 回调拿到实际执行的 SQL (参数已展开), 用另一个只读连接执行 EXPLAIN,
+    分析函数本身不需要任何改动。差分分析时该连接同样 ATTACH 对比数据库。
+    """
+    explain_conn = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True)
+    explain_cursor = explain_conn.cursor()
+    if diff_file:
+        explain_cursor.execute(f'ATTACH DATABASE ? AS {DIFF_SCHEMA}', (str(diff_file),))
+    
+    def trace(sql):
+        if sql.lstrip().upper().startswith('SELECT'):
+            print_query_plan(explain_cursor, sql)
+    
+    conn.set_trace_callback(trace)
+    return explain_conn
+
 def get_metadata(cursor):
     """获取元数据信息"""
     cursor.execute('SELECT key, value FROM metadata')
@@ -93,42 +316,405 @@ def get_metadata(cursor):
     print(f"样本总数: {metadata.get('sample_count', 'N/A')}")
     print(f"调用栈记录: {metadata.get('stack_count', 'N/A')}")
 
-def main():
-    if len(sys.argv) != 2:
-        print("用法: python3 analyze_database.py <数据库文件>")
+def first_timestamp(cursor):
+    """第一个样本的时间戳 (走 timestamp 索引), --start/--end 和时间线窗口都以它为起点"""
+    cursor.execute('SELECT MIN(timestamp) FROM perf_samples')
+    return cursor.fetchone()[0] or 0.0
+
+def sample_filter(cursor, args):
+    """根据命令行过滤参数生成作用于 perf_samples 的 WHERE 条件
+    
+    --start/--end 为相对第一个样本的秒数, 换算成绝对时间戳后可以走 timestamp 索引。
+    """
+    conditions = []
+    params = []
+    
+    if args.pid is not None:
+        conditions.append('pid = ?')
+        params.append(args.pid)
+    if args.tid is not None:
+        conditions.append('tid = ?')
+        params.append(args.tid)
+    if args.comm is not None:
+        conditions.append('comm = ?')
+        params.append(args.comm)
+    
+    if args.start is not None or args.end is not None:
+        origin = first_timestamp(cursor)
+        if args.start is not None:
+            conditions.append('timestamp >= ?')
+            params.append(origin + args.start)
+        if args.end is not None:
+            conditions.append('timestamp < ?')
+            params.append(origin + args.end)
+    
+    return ' AND '.join(conditions), params
+
+def describe_filter(args):
+    """过滤条件的可读描述, 没有过滤时返回空字符串"""
+    parts = []
+    if args.pid is not None:
+        parts.append(f"pid={args.pid}")
+    if args.tid is not None:
+        parts.append(f"tid={args.tid}")
+    if args.comm is not None:
+        parts.append(f"comm={args.comm}")
+    if args.start is not None or args.end is not None:
+        start = f"{args.start:g}" if args.start is not None else ''
+        end = f"{args.end:g}" if args.end is not None else ''
+        parts.append(f"时间 [{start}, {end}) 秒")
+    return ', '.join(parts)
+
+def load_leaf_symbols(cursor):
+    """调用栈 -> 栈顶符号 id, 以及符号 id -> 名称, 一次读出供后续按调用栈汇总使用"""
+    cursor.execute('SELECT stack_id, symbol_id FROM stack_frames WHERE level = 0')
+    leaf_symbols = dict(cursor.fetchall())
+    cursor.execute('SELECT id, name FROM symbols')
+    symbol_names = dict(cursor.fetchall())
+    return leaf_symbols, symbol_names
+
+def top_leaf_symbols(stack_counts, leaf_symbols, symbol_names, top):
+    """把 {stack_id: 样本数} 按栈顶符号汇总, 返回自身样本最多的 top 个 [(符号名, 样本数)], 跳过未知符号"""
+    symbol_counts = Counter()
+    for stack_id, count in stack_counts.items():
+        symbol_counts[leaf_symbols.get(stack_id)] += count
+    
+    return [(symbol_names[symbol_id], count) for symbol_id, count in symbol_counts.most_common()
+            if symbol_id is not None and symbol_names.get(symbol_id) not in ('', '[unknown]', None)][:top]
+
+def analyze_timeline(cursor, window, top, where='', params=()):
+    """热点时间线: 按固定长度的时间窗口统计每个窗口内自身样本最多的函数
+    
+    沿 timestamp 索引按时间顺序读取一遍 (timestamp, stack_id), 时间窗口随时间单调递增,
+    逐个窗口累计各调用栈的样本数, 最后把调用栈映射到栈顶符号。
+    窗口以第一个样本为起点, 与 --start/--end 的时间基准相同。
+    """
+    print(f"\n=== 热点时间线 (窗口 {window:g} 秒, 每个窗口 Top {top}) ===")
+    
+    origin = first_timestamp(cursor)
+    cursor.execute(f'''
+        SELECT timestamp, stack_id
+        FROM perf_samples
+        {'WHERE ' + where if where else ''}
+        ORDER BY timestamp
+    ''', params)
+    
+    windows = []
+    for bucket, rows in itertools.groupby(cursor, key=lambda row: int((row[0] - origin) // window)):
+        windows.append((bucket, Counter(stack_id for _, stack_id in rows)))
+    
+    leaf_symbols, symbol_names = load_leaf_symbols(cursor)
+    
+    print(f"{'起始(秒)':<10} {'结束(秒)':<10} {'样本数':<8} {'函数名':<60} {'自身样本':<8} {'自身%':<8}")
+    print("-" * 110)
+    
+    for bucket, stack_counts in windows:
+        samples = sum(stack_counts.values())
+        hot = top_leaf_symbols(stack_counts, leaf_symbols, symbol_names, top)
+        
+        start = f"{bucket * window:.3f}"
+        end = f"{(bucket + 1) * window:.3f}"
+        if not hot:
+            print(f"{start:<10} {end:<10} {samples:<8} -")
+            continue
+        for i, (symbol, count) in enumerate(hot):
+            short_symbol = symbol[:57] + "..." if len(symbol) > 60 else symbol
+            pct = round(count * 100.0 / samples, 2)
+            if i == 0:
+                print(f"{start:<10} {end:<10} {samples:<8} {short_symbol:<60} {count:<8} {pct:<8}")
+            else:
+                print(f"{'':<10} {'':<10} {'':<8} {short_symbol:<60} {count:<8} {pct:<8}")
+    
+    if not windows:
+        print("没有符合过滤条件的样本")
+
+def classify_stacks(cursor):
+    """按栈帧中的 JVM 线程特征符号 (CompileBroker::、GC 工作线程循环、VMThread:: 等) 给调用栈分类
+    
+    先在符号字典中找出特征符号, 以 JSON 数组作为参数与 stack_frames 连接一次, 返回 {stack_id: 类别}。
+    同一调用栈命中多个类别时取 THREAD_CATEGORIES 中靠前的类别。
+    """
+    priority = {category: i for i, (category, *_) in enumerate(THREAD_CATEGORIES)}
+    cursor.execute('SELECT id, name FROM symbols')
+    markers = {}
+    for symbol_id, name in cursor.fetchall():
+        for category, _, _, frame_pattern in THREAD_CATEGORIES:
+            if frame_pattern.search(name):
+                markers[symbol_id] = category
+                break
+    if not markers:
+        return {}
+    
+    cursor.execute('''
+        SELECT DISTINCT stack_id, symbol_id
+        FROM stack_frames
+        WHERE symbol_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(markers)),))
+    
+    stack_categories = {}
+    for stack_id, symbol_id in cursor.fetchall():
+        category = markers[symbol_id]
+        current = stack_categories.get(stack_id)
+        if current is None or priority[category] < priority[current]:
+            stack_categories[stack_id] = category
+    return stack_categories
+
+def classify_thread(comm, stack_counts, stack_categories):
+    """判断线程类别: 先按线程名匹配; 线程名无法识别时 (如所有线程都叫 java),
+    若超过一半的样本调用栈中含有某类特征符号, 则归入该类, 否则为应用线程"""
+    for category, _, comm_pattern, _ in THREAD_CATEGORIES:
+        if comm_pattern.search(comm):
+            return category
+    
+    votes = Counter()
+    for stack_id, count in stack_counts.items():
+        category = stack_categories.get(stack_id)
+        if category:
+            votes[category] += count
+    if votes:
+        category, count = votes.most_common(1)[0]
+        if count * 2 > sum(stack_counts.values()):
+            return category
+    return APPLICATION_CATEGORY[0]
+
+def thread_group_name(comm):
+    """线程组名: 去掉线程名末尾的编号 (GC Thread#0 -> GC Thread#, pool-1-thread-3 -> pool-1-thread-)"""
+    return re.sub(r'\d+$', '', comm) or comm
+
+def analyze_threads(cursor, top, where='', params=()):
+    """线程分析: 按 tid 统计样本, 把线程归入 JIT 编译/GC/VM/应用四类, 给出各类别、线程组、线程的
+    样本占比以及各类别中自身样本最多的函数"""
+    print(f"\n=== 线程分析 ===")
+    
+    cursor.execute(f'''
+        SELECT tid, comm, stack_id, COUNT(*)
+        FROM perf_samples
+        {'WHERE ' + where if where else ''}
+        GROUP BY tid, comm, stack_id
+    ''', params)
+    
+    # 线程改名时 comm 会变化, 取样本最多的名称
+    threads = {}
+    for tid, comm, stack_id, count in cursor.fetchall():
+        thread = threads.setdefault(tid, {'comms': Counter(), 'stacks': Counter()})
+        thread['comms'][comm] += count
+        thread['stacks'][stack_id] += count
+    
+    if not threads:
+        print("没有符合过滤条件的样本")
+        return
+    
+    stack_categories = classify_stacks(cursor)
+    leaf_symbols, symbol_names = load_leaf_symbols(cursor)
+    labels = dict([(category, label) for category, label, *_ in THREAD_CATEGORIES] + [APPLICATION_CATEGORY])
+    
+    total_samples = 0
+    categories = {category: {'threads': 0, 'samples': 0, 'stacks': Counter()} for category in labels}
+    groups = {}
+    rows = []
+    for tid, thread in threads.items():
+        comm = thread['comms'].most_common(1)[0][0]
+        samples = sum(thread['stacks'].values())
+        category = classify_thread(comm, thread['stacks'], stack_categories)
+        total_samples += samples
+        
+        summary = categories[category]
+        summary['threads'] += 1
+        summary['samples'] += samples
+        summary['stacks'].update(thread['stacks'])
+        
+        group = groups.setdefault((thread_group_name(comm), category), [0, 0])
+        group[0] += 1
+        group[1] += samples
+        rows.append((samples, tid, comm, category))
+    
+    print(f"\n--- 线程类别 ---")
+    print(f"{'类别':<12} {'线程数':<8} {'样本数':<10} {'占比%':<8}")
+    print("-" * 40)
+    for category, summary in sorted(categories.items(), key=lambda item: -item[1]['samples']):
+        if summary['samples']:
+            pct = round(summary['samples'] * 100.0 / total_samples, 2)
+            print(f"{labels[category]:<12} {summary['threads']:<8} {summary['samples']:<10} {pct:<8}")
+    
+    print(f"\n--- 线程组 ---")
+    print(f"{'线程组':<20} {'类别':<12} {'线程数':<8} {'样本数':<10} {'占比%':<8}")
+    print("-" * 62)
+    for (name, category), (count, samples) in sorted(groups.items(), key=lambda item: (-item[1][1], item[0])):
+        pct = round(samples * 100.0 / total_samples, 2)
+        print(f"{name:<20} {labels[category]:<12} {count:<8} {samples:<10} {pct:<8}")
+    
+    print(f"\n--- 线程 ---")
+    print(f"{'TID':<10} {'线程名':<20} {'类别':<12} {'样本数':<10} {'占比%':<8}")
+    print("-" * 64)
+    for samples, tid, comm, category in sorted(rows, key=lambda row: (-row[0], row[1])):
+        pct = round(samples * 100.0 / total_samples, 2)
+        print(f"{tid:<10} {comm:<20} {labels[category]:<12} {samples:<10} {pct:<8}")
+    
+    for category, summary in categories.items():
+        if not summary['samples']:
+            continue
+        print(f"\n--- {labels[category]} 线程热点函数 (Top {top}) ---")
+        print(f"{'排名':<4} {'函数名':<60} {'自身样本':<8} {'类别内%':<8}")
+        print("-" * 90)
+        hot = top_leaf_symbols(summary['stacks'], leaf_symbols, symbol_names, top)
+        for i, (symbol, count) in enumerate(hot, 1):
+            short_symbol = symbol[:57] + "..." if len(symbol) > 60 else symbol
+            pct = round(count * 100.0 / summary['samples'], 2)
+            print(f"{i:<4} {short_symbol:<60} {count:<8} {pct:<8}")
+
+def export_flamegraph(cursor, args):
+    """从数据库生成折叠栈文件和/或 SVG 火焰图"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stack_frames'")
+    if not cursor.fetchone():
+        print("错误: 数据库为旧版结构, 不支持生成火焰图, 请重新导入")
         sys.exit(1)
     
-    db_file = Path(sys.argv[1])
+    where, params = sample_filter(cursor, args)
+    folded = folded_stacks(cursor, where, params)
+    if not folded:
+        print("警告: 没有符合过滤条件的样本")
+    
+    if args.folded:
+        write_folded(folded, args.folded)
+        print(f"折叠栈已生成: {args.folded} ({len(folded)} 条)")
+    
+    if args.flamegraph:
+        write_flamegraph(folded, args.flamegraph, title=args.title, subtitle=args.subtitle,
+                         width=args.width, font_size=args.fontsize)
+        print(f"火焰图已生成: {args.flamegraph}")
+
+def main():
+    parser = argparse.ArgumentParser(description='分析性能数据库中的热点函数和进程信息')
+    parser.add_argument('db_file', help='export_to_database.py 生成的 SQLite 数据库')
+    parser.add_argument('--explain', action='store_true',
+                        help='执行每条查询前打印 EXPLAIN QUERY PLAN, 用于检查索引是否生效')
+    
+    # 火焰图输出 (指定后只生成文件, 不打印分析报告)
+    parser.add_argument('--folded', help='输出折叠栈文件 (stackcollapse 格式)')
+    parser.add_argument('--flamegraph', help='输出 SVG 火焰图')
+    parser.add_argument('--title', default='Flame Graph', help='火焰图标题')
+    parser.add_argument('--subtitle', default='', help='火焰图副标题')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH,
+                        help=f'火焰图宽度 (默认: {DEFAULT_WIDTH})')
+    parser.add_argument('--fontsize', type=int, default=DEFAULT_FONT_SIZE,
+                        help=f'火焰图字体大小 (默认: {DEFAULT_FONT_SIZE})')
+    
+    # 样本过滤
+    parser.add_argument('--pid', type=int, help='只统计指定进程')
+    parser.add_argument('--tid', type=int, help='只统计指定线程')
+    parser.add_argument('--comm', help='只统计指定进程/线程名')
+    parser.add_argument('--start', type=float, help='时间窗口起点 (相对第一个样本的秒数)')
+    parser.add_argument('--end', type=float, help='时间窗口终点 (相对第一个样本的秒数)')
+    
+    # 差分分析 (db_file 为基准, --diff 为对比; 指定 --folded/--flamegraph 时输出差分折叠栈/火焰图)
+    parser.add_argument('--diff', metavar='OTHER_DB', help='与另一个数据库比较各函数的样本占比')
+    parser.add_argument('--rank-by', choices=['self', 'inclusive'], default='self',
+                        help='差分分析按自身或累计占比的变化排序 (默认: self)')
+    parser.add_argument('--diff-top', type=int, default=10,
+                        help='差分分析中回退/改进各列出的函数数 (默认: 10)')
+    parser.add_argument('--no-normalize', action='store_true',
+                        help='差分折叠栈不按总样本数归一化 (默认把基准样本数缩放到对比的总样本数)')
+    
+    # 热点时间线 (指定后只打印时间线)
+    parser.add_argument('--timeline', type=float, metavar='SECONDS',
+                        help='按指定秒数划分时间窗口, 打印每个窗口的热点函数')
+    parser.add_argument('--top', type=int, default=5,
+                        help='时间线中每个窗口/线程分析中每个类别显示的函数数 (默认: 5)')
+    
+    # 线程分析 (指定后只打印线程报告)
+    parser.add_argument('--threads', action='store_true',
+                        help='按线程统计样本, 区分 JIT 编译/GC/VM/应用线程并给出各类别的热点函数')
+    args = parser.parse_args()
+    
+    if args.timeline is not None and args.timeline <= 0:
+        parser.error('--timeline 必须为正数')
+    if args.top <= 0:
+        parser.error('--top 必须为正整数')
+    if args.diff_top <= 0:
+        parser.error('--diff-top 必须为正整数')
+    if args.threads and args.timeline is not None:
+        parser.error('--threads 不能与 --timeline 同时使用')
+    if args.diff and (args.timeline is not None or args.threads or any(
+            value is not None for value in (args.pid, args.tid, args.comm, args.start, args.end))):
+        parser.error('--diff 不能与 --timeline、--threads 或样本过滤参数同时使用')
+    
+    db_file = Path(args.db_file)
     if not db_file.exists():
         print(f"错误: 数据库文件 {db_file} 不存在")
         sys.exit(1)
+    diff_file = Path(args.diff) if args.diff else None
+    if diff_file and not diff_file.exists():
+        print(f"错误: 数据库文件 {diff_file} 不存在")
+        sys.exit(1)
     
     # 连接数据库
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
+    explain_conn = enable_explain(conn, db_file, diff_file) if args.explain else None
     
     try:
-        # 验证表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        # 验证表是否存在 (新版数据库中 call_stacks 是兼容视图)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
         tables = [row[0] for row in cursor.fetchall()]
         
         if 'perf_samples' not in tables or 'call_stacks' not in tables:
             print("错误: 数据库缺少必要的表结构")
             sys.exit(1)
         
-        # 执行分析
+        if diff_file:
+            cursor.execute(f'ATTACH DATABASE ? AS {DIFF_SCHEMA}', (str(diff_file),))
+            for schema, name in (('main', db_file), (DIFF_SCHEMA, diff_file)):
+                cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+                if not {'symbol_stats', 'stack_frames'} <= {row[0] for row in cursor.fetchall()}:
+                    print(f"错误: 数据库 {name} 为旧版结构, 不支持差分分析, 请重新导入")
+                    sys.exit(1)
+            
+            if args.folded or args.flamegraph:
+                export_diff_flamegraph(cursor, diff_file, args)
+            else:
+                analyze_diff(cursor, db_file, diff_file, args.diff_top, args.rank_by)
+                print(f"\n分析完成！")
+            return
+        
+        if args.folded or args.flamegraph:
+            export_flamegraph(cursor, args)
+            return
+        
+        if (args.timeline is not None or args.threads) and 'stack_frames' not in tables:
+            print("错误: 数据库为旧版结构, 不支持热点时间线和线程分析, 请重新导入")
+            sys.exit(1)
+        
+        # 执行分析, 过滤参数作用于所有报告
         get_metadata(cursor)
-        analyze_process_info(cursor)
-        analyze_hotspots(cursor)
-        analyze_java_hotspots(cursor)
+        where, params = sample_filter(cursor, args)
+        if where:
+            print(f"过滤条件: {describe_filter(args)}")
         
-        print(f"\n分析完成！")
+        if args.timeline is not None:
+            analyze_timeline(cursor, args.timeline, args.top, where, params)
+            print(f"\n分析完成！")
+            return
+        
+        if args.threads:
+            analyze_threads(cursor, args.top, where, params)
+            print(f"\n分析完成！")
+            return
         
+        analyze_process_info(cursor, where, params)
+        stats_source = symbol_stats_source(cursor, where)
+        total_samples = get_total_samples(cursor, where, params)
+        analyze_hotspots(cursor, stats_source, total_samples, params)
+        analyze_java_hotspots(cursor, stats_source, total_samples, params)
+        
+        print(f"\n分析完成！")
+    
     except sqlite3.Error as e:
         print(f"数据库错误: {e}")
         sys.exit(1)
     finally:
         conn.close()
+        if explain_conn:
+            explain_conn.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+perf script 行解析微基准测试
+对比原始的逐行正则解析与 export_to_database.py 中预编译/bytes 解析的吞吐 (行/秒)
+
+样本文件可以从一次真实采集中截取, 例如:
+    sudo perf script -i perf.data --fields comm,pid,tid,time,ip,sym,dso | head -n 500000 > sample.txt
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from export_to_database import (
+    parse_perf_script_line, parse_chunk, STACK_LINE_RE, SAMPLE_LINE_RE, IP_SIGN_BIT, IP_RANGE
+)
+
+STACK_LINE_RE_BYTES = re.compile(STACK_LINE_RE.pattern.encode())
+SAMPLE_LINE_RE_BYTES = re.compile(SAMPLE_LINE_RE.pattern.encode())
+
+def legacy_parse_perf_script_line(line):
+    """优化前的解析实现, 作为对照基线"""
+    original_line = line
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None, None
+    
+    if original_line.startswith((' ', '\t')):
+        stack_match = re.match(r'([0-9a-fA-F]+)\s+(.+)', line)
+        if stack_match:
+            ip = stack_match.group(1)
+            rest = stack_match.group(2)
+            
+            symbol = rest
+            dso = ""
+            if '(' in rest and ')' in rest:
+                parts = rest.rsplit('(', 1)
+                if len(parts) == 2:
+                    symbol = parts[0].strip()
+                    dso = parts[1].rstrip(')').strip()
+            
+            return 'stack', {'ip': ip, 'symbol': symbol, 'dso': dso}
+    else:
+        sample_match = re.match(r'(.+?)\s+(\d+)/(\d+)\s+([0-9.]+):\s*(.*)$', line)
+        if sample_match:
+            comm = sample_match.group(1).strip()
+            pid = int(sample_match.group(2))
+            tid = int(sample_match.group(3))
+            timestamp = float(sample_match.group(4))
+            event_info = sample_match.group(5).strip() if sample_match.group(5) else ''
+            
+            return 'sample', {
+                'timestamp': timestamp,
+                'pid': pid,
+                'tid': tid,
+                'comm': comm,
+                'raw_line': line
+            }
+    
+    return None, None
+
+def parse_perf_script_line_bytes(line):
+    """直接在 bytes 上解析, 只解码需要保存的字段 (对照实验)"""
+    stripped = line.strip()
+    if not stripped or stripped[0] == 0x23:    # '#'
+        return None, None
+    
+    if line[0] in b' \t':
+        stack_match = STACK_LINE_RE_BYTES.match(stripped)
+        if stack_match is None:
+            return None, None
+        ip, rest = stack_match.groups()
+        ip = int(ip, 16)
+        if ip >= IP_SIGN_BIT:
+            ip -= IP_RANGE
+        symbol, paren, dso = rest.rpartition(b'(')
+        if paren and b')' in rest:
+            return 'stack', (ip, symbol.strip().decode(), dso.rstrip(b')').strip().decode())
+        return 'stack', (ip, rest.decode(), '')
+    
+    sample_match = SAMPLE_LINE_RE_BYTES.match(stripped)
+    if sample_match is None:
+        return None, None
+    comm, pid, tid, timestamp = sample_match.groups()
+    return 'sample', (float(timestamp), int(pid), int(tid), comm.strip().decode(), stripped.decode())
+
+def best_of(repeat, func):
+    """多次运行取最短耗时"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='perf script 行解析微基准测试')
+    parser.add_argument('sample_file', help='截取的 perf script 输出样本')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数, 取最快一次 (默认: 3)')
+    args = parser.parse_args()
+    
+    sample_file = Path(args.sample_file)
+    if not sample_file.exists():
+        print(f"错误: 文件 {sample_file} 不存在")
+        sys.exit(1)
+    
+    data = sample_file.read_bytes()
+    text_lines = data.decode('utf-8').splitlines(keepends=True)
+    byte_lines = data.split(b'\n')
+    line_count = len(text_lines)
+    
+    cases = [
+        ('原始实现 (re.match + dict)', lambda: [legacy_parse_perf_script_line(l) for l in text_lines]),
+        ('预编译正则 + tuple (str)', lambda: [parse_perf_script_line(l) for l in text_lines]),
+        ('预编译正则 + tuple (bytes)', lambda: [parse_perf_script_line_bytes(l) for l in byte_lines]),
+        ('parse_chunk (整块解码)', lambda: parse_chunk(data, 1)),
+    ]
+    
+    print(f"样本文件: {sample_file} ({line_count} 行, {len(data) / 1024 / 1024:.1f} MB)")
+    print(f"{'解析方式':<32} {'耗时(秒)':<10} {'行/秒':<12} {'加速比'}")
+    print("-" * 70)
+    
+    baseline = None
+    for name, func in cases:
+        seconds = best_of(args.repeat, func)
+        baseline = baseline or seconds
+        print(f"{name:<32} {seconds:<10.3f} {line_count / seconds:<12.0f} {baseline / seconds:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+性能数据列式导出与向量化分析
+把 performance_data.sqlite 中的样本和调用栈导出为列式数组, 供 notebook 等场景直接用 NumPy 做大范围扫描,
+避免经由 sqlite3 游标逐行读取。
+
+导出目录中每一列是一个 .npy 文件 (.npz 为 zip 压缩包, 无法内存映射), 可以用
+np.load(..., mmap_mode='r') 零拷贝映射:
+    samples_timestamp.npy  float64  采样时间戳 (秒)
+    samples_pid.npy        int32    进程 ID
+    samples_tid.npy        int32    线程 ID
+    samples_comm.npy       int32    进程/线程名编码 (dictionary.json 中 comms 的下标)
+    samples_stack.npy      int32    调用栈编码 (stack_offsets 的下标, 无调用栈为 -1)
+    stack_offsets.npy      int64    CSR 偏移: 第 i 个调用栈的帧为 frame_*[offsets[i]:offsets[i + 1]], 0 为最深层
+    frame_symbol.npy       int32    符号编码 (dictionary.json 中 symbols 的下标)
+    frame_dso.npy          int32    DSO 编码 (dictionary.json 中 dsos 的下标)
+    frame_ip.npy           int64    指令地址 (64 位补码)
+    symbol_is_java.npy     bool     各符号是否为 Java 方法
+    dictionary.json                 symbols / dsos / comms 名称表和 metadata
+安装了 pyarrow 时可以同时写出 Arrow IPC 文件 (samples.arrow / stacks.arrow), 调用栈为 list 列, 布局同样是 CSR。
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from analyze_database import print_hotspots, print_process_info
+
+DICTIONARY_FILE = 'dictionary.json'
+SAMPLE_COLUMNS = ('timestamp', 'pid', 'tid', 'comm', 'stack')
+FRAME_COLUMNS = ('symbol', 'dso', 'ip')
+
+def dense_codes(ids, values):
+    """把数据库中的 id 映射为 0..N-1 的连续编码 (ids 已排序)"""
+    return np.searchsorted(ids, values).astype(np.int32)
+
+def read_dictionary(cursor, table, columns):
+    """按 id 顺序读取字典表, 返回 (id 数组, 各列取值的列表)"""
+    cursor.execute(f"SELECT id, {', '.join(columns)} FROM {table} ORDER BY id")
+    rows = cursor.fetchall()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    return ids, [[row[i + 1] for row in rows] for i in range(len(columns))]
+
+def export_columnar(db_file, output_dir, arrow=False):
+    """把数据库导出为列式数组目录, 返回 (样本数, 调用栈数, 帧数)"""
+    conn = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True)
+    cursor = conn.cursor()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'stack_frames'")
+        if not cursor.fetchone():
+            raise ValueError(f"数据库 {db_file} 为旧版结构, 不支持列式导出, 请重新导入")
+        cursor.execute('PRAGMA table_info(symbols)')
+        is_java_column = 'is_java' if 'is_java' in [row[1] for row in cursor.fetchall()] else "instr(name, '::') > 0"
+        
+        symbol_ids, (symbols, is_java) = read_dictionary(cursor, 'symbols', ['name', is_java_column])
+        dso_ids, (dsos,) = read_dictionary(cursor, 'dsos', ['name'])
+        stack_ids, _ = read_dictionary(cursor, 'stacks', ['depth'])
+        
+        # 调用栈帧按主键 (stack_id, level) 顺序读出, 同一调用栈的帧连续存放, 即 CSR 的值数组
+        cursor.execute('SELECT COUNT(*) FROM stack_frames')
+        frame_count = cursor.fetchone()[0]
+        cursor.execute('SELECT stack_id, symbol_id, dso_id, ip FROM stack_frames ORDER BY stack_id, level')
+        frames = np.fromiter(cursor, dtype=[('stack', np.int64), ('symbol', np.int64), ('dso', np.int64),
+                                            ('ip', np.int64)], count=frame_count)
+        frame_stack = dense_codes(stack_ids, frames['stack'])
+        offsets = np.zeros(len(stack_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(frame_stack, minlength=len(stack_ids)), out=offsets[1:])
+        
+        # 进程名在迭代过程中编码, 样本按导入顺序 (id) 排列
+        comms = {}
+        cursor.execute('SELECT COUNT(*) FROM perf_samples')
+        sample_count = cursor.fetchone()[0]
+        cursor.execute('SELECT timestamp, pid, tid, comm, stack_id FROM perf_samples ORDER BY id')
+        samples = np.fromiter(
+            ((timestamp, pid, tid, comms.setdefault(comm, len(comms)), -1 if stack_id is None else stack_id)
+             for timestamp, pid, tid, comm, stack_id in cursor),
+            dtype=[('timestamp', np.float64), ('pid', np.int64), ('tid', np.int64), ('comm', np.int64),
+                   ('stack', np.int64)], count=sample_count)
+        has_stack = samples['stack'] >= 0
+        sample_stack = np.full(sample_count, -1, dtype=np.int32)
+        sample_stack[has_stack] = dense_codes(stack_ids, samples['stack'][has_stack])
+        
+        cursor.execute('SELECT key, value FROM metadata')
+        metadata = dict(cursor.fetchall())
+    finally:
+        conn.close()
+    
+    columns = {
+        'samples_timestamp': samples['timestamp'],
+        'samples_pid': samples['pid'].astype(np.int32),
+        'samples_tid': samples['tid'].astype(np.int32),
+        'samples_comm': samples['comm'].astype(np.int32),
+        'samples_stack': sample_stack,
+        'stack_offsets': offsets,
+        'frame_symbol': dense_codes(symbol_ids, frames['symbol']),
+        'frame_dso': dense_codes(dso_ids, frames['dso']),
+        'frame_ip': frames['ip'],
+        'symbol_is_java': np.array(is_java, dtype=bool),
+    }
+    for name, values in columns.items():
+        np.save(output_dir / f'{name}.npy', values)
+    
+    dictionary = {'symbols': symbols, 'dsos': dsos, 'comms': list(comms), 'metadata': metadata}
+    with open(output_dir / DICTIONARY_FILE, 'w', encoding='utf-8') as f:
+        json.dump(dictionary, f, ensure_ascii=False)
+    
+    if arrow:
+        write_arrow(columns, output_dir)
+    
+    return sample_count, len(stack_ids), frame_count
+
+def write_arrow(columns, output_dir):
+    """写出 Arrow IPC 文件: samples.arrow 每行一个样本, stacks.arrow 每行一个调用栈 (帧为 list 列)"""
+    samples = pa.table({name: columns[f'samples_{name}'] for name in SAMPLE_COLUMNS})
+    offsets = pa.array(columns['stack_offsets'].astype(np.int32 if len(columns['frame_symbol']) < 2 ** 31
+                                                       else np.int64))
+    list_type = pa.ListArray if offsets.type == pa.int32() else pa.LargeListArray
+    stacks = pa.table({f'frame_{name}': list_type.from_arrays(offsets, pa.array(columns[f'frame_{name}']))
+                       for name in FRAME_COLUMNS})
+    
+    for name, table in (('samples', samples), ('stacks', stacks)):
+        with pa.OSFile(str(output_dir / f'{name}.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+def load_columnar(directory, mmap=True):
+    """读取导出目录, 返回 {列名: 数组} 以及 symbols / dsos / comms / metadata
+    
+    mmap 为 True 时数组以只读方式内存映射, 只有实际访问的页才会读入内存。
+    """
+    directory = Path(directory)
+    profile = {}
+    for path in sorted(directory.glob('*.npy')):
+        profile[path.stem] = np.load(path, mmap_mode='r' if mmap else None)
+    with open(directory / DICTIONARY_FILE, 'r', encoding='utf-8') as f:
+        profile.update(json.load(f))
+    return profile
+
+def load_arrow(directory):
+    """以内存映射方式读取 Arrow IPC 文件, 返回 (samples, stacks) 两个 pyarrow.Table"""
+    if pa is None:
+        raise RuntimeError("读取 Arrow 文件需要安装 pyarrow")
+    directory = Path(directory)
+    tables = []
+    for name in ('samples', 'stacks'):
+        with pa.memory_map(str(directory / f'{name}.arrow'), 'r') as source:
+            tables.append(pa.ipc.open_file(source).read_all())
+    return tuple(tables)
+
+def time_mask(profile, start=None, end=None):
+    """--start/--end (相对第一个样本的秒数) 对应的样本掩码, 没有时间范围时返回 None"""
+    if start is None and end is None:
+        return None
+    timestamps = profile['samples_timestamp']
+    origin = timestamps.min() if len(timestamps) else 0.0
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        mask &= timestamps >= origin + start
+    if end is not None:
+        mask &= timestamps < origin + end
+    return mask
+
+def process_info(profile, mask=None):
+    """向量化的进程信息统计, 返回与 analyze_process_info 相同的 [(comm, samples, percentage)]"""
+    comm = profile['samples_comm'] if mask is None else profile['samples_comm'][mask]
+    counts = np.bincount(comm, minlength=len(profile['comms']))
+    total = counts.sum()
+    order = np.argsort(-counts, kind='stable')
+    # 占比按精确值四舍五入到两位小数, 与 SQLite 的 ROUND 一致 (Python round 按二进制浮点值舍入)
+    return [(profile['comms'][i], int(counts[i]), (int(counts[i]) * 20000 // int(total) + 1) // 2 / 100)
+            for i in order if counts[i]]
+
+def hotspots(profile, mask=None, top=10):
+    """向量化的热点函数统计, 返回与 analyze_hotspots 相同的 [(symbol, dso, self_samples, inclusive_samples)]
+    
+    先按调用栈统计样本数作为权重; 自身样本取每个调用栈的第一帧 (level 0),
+    累计样本对 (调用栈, 符号, DSO) 去重后加权求和, 与 symbol_stats 的口径一致。
+    """
+    offsets = profile['stack_offsets']
+    stack_count = len(offsets) - 1
+    sample_stack = profile['samples_stack'] if mask is None else profile['samples_stack'][mask]
+    weights = np.bincount(sample_stack[sample_stack >= 0], minlength=stack_count)
+    
+    # (符号, DSO) 组合先压缩为连续编码, 避免按 符号数 x DSO 数 分配数组
+    pair = np.asarray(profile['frame_symbol'], dtype=np.int64) * len(profile['dsos']) + profile['frame_dso']
+    pairs, pair_codes = np.unique(pair, return_inverse=True)
+    pair_codes = pair_codes.ravel()
+    if not len(pairs):
+        return []
+    
+    depth = np.diff(offsets)
+    leaf = offsets[:-1][depth > 0]
+    self_samples = np.bincount(pair_codes[leaf], weights=weights[depth > 0], minlength=len(pairs))
+    
+    # 排序后与前一个元素比较去重, 比 np.unique 快一个数量级
+    frame_stack = np.repeat(np.arange(stack_count, dtype=np.int64), depth)
+    unique_frames = np.sort(frame_stack * len(pairs) + pair_codes)
+    unique_frames = unique_frames[np.concatenate(([True], unique_frames[1:] != unique_frames[:-1]))]
+    inclusive_samples = np.bincount(unique_frames % len(pairs), weights=weights[unique_frames // len(pairs)],
+                                    minlength=len(pairs))
+    
+    symbols = profile['symbols']
+    dsos = profile['dsos']
+    pair_symbols = pairs // len(dsos)
+    valid = np.array([symbols[i] not in ('', '[unknown]') for i in pair_symbols], dtype=bool)
+    candidates = np.flatnonzero(valid & (inclusive_samples > 0))
+    order = candidates[np.lexsort((-inclusive_samples[candidates], -self_samples[candidates]))][:top]
+    return [(symbols[pair_symbols[i]], dsos[pairs[i] % len(dsos)], int(self_samples[i]), int(inclusive_samples[i]))
+            for i in order]
+
+def main():
+    parser = argparse.ArgumentParser(description='性能数据列式导出 (NumPy .npy / Arrow) 与向量化分析')
+    parser.add_argument('source', help='SQLite 数据库 (导出) 或已导出的列式目录 (分析)')
+    parser.add_argument('output_dir', nargs='?', help='导出目录 (source 为数据库时必须指定)')
+    parser.add_argument('--arrow', action='store_true', help='同时写出 Arrow IPC 文件 (需要 pyarrow)')
+    parser.add_argument('--start', type=float, help='时间窗口起点 (相对第一个样本的秒数)')
+    parser.add_argument('--end', type=float, help='时间窗口终点 (相对第一个样本的秒数)')
+    args = parser.parse_args()
+    
+    source = Path(args.source)
+    if not source.exists():
+        print(f"错误: {source} 不存在")
+        sys.exit(1)
+    
+    if source.is_file():
+        if not args.output_dir:
+            parser.error('导出时需要指定 output_dir')
+        if args.arrow and pa is None:
+            print("错误: 写出 Arrow 文件需要安装 pyarrow")
+            sys.exit(1)
+        try:
+            samples, stacks, frames = export_columnar(source, args.output_dir, arrow=args.arrow)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        except sqlite3.Error as e:
+            print(f"数据库错误: {e}")
+            sys.exit(1)
+        print(f"列式数据已导出: {args.output_dir} (样本 {samples}, 调用栈 {stacks}, 栈帧 {frames})")
+        return
+    
+    if not (source / DICTIONARY_FILE).exists():
+        print(f"错误: {source} 不是 columnar.py 导出的目录")
+        sys.exit(1)
+    
+    profile = load_columnar(source)
+    mask = time_mask(profile, args.start, args.end)
+    total_samples = len(profile['samples_timestamp']) if mask is None else int(mask.sum())
+    
+    print(f"\n=== 进程信息分析 ===")
+    print_process_info(process_info(profile, mask))
+    print(f"\n=== 热点函数分析 (Top 10) ===")
+    print_hotspots(hotspots(profile, mask), total_samples)
+    
+    print(f"\n分析完成！")
+
+if __name__ == '__main__':
+    main()
@@ -8,11 +8,52 @@ import sys
 import sqlite3
 import re
 import argparse
+import subprocess
 from pathlib import Path
 import json
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 
-def create_database_schema(cursor):
+# 每批写入的样本数
+DEFAULT_BATCH_SIZE = 50000
+
+# 分块解析时每块的大致字节数, 块总在样本记录边界 (空行) 处切分
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# 直接读取 perf.data 时传给 perf script 的参数, 与 generate.sh 保持一致
+PERF_SCRIPT_ARGS = [
+    '--show-kernel-path',
+    '--kallsyms=/proc/kallsyms',
+    '--fields', 'comm,pid,tid,time,ip,sym,dso',
+]
+
+# perf.data 文件头的魔数
+PERF_DATA_MAGIC = b'PERFILE2'
+
+# perf script 输出的行格式, 预先编译
+# 调用栈行: "地址 符号 (dso)"
+STACK_LINE_RE = re.compile(r'([0-9a-fA-F]+)\s+(.+)')
+# 主样本行: "comm pid/tid timestamp: 事件信息"
+SAMPLE_LINE_RE = re.compile(r'(.+?)\s+(\d+)/(\d+)\s+([0-9.]+):')
+
+# ip 按有符号 64 位整数保存
+IP_SIGN_BIT = 1 << 63
+IP_RANGE = 1 << 64
+
+# 每导入这么多样本提交一次, 并在 metadata 中记录断点 (文件偏移和内容指纹)
+DEFAULT_CHECKPOINT_SAMPLES = 200000
+
+# 内容指纹取已导入部分开头和结尾各这么多字节
+FINGERPRINT_BLOCK_SIZE = 1024 * 1024
+
+# 批量导入模式下的页缓存大小 (KB)
+BULK_CACHE_SIZE_KB = 512 * 1024
+
+def create_database_schema(cursor, create_indexes=True):
     """创建数据库表结构"""
     
     # 主要的性能样本表
@@ -23,23 +64,80 @@ def create_database_schema(cursor):
             pid INTEGER NOT NULL,
             tid INTEGER NOT NULL,
             comm TEXT NOT NULL,
-            raw_line TEXT
+            raw_line TEXT,
+            stack_id INTEGER,
+            FOREIGN KEY (stack_id) REFERENCES stacks (id)
         )
     ''')
     
-    # 调用栈表
+    # 符号字典表: 同一个 JIT/libjvm 符号在调用栈中会重复出现数百万次, 只保存一份
+    # is_java 在导入结束时计算一次, 分析时用部分索引代替 LIKE '%::%' 全表匹配
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS call_stacks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sample_id INTEGER NOT NULL,
-            level INTEGER NOT NULL,
-            ip TEXT NOT NULL,
-            symbol TEXT NOT NULL,
-            dso TEXT,
-            FOREIGN KEY (sample_id) REFERENCES perf_samples (id)
+        CREATE TABLE IF NOT EXISTS symbols (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            is_java INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('PRAGMA table_info(symbols)')
+    if 'is_java' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE symbols ADD COLUMN is_java INTEGER NOT NULL DEFAULT 0')
+    
+    # DSO 字典表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dsos (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    
+    # 去重后的调用栈表: 完全相同的帧序列只保存一次, sample_count 为引用它的样本数
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stacks (
+            id INTEGER PRIMARY KEY,
+            depth INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL DEFAULT 0
         )
     ''')
     
+    # 调用栈帧表, 符号和 DSO 以整数 id 引用, ip 以整数保存
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stack_frames (
+            stack_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            ip INTEGER NOT NULL,
+            symbol_id INTEGER NOT NULL,
+            dso_id INTEGER NOT NULL,
+            PRIMARY KEY (stack_id, level),
+            FOREIGN KEY (stack_id) REFERENCES stacks (id),
+            FOREIGN KEY (symbol_id) REFERENCES symbols (id),
+            FOREIGN KEY (dso_id) REFERENCES dsos (id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # 兼容视图: 按样本展开调用栈, 保持原 call_stacks 表的列, 已有查询无需修改
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS call_stacks AS
+        SELECT p.id AS sample_id, f.level AS level,
+               printf('%x', f.ip) AS ip, s.name AS symbol, d.name AS dso
+        FROM perf_samples p
+        JOIN stack_frames f ON f.stack_id = p.stack_id
+        JOIN symbols s ON s.id = f.symbol_id
+        JOIN dsos d ON d.id = f.dso_id
+    ''')
+    
+    # 按 (符号, DSO) 汇总的样本数, 导入结束时根据去重后的调用栈生成
+    # self_samples: 作为栈顶 (level 0) 出现的样本数; inclusive_samples: 出现在调用栈中的样本数 (同一栈内去重)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS symbol_stats (
+            symbol_id INTEGER NOT NULL,
+            dso_id INTEGER NOT NULL,
+            self_samples INTEGER NOT NULL,
+            inclusive_samples INTEGER NOT NULL,
+            PRIMARY KEY (symbol_id, dso_id)
+        ) WITHOUT ROWID
+    ''')
+    
     # 元数据表
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS metadata (
@@ -48,66 +146,422 @@ def create_database_schema(cursor):
         )
     ''')
     
-    # 创建基本索引
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_samples_timestamp ON perf_samples(timestamp)')
+    # 批量导入模式下索引推迟到数据加载完成后再创建
+    if create_indexes:
+        create_database_indexes(cursor)
+
+def is_legacy_schema(cursor):
+    """是否为旧版导入程序生成的数据库: call_stacks 是普通表, 或 perf_samples 没有 stack_id 列"""
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'call_stacks'")
+    row = cursor.fetchone()
+    if row and row[0] == 'table':
+        return True
+    cursor.execute('PRAGMA table_info(perf_samples)')
+    columns = [row[1] for row in cursor.fetchall()]
+    return bool(columns) and 'stack_id' not in columns
+
+def create_database_indexes(cursor):
+    """创建分析脚本查询所需的索引"""
+    # 时间范围过滤和热点时间线按 timestamp 顺序读取 stack_id, 覆盖索引避免逐行回表
+    cursor.execute('DROP INDEX IF EXISTS idx_samples_timestamp')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_samples_timestamp_stack ON perf_samples(timestamp, stack_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_samples_pid ON perf_samples(pid)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stacks_sample_id ON call_stacks(sample_id)')
+    # 进程信息按 comm 分组计数, 火焰图按 (comm, stack_id) 分组, 覆盖索引避免回表读取 raw_line
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_samples_comm ON perf_samples(comm, stack_id)')
+    # Java 热点只关心 is_java = 1 的少量符号, 按 name 排列可直接满足 GROUP BY symbol
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_symbols_java ON symbols(name) WHERE is_java = 1')
+    # 热点报告按 self_samples 取 Top N
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_symbol_stats_self
+        ON symbol_stats(self_samples DESC, inclusive_samples DESC)
+    ''')
+
+def mark_java_symbols(cursor):
+    """标记 Java 方法符号 (形如 LClass;::method 或 Class::method)"""
+    cursor.execute("UPDATE symbols SET is_java = 1 WHERE is_java = 0 AND instr(name, '::') > 0")
+
+def analyze_database(cursor):
+    """收集统计信息供查询优化器选择索引, analysis_limit 限制大表上的扫描量"""
+    cursor.execute('PRAGMA analysis_limit = 1000')
+    cursor.execute('ANALYZE')
+
+def build_symbol_stats(cursor):
+    """根据去重后的调用栈重新生成 symbol_stats 汇总表
+    
+    只扫描每个不同的调用栈一次, 按 stacks.sample_count 加权, 代价与样本总数无关。
+    """
+    cursor.execute('DELETE FROM symbol_stats')
+    cursor.execute('''
+        INSERT INTO symbol_stats (symbol_id, dso_id, self_samples, inclusive_samples)
+        SELECT f.symbol_id, f.dso_id,
+               SUM(CASE WHEN f.min_level = 0 THEN st.sample_count ELSE 0 END),
+               SUM(st.sample_count)
+        FROM (
+            SELECT stack_id, symbol_id, dso_id, MIN(level) AS min_level
+            FROM stack_frames
+            GROUP BY stack_id, symbol_id, dso_id
+        ) f
+        JOIN stacks st ON st.id = f.stack_id
+        GROUP BY f.symbol_id, f.dso_id
+    ''')
+
+def apply_bulk_pragmas(cursor):
+    """设置批量导入参数: 关闭回滚日志和同步写盘, 增大页缓存
+    
+    导入中途失败时数据库文件可能损坏, 只适用于新生成的数据库。
+    """
+    cursor.execute('PRAGMA journal_mode = OFF')
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute(f'PRAGMA cache_size = -{BULK_CACHE_SIZE_KB}')
+    cursor.execute('PRAGMA temp_store = MEMORY')
+
+class NameDictionary:
+    """导入过程中为符号/DSO 名称分配整数 id 的内存字典"""
+    
+    def __init__(self, cursor, table):
+        self.table = table
+        cursor.execute(f'SELECT name, id FROM {table}')
+        self.ids = dict(cursor.fetchall())
+        self.next_id = max(self.ids.values(), default=0) + 1
+        self.pending = []
+    
+    def get_id(self, name):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.next_id
+            self.next_id += 1
+            self.ids[name] = name_id
+            self.pending.append((name_id, name))
+        return name_id
+    
+    def flush(self, cursor):
+        """写入新出现的名称"""
+        cursor.executemany(f'INSERT INTO {self.table} (id, name) VALUES (?, ?)', self.pending)
+        self.pending.clear()
+
+class StackDictionary:
+    """导入过程中为完整调用栈 (帧序列) 分配 id 的内存字典, 并累计每个栈的样本数"""
+    
+    def __init__(self, cursor):
+        self.ids = {}
+        cursor.execute('SELECT stack_id, ip, symbol_id, dso_id FROM stack_frames ORDER BY stack_id, level')
+        frames_by_stack = {}
+        for stack_id, ip, symbol_id, dso_id in cursor.fetchall():
+            frames_by_stack.setdefault(stack_id, []).append((ip, symbol_id, dso_id))
+        for stack_id, frames in frames_by_stack.items():
+            self.ids[tuple(frames)] = stack_id
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM stacks')
+        self.next_id = cursor.fetchone()[0] + 1
+        self.pending_stacks = []
+        self.pending_frames = []
+        self.count_deltas = {}
+    
+    def get_id(self, frames):
+        """frames 为 (ip, symbol_id, dso_id) 元组, 按 level 从 0 开始排列"""
+        stack_id = self.ids.get(frames)
+        if stack_id is None:
+            stack_id = self.next_id
+            self.next_id += 1
+            self.ids[frames] = stack_id
+            self.pending_stacks.append((stack_id, len(frames)))
+            self.pending_frames.extend(
+                (stack_id, level, ip, symbol_id, dso_id)
+                for level, (ip, symbol_id, dso_id) in enumerate(frames)
+            )
+        self.count_deltas[stack_id] = self.count_deltas.get(stack_id, 0) + 1
+        return stack_id
+    
+    def flush(self, cursor):
+        """写入新出现的调用栈并更新样本计数"""
+        cursor.executemany('INSERT INTO stacks (id, depth) VALUES (?, ?)', self.pending_stacks)
+        cursor.executemany('''
+            INSERT INTO stack_frames
+            (stack_id, level, ip, symbol_id, dso_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', self.pending_frames)
+        cursor.executemany('UPDATE stacks SET sample_count = sample_count + ? WHERE id = ?',
+                           [(delta, stack_id) for stack_id, delta in self.count_deltas.items()])
+        self.pending_stacks.clear()
+        self.pending_frames.clear()
+        self.count_deltas.clear()
 
 def parse_perf_script_line(line):
-    """解析 perf script 输出的一行"""
-    original_line = line
-    line = line.strip()
-    if not line or line.startswith('#'):
+    """解析 perf script 输出的一行
+    
+    返回 (行类型, 字段元组):
+      'sample' -> (timestamp, pid, tid, comm, raw_line)
+      'stack'  -> (ip, symbol, dso), ip 为有符号 64 位整数
+    无法识别的行返回 (None, None)。
+    """
+    stripped = line.strip()
+    if not stripped or stripped[0] == '#':
         return None, None
     
     # 检查是否是调用栈行（以空格或制表符开头）
-    if original_line.startswith((' ', '\t')):
+    if line[0] in ' \t':
         # 调用栈行格式: "地址 符号 (dso)"
         # 例如: "    7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-38693.map)"
-        stack_match = re.match(r'([0-9a-fA-F]+)\s+(.+)', line)
-        if stack_match:
-            ip = stack_match.group(1)
-            rest = stack_match.group(2)
-            
-            # 解析符号和 DSO
-            symbol = rest
-            dso = ""
-            if '(' in rest and ')' in rest:
-                parts = rest.rsplit('(', 1)
-                if len(parts) == 2:
-                    symbol = parts[0].strip()
-                    dso = parts[1].rstrip(')').strip()
+        stack_match = STACK_LINE_RE.match(stripped)
+        if stack_match is None:
+            return None, None
+        ip, rest = stack_match.groups()
+        
+        # 内核地址 (0xffff...) 超出有符号范围, 按补码保存, 视图中 printf('%x') 可还原
+        ip = int(ip, 16)
+        if ip >= IP_SIGN_BIT:
+            ip -= IP_RANGE
+        
+        # 解析符号和 DSO
+        symbol, paren, dso = rest.rpartition('(')
+        if paren and ')' in rest:
+            return 'stack', (ip, symbol.strip(), dso.rstrip(')').strip())
+        return 'stack', (ip, rest, '')
+    
+    # 主样本行格式: "comm pid/tid timestamp:"
+    # 例如: "java   38693/38695   18515.710550:"
+    sample_match = SAMPLE_LINE_RE.match(stripped)
+    if sample_match is None:
+        return None, None
+    comm, pid, tid, timestamp = sample_match.groups()
+    return 'sample', (float(timestamp), int(pid), int(tid), comm.strip(), stripped)
+
+def is_perf_data_file(path):
+    """根据文件头判断是否是 perf record 生成的 perf.data"""
+    with open(path, 'rb') as f:
+        return f.read(len(PERF_DATA_MAGIC)) == PERF_DATA_MAGIC
+
+def file_fingerprint(path, offset):
+    """文件前 offset 字节的内容指纹: 长度加上开头和结尾两个数据块的 SHA-1
+    
+    只读取固定大小的数据, 对几十 GB 的文件也能很快算出; 文件被追加时前缀指纹不变。
+    """
+    digest = hashlib.sha1(str(offset).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(offset, FINGERPRINT_BLOCK_SIZE)))
+        tail_start = max(0, offset - FINGERPRINT_BLOCK_SIZE)
+        f.seek(tail_start)
+        digest.update(f.read(offset - tail_start))
+    return digest.hexdigest()
+
+def checkpoint_key(perf_script_file):
+    """断点在 metadata 中的键, 按文件绝对路径区分"""
+    return f"checkpoint:{Path(perf_script_file).resolve()}"
+
+def load_checkpoint(cursor, key):
+    cursor.execute('SELECT value FROM metadata WHERE key = ?', (key,))
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+def save_checkpoint(cursor, key, perf_script_file, offset, line_num):
+    """记录已提交数据对应的文件位置 (总在样本记录边界上)"""
+    checkpoint = {
+        'offset': offset,
+        'line': line_num,
+        'fingerprint': file_fingerprint(perf_script_file, offset),
+    }
+    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                   (key, json.dumps(checkpoint)))
+
+@contextmanager
+def open_perf_script_stream(source, offset=0):
+    """以二进制流的形式打开 perf script 输出
+    
+    source 为 '-' 时读取标准输入; 为 perf.data 时启动 perf script 子进程并读取其标准输出;
+    否则按 perf script 文本文件打开, 并从 offset 处开始读取。管道读取是阻塞的,
+    导入跟不上时 perf script 会在管道写满后自动等待, 不会产生中间文件。
+    """
+    if str(source) == '-':
+        yield sys.stdin.buffer
+        return
+    
+    if not is_perf_data_file(source):
+        with open(source, 'rb') as f:
+            f.seek(offset)
+            yield f
+        return
+    
+    command = ['perf', 'script', '-i', str(source)] + PERF_SCRIPT_ARGS
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        yield process.stdout
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"perf script 退出码 {returncode}")
+
+def read_record_chunks(f, chunk_size=DEFAULT_CHUNK_SIZE):
+    """从二进制文件中按块读取, 每块尽量在样本记录之间的空行处结束
+    
+    攒够 chunk_size 仍找不到空行时 (单条记录很长) 在最后一个换行处切分,
+    下一块开头的栈帧由 parse_chunk 作为 leading_frames 接到上一块的最后一个样本上,
+    缓冲区大小因此受 chunk_size 限制。读到的数据先放在列表中, 切分时一次拼接。
+    文件末尾没有以空行结束的记录 (文件可能仍在写入) 单独作为最后一块。
+    """
+    parts = []
+    size = 0
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        boundary = data.rfind(b'\n\n')
+        if boundary >= 0:
+            end = boundary + 2
+        elif data[:1] == b'\n' and parts and parts[-1].endswith(b'\n'):
+            # 空行跨在两次读取之间
+            end = 1
+        elif size + len(data) >= chunk_size:
+            end = data.rfind(b'\n') + 1
+        else:
+            end = 0
+        
+        if not end:
+            parts.append(data)
+            size += len(data)
+            continue
+        parts.append(data[:end])
+        yield b''.join(parts)
+        parts = [data[end:]] if end < len(data) else []
+        size = len(data) - end
+    if parts:
+        buffer = b''.join(parts)
+        boundary = buffer.rfind(b'\n\n')
+        if 0 <= boundary < len(buffer) - 2:
+            yield buffer[:boundary + 2]
+            buffer = buffer[boundary + 2:]
+        yield buffer
+
+def parse_chunk(chunk, first_line_num):
+    """解析一块 perf script 输出, 可在子进程中执行
+    
+    返回 (leading_frames, records, warnings):
+      leading_frames  块开头出现在任何样本行之前的调用栈帧, 属于上一块的最后一个样本
+      records         [(timestamp, pid, tid, comm, raw_line, frames), ...]
+      warnings        解析失败的行对应的警告信息
+    frames 中每一帧为 (ip, symbol, dso), ip 已转换为整数。
+    整块一次性解码后逐行解析 (逐字段解码 bytes 反而更慢, 见 bench_parse.py)。
+    """
+    leading_frames = []
+    records = []
+    warnings = []
+    frames = leading_frames
+    
+    for line_num, line in enumerate(chunk.decode('utf-8').split('\n'), first_line_num):
+        try:
+            line_type, data = parse_perf_script_line(line)
             
-            return 'stack', {'ip': ip, 'symbol': symbol, 'dso': dso}
-    else:
-        # 主样本行格式: "comm pid/tid timestamp:"
-        # 例如: "java   38693/38695   18515.710550:"
-        sample_match = re.match(r'(.+?)\s+(\d+)/(\d+)\s+([0-9.]+):\s*(.*)$', line)
-        if sample_match:
-            comm = sample_match.group(1).strip()
-            pid = int(sample_match.group(2))
-            tid = int(sample_match.group(3))
-            timestamp = float(sample_match.group(4))
-            event_info = sample_match.group(5).strip() if sample_match.group(5) else ''
+            if line_type == 'stack':
+                frames.append(data)
             
-            return 'sample', {
-                'timestamp': timestamp,
-                'pid': pid,
-                'tid': tid,
-                'comm': comm,
-                'raw_line': line
-            }
+            elif line_type == 'sample':
+                frames = []
+                records.append(data + (frames,))
+        
+        except Exception as e:
+            warnings.append(f"警告: 解析第 {line_num} 行失败: {e}")
+            continue
     
-    return None, None
+    return leading_frames, records, warnings
 
-def import_perf_data(perf_script_file, db_file, program_name, record_seconds):
-    """导入 perf script 数据到 SQLite 数据库"""
+def parse_chunks(chunks, jobs=1, first_line_num=1, first_offset=0):
+    """按原始顺序产出每块的解析结果
+    
+    产出 (end_offset, end_line_num, complete, (leading_frames, records, warnings)),
+    end_offset/end_line_num 为该块之后下一块在文件中的起始字节偏移和行号,
+    complete 表示该块在样本记录边界 (空行) 处结束。
+    jobs > 1 时在进程池中并行解析, 同时在途的块数受限, 内存占用不随文件大小增长。
+    """
+    def numbered(chunks):
+        line_num = first_line_num
+        offset = first_offset
+        for chunk in chunks:
+            end_line_num = line_num + chunk.count(b'\n')
+            end_offset = offset + len(chunk)
+            complete = chunk.endswith(b'\n\n') or not chunk.strip()
+            yield chunk, line_num, end_offset, end_line_num, complete
+            line_num, offset = end_line_num, end_offset
+    
+    if jobs <= 1:
+        for chunk, line_num, end_offset, end_line_num, complete in numbered(chunks):
+            yield end_offset, end_line_num, complete, parse_chunk(chunk, line_num)
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for chunk, line_num, end_offset, end_line_num, complete in numbered(chunks):
+            future = executor.submit(parse_chunk, chunk, line_num)
+            pending.append((end_offset, end_line_num, complete, future))
+            if len(pending) >= jobs * 2:
+                end_offset, end_line_num, complete, future = pending.popleft()
+                yield end_offset, end_line_num, complete, future.result()
+        while pending:
+            end_offset, end_line_num, complete, future = pending.popleft()
+            yield end_offset, end_line_num, complete, future.result()
+
+def import_perf_data(perf_script_file, db_file, program_name, record_seconds,
+                     batch_size=DEFAULT_BATCH_SIZE, bulk=False, jobs=1,
+                     checkpoint_samples=DEFAULT_CHECKPOINT_SAMPLES):
+    """导入 perf script 数据到 SQLite 数据库
+    
+    解析出的行先缓存在内存中, 每攒够 batch_size 个样本就用 executemany
+    批量写入; 样本 id 由导入程序直接分配, 不再依赖逐行插入后的 lastrowid。
+    每个样本的完整帧序列在内存字典中去重, 相同的调用栈只写入一次,
+    样本行只保存 stack_id。
+    jobs > 1 时由多个进程按记录边界分块解析, 解析结果仍由当前进程按原顺序写入,
+    结果与单进程导入完全一致。
+    perf_script_file 可以是 perf script 文本文件、'-' (标准输入) 或 perf.data,
+    数据边读边写, 内存占用与记录时长无关。
+    导入 perf script 文本文件时每 checkpoint_samples 个样本提交一次并记录断点;
+    断点总在完整记录的边界上, 文件末尾未以空行结束的记录留到下次导入。
+    再次导入同一文件会从断点继续, 文件已完整导入时直接返回。
+    导入失败时回滚未提交的数据并关闭连接, 返回 False。
+    bulk 为 True 时使用批量导入参数, 并在数据加载完成后再创建索引。
+    db_file 是旧版结构的数据库时改名为 <db_file>.legacy 保留, 再创建新数据库。
+    """
     
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
     
+    # 旧版表结构无法在原地续写 (call_stacks 是表而不是视图), 保留旧文件后重新创建
+    if is_legacy_schema(cursor):
+        conn.close()
+        legacy_file = Path(f"{db_file}.legacy")
+        Path(db_file).replace(legacy_file)
+        print(f"警告: {db_file} 为旧版结构的数据库, 已改名为 {legacy_file}, 重新创建数据库")
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+    
+    if bulk:
+        apply_bulk_pragmas(cursor)
+    
     # 创建表结构
-    create_database_schema(cursor)
+    create_database_schema(cursor, create_indexes=not bulk)
+    
+    # 只有普通文本文件可以按偏移断点续传
+    resume_key = None
+    resume_offset, resume_line = 0, 1
+    try:
+        resumable = perf_script_file != '-' and not is_perf_data_file(perf_script_file)
+    except OSError as e:
+        print(f"错误: 无法读取文件 {perf_script_file}: {e}")
+        conn.close()
+        return False
+    if resumable:
+        resume_key = checkpoint_key(perf_script_file)
+        checkpoint = load_checkpoint(cursor, resume_key)
+        if checkpoint:
+            file_size = Path(perf_script_file).stat().st_size
+            offset = checkpoint['offset']
+            if file_size < offset or file_fingerprint(perf_script_file, offset) != checkpoint['fingerprint']:
+                print(f"错误: 文件 {perf_script_file} 与数据库中已导入的内容不一致, 请导入到新的数据库")
+                conn.close()
+                return False
+            if file_size == offset:
+                print(f"文件 {perf_script_file} 已完整导入到 {db_file}, 无需重复导入")
+                conn.close()
+                return True
+            resume_offset, resume_line = offset, checkpoint['line']
+            print(f"从断点继续导入: 第 {resume_line} 行 (偏移 {resume_offset} 字节)")
     
     # 插入元数据
     metadata = {
@@ -122,87 +576,187 @@ def import_perf_data(perf_script_file, db_file, program_name, record_seconds):
     
     print(f"正在导入性能数据到数据库: {db_file}")
     
+    symbols = NameDictionary(cursor, 'symbols')
+    dsos = NameDictionary(cursor, 'dsos')
+    stacks = StackDictionary(cursor)
+    
+    # 接着已有数据继续分配样本 id
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM perf_samples')
+    next_sample_id = cursor.fetchone()[0] + 1
+    
     sample_count = 0
     stack_count = 0
-    current_sample_id = None
-    stack_level = 0
+    current_sample = None
+    current_frames = []
+    sample_rows = []
+    
+    def finish_sample():
+        # 样本的调用栈读完后才能确定 stack_id
+        frames = tuple(
+            (ip, symbols.get_id(symbol), dsos.get_id(dso))
+            for ip, symbol, dso in current_frames
+        )
+        stack_id = stacks.get_id(frames) if frames else None
+        sample_rows.append(current_sample + (stack_id,))
+    
+    def flush():
+        symbols.flush(cursor)
+        dsos.flush(cursor)
+        stacks.flush(cursor)
+        cursor.executemany('''
+            INSERT INTO perf_samples
+            (id, timestamp, pid, tid, comm, raw_line, stack_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', sample_rows)
+        sample_rows.clear()
+    
+    start_time = time.perf_counter()
+    
+    position = (resume_offset, resume_line)
+    checkpointed_samples = 0
+    # 最后一块的起始位置、是否以空行结束, 以及它是否从记录边界开始、包含几个样本
+    tail_position = position
+    tail_complete = True
+    tail_at_boundary = True
+    tail_records = 0
     
     try:
-        with open(perf_script_file, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                try:
-                    line_type, data = parse_perf_script_line(line)
-                    
-                    if line_type == 'sample':
-                        # 插入主样本
-                        cursor.execute('''
-                            INSERT INTO perf_samples 
-                            (timestamp, pid, tid, comm, raw_line)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            data['timestamp'], data['pid'], data['tid'],
-                            data['comm'], data['raw_line']
-                        ))
-                        current_sample_id = cursor.lastrowid
-                        sample_count += 1
-                        stack_level = 0
-                        
-                    elif line_type == 'stack' and current_sample_id:
-                        # 插入调用栈
-                        cursor.execute('''
-                            INSERT INTO call_stacks 
-                            (sample_id, level, ip, symbol, dso)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            current_sample_id, stack_level, data['ip'],
-                            data['symbol'], data['dso']
-                        ))
-                        stack_level += 1
-                        stack_count += 1
-                        
-                except Exception as e:
-                    print(f"警告: 解析第 {line_num} 行失败: {e}")
-                    continue
+        with open_perf_script_stream(perf_script_file, resume_offset) as f:
+            chunks = parse_chunks(read_record_chunks(f), jobs, resume_line, resume_offset)
+            for end_offset, end_line, complete, (leading_frames, records, warnings) in chunks:
+                for warning in warnings:
+                    print(warning)
+                
+                if current_sample:
+                    current_frames.extend(leading_frames)
+                    stack_count += len(leading_frames)
+                elif leading_frames:
+                    print(f"警告: 第 {position[1]} 行开始的 {len(leading_frames)} 个调用栈帧"
+                          f"之前没有样本行, 已忽略")
+                
+                # 块起点是样本记录边界 (没有跟在上一块后面的栈帧) 时才能记录断点
+                if (resume_key and not leading_frames
+                        and sample_count - checkpointed_samples >= checkpoint_samples):
+                    if current_sample:
+                        finish_sample()
+                        current_sample = None
+                    flush()
+                    save_checkpoint(cursor, resume_key, perf_script_file, *position)
+                    conn.commit()
+                    checkpointed_samples = sample_count
+                
+                tail_position, tail_complete = position, complete
+                tail_at_boundary, tail_records = not leading_frames, len(records)
+                position = (end_offset, end_line)
+                
+                for timestamp, pid, tid, comm, raw_line, frames in records:
+                    if current_sample:
+                        finish_sample()
+                        if len(sample_rows) >= batch_size:
+                            flush()
+                    current_sample = (next_sample_id, timestamp, pid, tid, comm, raw_line)
+                    current_frames = frames
+                    next_sample_id += 1
+                    sample_count += 1
+                    stack_count += len(frames)
+        
+        if resume_key and not tail_complete:
+            # 文件末尾的记录没有以空行结束, 可能还在写入: 断点记在这条记录之前,
+            # 避免续传时把它剩下的栈帧当作没有样本的孤立帧
+            if current_sample and tail_at_boundary and tail_records == 1:
+                print(f"文件末尾第 {tail_position[1]} 行开始的记录不完整, 留到下次导入")
+                sample_count -= 1
+                stack_count -= len(current_frames)
+                current_sample = None
+                position = tail_position
+            else:
+                print("警告: 文件末尾的记录没有以空行结束, 断点记在文件末尾")
+        if current_sample:
+            finish_sample()
+        flush()
+        if resume_key:
+            save_checkpoint(cursor, resume_key, perf_script_file, *position)
     
     except FileNotFoundError:
         print(f"错误: 文件 {perf_script_file} 不存在")
+        conn.rollback()
+        conn.close()
         return False
     except Exception as e:
         print(f"错误: 导入数据时发生异常: {e}")
+        conn.rollback()
+        conn.close()
         return False
     
+    load_seconds = time.perf_counter() - start_time
+    
+    print("正在生成函数汇总表...")
+    mark_java_symbols(cursor)
+    build_symbol_stats(cursor)
+    
+    if bulk:
+        print("正在创建索引...")
+        create_database_indexes(cursor)
+    
+    print("正在更新查询统计信息...")
+    analyze_database(cursor)
+    
     # 最终提交
     conn.commit()
     
-    # 更新统计信息
-    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)', 
-                   ('sample_count', str(sample_count)))
-    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)', 
-                   ('stack_count', str(stack_count)))
+    elapsed = time.perf_counter() - start_time
+    rows_per_sec = (sample_count + stack_count) / elapsed if elapsed > 0 else 0.0
+    
+    # 更新统计信息 (数据库中的总量, 包含之前导入的部分)
+    cursor.execute('SELECT COUNT(*) FROM perf_samples')
+    total_samples = cursor.fetchone()[0]
+    cursor.execute('SELECT COALESCE(SUM(depth * sample_count), 0), COUNT(*) FROM stacks')
+    total_frames, unique_stacks = cursor.fetchone()
+    
+    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                   ('sample_count', str(total_samples)))
+    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                   ('stack_count', str(total_frames)))
+    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                   ('unique_stack_count', str(unique_stacks)))
+    cursor.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                   ('import_rows_per_sec', f"{rows_per_sec:.0f}"))
     
     conn.commit()
     conn.close()
     
     print(f"数据库导入完成!")
-    print(f"  - 样本数量: {sample_count}")
-    print(f"  - 调用栈记录: {stack_count}")
+    print(f"  - 样本数量: {total_samples} (本次导入 {sample_count})")
+    print(f"  - 调用栈记录: {total_frames} (本次导入 {stack_count})")
+    print(f"  - 去重后调用栈: {unique_stacks}")
+    print(f"  - 导入耗时: {elapsed:.2f} 秒 (数据加载 {load_seconds:.2f} 秒)")
+    print(f"  - 导入吞吐: {rows_per_sec:.0f} 行/秒")
     print(f"  - 数据库文件: {db_file}")
     
     return True
 
 def main():
     parser = argparse.ArgumentParser(description='将 perf script 数据导出到 SQLite 数据库')
-    parser.add_argument('perf_script_file', help='perf script 输出文件路径')
+    parser.add_argument('perf_script_file',
+                        help="perf script 输出文件路径; '-' 表示从标准输入读取; 也可以直接传入 perf.data")
     parser.add_argument('output_dir', help='输出目录')
     parser.add_argument('--program-name', required=True, help='程序名称')
     parser.add_argument('--record-seconds', type=int, default=60, help='采集时间')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'每批写入的样本数 (默认: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--bulk', action='store_true',
+                        help='批量导入模式: 关闭日志和同步写盘, 加载完成后再建索引 (仅用于新数据库)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='并行解析的进程数 (默认: 1)')
+    parser.add_argument('--checkpoint-samples', type=int, default=DEFAULT_CHECKPOINT_SAMPLES,
+                        help=f'每导入多少个样本提交一次并记录断点 (默认: {DEFAULT_CHECKPOINT_SAMPLES})')
     
     args = parser.parse_args()
     
-    perf_script_file = Path(args.perf_script_file)
+    perf_script_file = args.perf_script_file if args.perf_script_file == '-' else Path(args.perf_script_file)
     output_dir = Path(args.output_dir)
     
-    if not perf_script_file.exists():
+    if perf_script_file != '-' and not perf_script_file.exists():
         print(f"错误: 文件 {perf_script_file} 不存在")
         sys.exit(1)
     
@@ -213,7 +767,9 @@ def main():
     db_file = output_dir / f"performance_data.sqlite"
     
     # 导入数据
-    success = import_perf_data(perf_script_file, db_file, args.program_name, args.record_seconds)
+    success = import_perf_data(perf_script_file, db_file, args.program_name, args.record_seconds,
+                               batch_size=args.batch_size, bulk=args.bulk, jobs=args.jobs,
+                               checkpoint_samples=args.checkpoint_samples)
     
     if success:
         print(f"\n数据库文件: {db_file}")
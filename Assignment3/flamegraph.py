@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+火焰图生成模块
+从性能数据库生成折叠栈 (folded stacks) 和 SVG 火焰图, 取代 stackcollapse-perf.pl / flamegraph.pl
+
+折叠栈格式与 stackcollapse-perf.pl --all 相同 (进程名;根函数;...;叶子函数 样本数),
+内核帧带 _[k] 后缀, JIT 帧 (perf-PID.map) 带 _[j] 后缀, 仍可交给 flamegraph.pl 使用。
+差分折叠栈与 difffolded.pl 相同 (折叠栈 之前样本数 之后样本数), 生成红/蓝差分火焰图。
+"""
+
+import argparse
+import re
+import sys
+from html import escape
+from pathlib import Path
+
+# 与 flamegraph.pl 默认值一致的版式参数
+DEFAULT_WIDTH = 1200
+DEFAULT_FONT_SIZE = 12
+FRAME_HEIGHT = 16
+FONT_WIDTH = 0.59
+MIN_WIDTH = 0.1
+X_PAD = 10
+
+FOLDED_LINE_RE = re.compile(r'^(.*)\s+(\d+)$')
+DIFF_FOLDED_LINE_RE = re.compile(r'^(.*)\s+(\d+)\s+(\d+)$')
+ANNOTATION_RE = re.compile(r'_\[[kwij]\]$')
+JAVA_PACKAGE_RE = re.compile(r'^L?(java|javax|jdk|net|org|com|io|sun)/')
+JIT_DSO_RE = re.compile(r'(^|/)perf-\d+\.map$')
+
+def fold_frame_name(symbol, dso):
+    """按 stackcollapse-perf.pl 的规则整理单个帧的名称"""
+    if symbol == '[unknown]' or not symbol:
+        # 符号未知时用 DSO 文件名代替
+        symbol = f"[{dso.rsplit('/', 1)[-1]}]" if dso and dso != '[unknown]' else '[unknown]'
+    else:
+        # ';' 是折叠栈的分隔符; 去掉 C++ 参数列表
+        symbol = symbol.replace(';', ':')
+        if not re.search(r'\.\(.*\)\.', symbol):
+            symbol = re.sub(r'\((?!anonymous namespace\)).*', '', symbol)
+    
+    if dso and ('kernel.kallsyms' in dso or dso.startswith('[kernel')):
+        return symbol + '_[k]'
+    if dso and JIT_DSO_RE.search(dso):
+        return symbol + '_[j]'
+    return symbol
+
+def load_folded_frames(cursor):
+    """读取所有去重后的调用栈, 返回 {stack_id: '根;...;叶子'}"""
+    cursor.execute('''
+        SELECT f.stack_id, s.name, d.name
+        FROM stack_frames f
+        JOIN symbols s ON s.id = f.symbol_id
+        JOIN dsos d ON d.id = f.dso_id
+        ORDER BY f.stack_id, f.level DESC
+    ''')
+    
+    frames = {}
+    for stack_id, symbol, dso in cursor:
+        name = fold_frame_name(symbol, dso)
+        if stack_id in frames:
+            frames[stack_id].append(name)
+        else:
+            frames[stack_id] = [name]
+    return {stack_id: ';'.join(names) for stack_id, names in frames.items()}
+
+def folded_stacks(cursor, where='', params=()):
+    """按 (进程名, 调用栈) 统计样本数, 返回按字典序排列的 [(折叠栈, 样本数)]
+    
+    where/params 为作用于 perf_samples 的过滤条件 (可为空)。
+    """
+    cursor.execute(f'''
+        SELECT comm, stack_id, COUNT(*)
+        FROM perf_samples
+        {'WHERE ' + where if where else ''}
+        GROUP BY comm, stack_id
+    ''', params)
+    groups = cursor.fetchall()
+    
+    stack_frames = load_folded_frames(cursor) if groups else {}
+    
+    counts = {}
+    for comm, stack_id, count in groups:
+        key = comm.replace(' ', '_')
+        if stack_id is not None and stack_id in stack_frames:
+            key = f"{key};{stack_frames[stack_id]}"
+        counts[key] = counts.get(key, 0) + count
+    
+    return sorted(counts.items())
+
+def diff_folded(before, after, normalize=True):
+    """合并两份折叠栈为差分折叠栈 [(折叠栈, 之前样本数, 之后样本数)], 按字典序排列
+    
+    normalize 为 True 时把"之前"的样本数按两份的总样本数之比缩放 (同 difffolded.pl -n),
+    采样时长或频率不同的两次采集也能直接比较各调用栈的占比。
+    """
+    before = dict(before)
+    after = dict(after)
+    before_total = sum(before.values())
+    after_total = sum(after.values())
+    scale = after_total / before_total if normalize and before_total and after_total else 1.0
+    
+    return [(stack, int(before.get(stack, 0) * scale + 0.5), after.get(stack, 0))
+            for stack in sorted(before.keys() | after.keys())]
+
+def write_folded(folded, output_file):
+    """写出折叠栈文件 (差分折叠栈每行两个样本数)"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for stack, *counts in folded:
+            f.write(f"{stack} {' '.join(map(str, counts))}\n")
+
+def read_folded(input_file):
+    """读取折叠栈文件, 行尾有两个样本数时按差分折叠栈读取"""
+    folded = []
+    with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            match = DIFF_FOLDED_LINE_RE.match(line)
+            if match:
+                folded.append((match.group(1), int(match.group(2)), int(match.group(3))))
+                continue
+            match = FOLDED_LINE_RE.match(line)
+            if match:
+                folded.append((match.group(1), int(match.group(2))))
+    return folded
+
+def build_tree(folded):
+    """把折叠栈合并成调用树, 节点为 [样本数, {子函数名: 节点}, 样本数变化]
+    
+    差分折叠栈按"之后"的样本数计算宽度, 变化为 之后 - 之前; 普通折叠栈的变化恒为 0。
+    """
+    root = [0, {}, 0]
+    for stack, *counts in folded:
+        count = counts[-1]
+        delta = counts[-1] - counts[0]
+        root[0] += count
+        root[2] += delta
+        node = root
+        for name in stack.split(';'):
+            children = node[1]
+            if name not in children:
+                children[name] = [0, {}, 0]
+            node = children[name]
+            node[0] += count
+            node[2] += delta
+    return root
+
+def name_hash(name):
+    """flamegraph.pl --hash 的颜色散列: 名称相同的函数颜色相同"""
+    vector = 0.0
+    weight = 1.0
+    max_value = 1.0
+    mod = 10
+    name = re.sub(r'.(.*?)`', '', name, count=1)
+    for c in name:
+        i = ord(c) % mod
+        vector += (i / (mod - 1)) * weight
+        mod += 1
+        max_value += weight
+        weight *= 0.70
+        if mod > 12:
+            break
+    return 1 - vector / max_value
+
+def frame_color(name):
+    """flamegraph.pl --color=java 配色: JIT/Java 绿色, C++ 黄色, 内核橙色, 其余红色"""
+    if name.endswith('_[j]') or JAVA_PACKAGE_RE.match(name) or ':::' in name:
+        palette = 'green'
+    elif name.endswith('_[i]'):
+        palette = 'aqua'
+    elif name.endswith('_[k]'):
+        palette = 'orange'
+    elif '::' in name:
+        palette = 'yellow'
+    else:
+        palette = 'red'
+    
+    v = name_hash(name)
+    if palette == 'green':
+        r, g, b = 50 + 60 * v, 200 + 55 * v, 50 + 60 * v
+    elif palette == 'aqua':
+        r, g, b = 50 + 60 * v, 165 + 55 * v, 165 + 55 * v
+    elif palette == 'orange':
+        r, g, b = 190 + 65 * v, 90 + 65 * v, 0
+    elif palette == 'yellow':
+        r, g, b = 175 + 55 * v, 175 + 55 * v, 50 + 20 * v
+    else:
+        r, g, b = 200 + 55 * v, 50 + 80 * v, 50 + 80 * v
+    return f"rgb({int(r)},{int(g)},{int(b)})"
+
+def diff_color(delta, max_delta):
+    """flamegraph.pl 差分配色: 样本增加为红色, 减少为蓝色, 颜色深浅与变化量成正比"""
+    if delta == 0 or not max_delta:
+        return 'rgb(250,250,250)'
+    shade = int(210 * (max_delta - abs(delta)) / max_delta + 0.5)
+    if delta > 0:
+        return f"rgb(255,{shade},{shade})"
+    return f"rgb({shade},{shade},255)"
+
+def render_flamegraph(folded, title='Flame Graph', subtitle='', width=DEFAULT_WIDTH,
+                      font_size=DEFAULT_FONT_SIZE):
+    """根据折叠栈生成 SVG 火焰图文本, 差分折叠栈生成红/蓝差分火焰图"""
+    differential = bool(folded) and len(folded[0]) == 3
+    tree = build_tree(folded)
+    total = tree[0]
+    
+    # 收集每个帧的 (深度, 起始样本偏移, 样本数, 名称, 样本数变化), 子节点按名称排序
+    frames = []
+    stack = [(tree, 'all', 0, 0)]
+    max_depth = 0
+    while stack:
+        (count, children, delta), name, depth, offset = stack.pop()
+        frames.append((depth, offset, count, name, delta))
+        max_depth = max(max_depth, depth)
+        child_offset = offset
+        pending = []
+        for child_name in sorted(children):
+            child = children[child_name]
+            pending.append((child, child_name, depth + 1, child_offset))
+            child_offset += child[0]
+        stack.extend(reversed(pending))
+    
+    max_delta = max((abs(frame[4]) for frame in frames[1:]), default=0)
+    
+    y_pad_top = font_size * 3 + (font_size * 2 if subtitle else 0)
+    y_pad_bottom = font_size * 2 + 10
+    height = (max_depth + 1) * FRAME_HEIGHT + y_pad_top + y_pad_bottom
+    width_per_sample = (width - 2 * X_PAD) / total if total else 0
+    
+    lines = [
+        '<?xml version="1.0" standalone="no"?>',
+        f'<svg version="1.1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">',
+        '<defs><linearGradient id="background" y1="0" y2="1" x1="0" x2="0">'
+        '<stop stop-color="#eeeeee" offset="5%"/><stop stop-color="#eeeeb0" offset="95%"/>'
+        '</linearGradient></defs>',
+        f'<style type="text/css">text {{ font-family: Verdana; font-size: {font_size}px; fill: rgb(0,0,0); }}</style>',
+        f'<rect x="0" y="0" width="{width}" height="{height}" fill="url(#background)"/>',
+        f'<text x="{width / 2:.2f}" y="{font_size * 2}" text-anchor="middle" '
+        f'style="font-size: {font_size + 5}px">{escape(title)}</text>',
+    ]
+    if subtitle:
+        lines.append(f'<text x="{width / 2:.2f}" y="{font_size * 4}" text-anchor="middle" '
+                     f'style="fill: rgb(160,160,160)">{escape(subtitle)}</text>')
+    
+    for depth, offset, count, name, delta in frames:
+        frame_width = count * width_per_sample
+        if frame_width < MIN_WIDTH:
+            continue
+        x = X_PAD + offset * width_per_sample
+        y = height - y_pad_bottom - (depth + 1) * FRAME_HEIGHT
+        label = ANNOTATION_RE.sub('', name)
+        percent = count * 100.0 / total
+        if depth == 0:
+            color = 'rgb(240,240,240)'
+        elif differential:
+            color = diff_color(delta, max_delta)
+        else:
+            color = frame_color(name)
+        
+        info = f"{count} samples, {percent:.2f}%"
+        if differential:
+            info += f"; {delta:+d} samples"
+        lines.append('<g>')
+        lines.append(f'<title>{escape(label)} ({info})</title>')
+        lines.append(f'<rect x="{x:.1f}" y="{y}" width="{frame_width:.1f}" '
+                     f'height="{FRAME_HEIGHT - 1}" fill="{color}" rx="2" ry="2"/>')
+        
+        # 按可用宽度截断显示的名称
+        chars = int(frame_width / (font_size * FONT_WIDTH))
+        if chars >= 3:
+            text = label if len(label) <= chars else label[:chars - 2] + '..'
+            lines.append(f'<text x="{x + 3:.2f}" y="{y + FRAME_HEIGHT / 2 + font_size / 3:.1f}">'
+                         f'{escape(text)}</text>')
+        lines.append('</g>')
+    
+    lines.append('</svg>')
+    return '\n'.join(lines) + '\n'
+
+def write_flamegraph(folded, output_file, **options):
+    """写出 SVG 火焰图"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(render_flamegraph(folded, **options))
+
+def main():
+    parser = argparse.ArgumentParser(description='根据折叠栈文件生成 SVG 火焰图')
+    parser.add_argument('folded_file', help='折叠栈文件 (stackcollapse 格式, 或 difffolded 格式的差分折叠栈)')
+    parser.add_argument('output_svg', help='输出的 SVG 文件')
+    parser.add_argument('--title', default='Flame Graph', help='标题')
+    parser.add_argument('--subtitle', default='', help='副标题')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help=f'图像宽度 (默认: {DEFAULT_WIDTH})')
+    parser.add_argument('--fontsize', type=int, default=DEFAULT_FONT_SIZE,
+                        help=f'字体大小 (默认: {DEFAULT_FONT_SIZE})')
+    args = parser.parse_args()
+    
+    folded_file = Path(args.folded_file)
+    if not folded_file.exists():
+        print(f"错误: 文件 {folded_file} 不存在")
+        sys.exit(1)
+    
+    write_flamegraph(read_folded(folded_file), args.output_svg, title=args.title,
+                     subtitle=args.subtitle, width=args.width, font_size=args.fontsize)
+    print(f"火焰图已生成: {args.output_svg}")
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,6 @@
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PERF_MAP_AGENT_DIR="$SCRIPT_DIR/perf-map-agent"
-FLAMEGRAPH_DIR="$SCRIPT_DIR/FlameGraph"
 WORK_DIR="$SCRIPT_DIR/flamegraph_work"
 SPECJVM_DIR="/home/miller/zju/sp_camp/SPEC/SPECjvm2008"
 OUTPUT_DIR="$SCRIPT_DIR/output"
@@ -112,7 +111,7 @@ echo "启动火焰图生成 - $PROGRAM_NAME"
 echo "采集时间: ${PERF_RECORD_SECONDS}秒"
 
 # 检查依赖
-[ ! -x "$FLAMEGRAPH_DIR/stackcollapse-perf.pl" ] && { echo "错误: FlameGraph 未找到"; exit 1; }
+command -v python3 >/dev/null || { echo "错误: python3 未安装"; exit 1; }
 [ ! -f "$PERF_MAP_AGENT_DIR/out/attach-main.jar" ] && { echo "错误: perf-map-agent 未找到"; exit 1; }
 command -v perf >/dev/null || { echo "错误: perf 工具未安装"; exit 1; }
 
@@ -175,7 +174,7 @@ echo "程序已启动，PID: $JAVA_PID"
 echo "开始性能采样 ($PERF_RECORD_SECONDS 秒)..."
 
 # 文件路径
-STACKS="$PROGRAM_WORK_DIR/out-$JAVA_PID.stacks"
+FOLDED="$PROGRAM_WORK_DIR/out-$JAVA_PID.folded"
 PERF_MAP_FILE="/tmp/perf-$JAVA_PID.map"
 ATTACH_JAR="$PERF_MAP_AGENT_DIR/out/attach-main.jar"
 
@@ -206,45 +205,35 @@ sudo rm -f "$PERF_MAP_FILE"
  net.virtualvoid.perf.AttachOnce $JAVA_PID)
 sudo chown root:root "$PERF_MAP_FILE" 2>/dev/null || true
 
-# 3. 生成堆栈信息
+# 3. 导出数据库
+# perf script 的输出直接流入数据库导入, 不再落地中间文件
 echo "处理性能数据..."
+DB_FILE="$PROGRAM_WORK_DIR/performance_data.sqlite"
 sudo perf script -i "$PERF_DATA_FILE" \
     --show-kernel-path \
     --kallsyms=/proc/kallsyms \
-    --fields comm,pid,tid,time,ip,sym,dso \
-    > "$STACKS"
-
-# 4. 生成火焰图
+    --fields comm,pid,tid,time,ip,sym,dso | \
+python3 "$SCRIPT_DIR/export_to_database.py" \
+    - \
+    "$PROGRAM_WORK_DIR" \
+    --program-name "$PROGRAM_NAME" \
+    --record-seconds "$PERF_RECORD_SECONDS" || { echo "数据库导出失败，请检查错误信息"; cleanup; exit 1; }
+echo "数据库导出成功: $DB_FILE"
+
+# 4. 从数据库生成折叠栈和火焰图
 echo "生成火焰图..."
-"$FLAMEGRAPH_DIR/stackcollapse-perf.pl" "$STACKS" | \
-"$FLAMEGRAPH_DIR/flamegraph.pl" \
-    --color=java \
-    --title="$PROGRAM_NAME - Performance Profile" \
-    --subtitle="Java Performance Analysis Flame Graph, Sample Time: ${PERF_RECORD_SECONDS}s" \
-    --width=1400 \
-    --fontsize=10 \
-    --hash \
-    > "$PERF_FLAME_OUTPUT"
+python3 "$SCRIPT_DIR/analyze_database.py" \
+    --folded "$FOLDED" \
+    --flamegraph "$PERF_FLAME_OUTPUT" \
+    --title "$PROGRAM_NAME - Performance Profile" \
+    --subtitle "Java Performance Analysis Flame Graph, Sample Time: ${PERF_RECORD_SECONDS}s" \
+    --width 1400 \
+    --fontsize 10 \
+    "$DB_FILE"
 
 echo "火焰图已生成: $PERF_FLAME_OUTPUT"
 
-# 5. 导出数据库
-if command -v python3 >/dev/null 2>&1 && [ -f "$SCRIPT_DIR/export_to_database.py" ]; then
-    echo "导出性能数据到数据库..."
-    if python3 "$SCRIPT_DIR/export_to_database.py" \
-        "$STACKS" \
-        "$PROGRAM_WORK_DIR" \
-        --program-name "$PROGRAM_NAME" \
-        --record-seconds "$PERF_RECORD_SECONDS"; then
-        echo "数据库导出成功: $PROGRAM_WORK_DIR/performance_data.sqlite"
-    else
-        echo "数据库导出失败，请检查错误信息"
-    fi
-else
-    echo "跳过数据库导出: 缺少 python3 或 export_to_database.py"
-fi
-
-# 6. 清理临时文件
+# 5. 清理临时文件
 echo "清理临时文件..."
 sudo rm -f "$PERF_DATA_FILE"
 echo "清理完成"
@@ -252,9 +241,8 @@ echo "清理完成"
 echo ""
 echo "生成的文件:"
 echo "  火焰图: $PERF_FLAME_OUTPUT"
-if [ -f "$PROGRAM_WORK_DIR/performance_data.sqlite" ]; then
-    echo "  数据库: $PROGRAM_WORK_DIR/performance_data.sqlite"
-fi
+echo "  折叠栈: $FOLDED"
+echo "  数据库: $DB_FILE"
 
 # 主动终止Java程序
 if [ -n "$JAVA_PID" ] && kill -0 "$JAVA_PID" 2>/dev/null; then
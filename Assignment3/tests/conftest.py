@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""测试直接导入 Assignment3 目录下的模块"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""columnar.py: 列式导出与 Arrow IPC 文件"""
+
+import argparse
+import sqlite3
+
+import numpy as np
+import pytest
+
+import analyze_database
+from columnar import export_columnar, hotspots, load_columnar, process_info, time_mask
+from export_to_database import import_perf_data
+
+PERF_SCRIPT_TEXT = (
+    "java 100/101   1.000000: \n"
+    "\t    7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)\n"
+    "\t    7f001234567b JavaCalls::call_helper (/usr/lib/jvm/lib/server/libjvm.so)\n"
+    "\n"
+    "VM Thread 100/130   1.100000: \n"
+    "\t    ffffffff8aec0001 schedule ([kernel.kallsyms])\n"
+    "\n"
+    "java 100/101   1.200000: \n"
+    "\t    7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)\n"
+    "\t    7f001234567b JavaCalls::call_helper (/usr/lib/jvm/lib/server/libjvm.so)\n"
+    "\n"
+)
+
+@pytest.fixture
+def database(tmp_path):
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_text(PERF_SCRIPT_TEXT)
+    db_file = tmp_path / 'performance_data.sqlite'
+    assert import_perf_data(perf_script_file, db_file, 'test', 1)
+    return db_file
+
+def test_export_columnar(database, tmp_path):
+    assert export_columnar(database, tmp_path / 'columnar') == (3, 2, 3)
+    profile = load_columnar(tmp_path / 'columnar')
+    assert list(profile['samples_tid']) == [101, 130, 101]
+    assert profile['samples_stack'][0] == profile['samples_stack'][2]
+    assert list(np.diff(profile['stack_offsets'])) == [2, 1]
+    assert [profile['symbols'][i] for i in profile['frame_symbol'][:2]] == [
+        'LTestFibonacci;::fibonacci', 'JavaCalls::call_helper']
+
+def test_write_arrow(database, tmp_path):
+    pytest.importorskip('pyarrow')
+    from columnar import load_arrow
+    
+    output_dir = tmp_path / 'columnar'
+    export_columnar(database, output_dir, arrow=True)
+    profile = load_columnar(output_dir)
+    samples, stacks = load_arrow(output_dir)
+    
+    assert samples.num_rows == 3
+    for name in ('timestamp', 'pid', 'tid', 'comm', 'stack'):
+        assert samples.column(name).to_pylist() == profile[f'samples_{name}'].tolist()
+    
+    # 每个调用栈一行, list 列的偏移与 stack_offsets 相同
+    assert stacks.num_rows == 2
+    offsets = profile['stack_offsets']
+    for name in ('symbol', 'dso', 'ip'):
+        expected = [profile[f'frame_{name}'][start:end].tolist() for start, end in zip(offsets[:-1], offsets[1:])]
+        assert stacks.column(f'frame_{name}').to_pylist() == expected
+
+def report_perf_script(sample_count):
+    """线程和调用栈分布不均匀的 perf script 文本, 各函数的样本数互不相同"""
+    frames = [
+        '7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)',
+        '7a21092cc002 LTestFibonacci;::performMatrixMultiplication (/tmp/perf-1.map)',
+        '7f001234567b JavaCalls::call_helper (/usr/lib/jvm/lib/server/libjvm.so)',
+        'ffffffff8aec0001 schedule ([kernel.kallsyms])',
+        '3 [unknown] ([unknown])',
+        '7f00aa000000 start_thread (/usr/lib/libc.so.6)',
+    ]
+    threads = [('java', 101)] * 4 + [('java', 102)] * 3 + [('VM Thread', 130)] * 2 + [('C2 CompilerThre', 110)]
+    lines = []
+    for index in range(sample_count):
+        comm, tid = threads[index % len(threads)]
+        lines.append(f"{comm} 100/{tid}   {1 + index / 1000:.6f}: ")
+        # 递归帧使同一函数在一个调用栈中出现多次
+        for level in range(index % 5):
+            lines.append(f"\t    {frames[(index // 3 + level * level) % len(frames)]}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def sql_reports(db_file, start=None, end=None, monkeypatch=None):
+    """按 analyze_database.py 的流程生成进程信息和热点函数, 返回打印前的结果行"""
+    captured = {}
+    monkeypatch.setattr(analyze_database, 'print_process_info', lambda rows: captured.update(process=rows))
+    monkeypatch.setattr(analyze_database, 'print_hotspots', lambda rows, total: captured.update(hotspots=rows))
+    args = argparse.Namespace(pid=None, tid=None, comm=None, start=start, end=end)
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    where, params = analyze_database.sample_filter(cursor, args)
+    analyze_database.analyze_process_info(cursor, where, params)
+    total_samples = analyze_database.get_total_samples(cursor, where, params)
+    analyze_database.analyze_hotspots(cursor, analyze_database.symbol_stats_source(cursor, where),
+                                      total_samples, params)
+    conn.close()
+    return captured['process'], captured['hotspots']
+
+@pytest.mark.parametrize('start, end', [(None, None), (0.1, 0.3), (0.25, None), (None, 0.05)])
+def test_vectorized_reports_match_sql(tmp_path, monkeypatch, start, end):
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_text(report_perf_script(403))
+    db_file = tmp_path / 'performance_data.sqlite'
+    assert import_perf_data(perf_script_file, db_file, 'test', 1)
+    export_columnar(db_file, tmp_path / 'columnar')
+    
+    profile = load_columnar(tmp_path / 'columnar')
+    mask = time_mask(profile, start, end)
+    sql_process, sql_hotspots = sql_reports(db_file, start, end, monkeypatch)
+    
+    assert process_info(profile, mask) == [tuple(row) for row in sql_process]
+    
+    # 自身样本和累计样本都相同的函数在 SQL 中的先后顺序不确定, 只比较排序键和结果集合
+    rows = hotspots(profile, mask)
+    sql_rows = [tuple(row) for row in sql_hotspots]
+    assert [row[2:] for row in rows] == [row[2:] for row in sql_rows]
+    assert sorted(rows) == sorted(sql_rows)
+    assert len(rows) == 5
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""export_to_database.py: 分块读取、解析与断点续传"""
+
+import io
+import sqlite3
+from functools import partial
+
+import export_to_database
+
+from export_to_database import import_perf_data, parse_chunk, read_record_chunks
+
+SAMPLE_TEXT = (
+    "java 100/101   1.000000: \n"
+    "\t    7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)\n"
+    "\t    7f001234567b JavaCalls::call_helper (/usr/lib/jvm/lib/server/libjvm.so)\n"
+    "\n"
+    "VM Thread 100/130   1.100000: \n"
+    "\t    ffffffff8aec0001 schedule ([kernel.kallsyms])\n"
+    "\n"
+)
+
+def parse_all(chunks):
+    """按导入时的方式把各块的 leading_frames 接到上一块的最后一个样本上"""
+    records = []
+    line_num = 1
+    for chunk in chunks:
+        leading_frames, chunk_records, warnings = parse_chunk(chunk, line_num)
+        assert warnings == []
+        if records:
+            records[-1][-1].extend(leading_frames)
+        else:
+            assert leading_frames == []
+        records.extend(chunk_records)
+        line_num += chunk.count(b'\n')
+    return records
+
+def test_chunks_end_at_record_boundaries():
+    data = SAMPLE_TEXT.encode() * 20
+    chunks = list(read_record_chunks(io.BytesIO(data), chunk_size=500))
+    assert len(chunks) > 1
+    assert b''.join(chunks) == data
+    assert all(chunk.endswith(b'\n\n') for chunk in chunks)
+
+def test_long_record_is_split_at_line_end():
+    frame = "\t    7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)\n"
+    data = ("java 100/101   1.000000: \n" + frame * 1000 + "\n").encode() + SAMPLE_TEXT.encode()
+    chunk_size = 1024
+    chunks = list(read_record_chunks(io.BytesIO(data), chunk_size=chunk_size))
+    assert b''.join(chunks) == data
+    # 没有空行时缓冲区不会无限增长
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) <= 2 * chunk_size
+    assert parse_all(chunks) == parse_all([data])
+    assert len(parse_all(chunks)[0][-1]) == 1000
+
+def sample_rows(db_file):
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('''
+        SELECT p.timestamp, p.tid, group_concat(s.name, ';')
+        FROM perf_samples p
+        LEFT JOIN stack_frames f ON f.stack_id = p.stack_id
+        LEFT JOIN symbols s ON s.id = f.symbol_id
+        GROUP BY p.id ORDER BY p.id
+    ''').fetchall()
+    conn.close()
+    return rows
+
+def test_resume_after_truncated_record(tmp_path):
+    data = SAMPLE_TEXT.encode() * 3
+    # 在第三个记录的栈帧中间截断, 模拟仍在写入的文件
+    cut = data.rindex(b'LTestFibonacci')
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_bytes(data[:cut])
+    
+    db_file = tmp_path / 'resume.db'
+    assert import_perf_data(perf_script_file, db_file, 'test', 1, checkpoint_samples=1)
+    assert len(sample_rows(db_file)) == 4
+    
+    perf_script_file.write_bytes(data)
+    assert import_perf_data(perf_script_file, db_file, 'test', 1, checkpoint_samples=1)
+    
+    whole_file = tmp_path / 'whole.txt'
+    whole_file.write_bytes(data)
+    assert import_perf_data(whole_file, tmp_path / 'whole.db', 'test', 1)
+    assert sample_rows(db_file) == sample_rows(tmp_path / 'whole.db')
+
+def test_orphan_frames_are_reported(tmp_path, capsys):
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_text("\t    ffffffff8aec0001 schedule ([kernel.kallsyms])\n\n" + SAMPLE_TEXT)
+    assert import_perf_data(perf_script_file, tmp_path / 'orphan.db', 'test', 1)
+    assert '之前没有样本行' in capsys.readouterr().out
+    assert len(sample_rows(tmp_path / 'orphan.db')) == 2
+
+def test_missing_file_returns_false(tmp_path):
+    assert not import_perf_data(tmp_path / 'missing.txt', tmp_path / 'missing.db', 'test', 1)
+
+# 旧版导入程序 (call_stacks 为普通表) 的表结构
+LEGACY_SCHEMA = '''
+    CREATE TABLE perf_samples (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp REAL NOT NULL,
+        pid INTEGER NOT NULL,
+        tid INTEGER NOT NULL,
+        comm TEXT NOT NULL,
+        raw_line TEXT
+    );
+    CREATE TABLE call_stacks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sample_id INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        ip TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        dso TEXT,
+        FOREIGN KEY (sample_id) REFERENCES perf_samples (id)
+    );
+    CREATE TABLE metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    INSERT INTO perf_samples VALUES (1, 0.5, 1, 1, 'old', 'old 1/1 0.5:');
+    INSERT INTO call_stacks VALUES (1, 1, 0, '1', 'old_symbol', 'old.so');
+'''
+
+def test_import_into_legacy_database(tmp_path, capsys):
+    db_file = tmp_path / 'performance_data.sqlite'
+    conn = sqlite3.connect(db_file)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_text(SAMPLE_TEXT)
+    assert import_perf_data(perf_script_file, db_file, 'test', 1)
+    assert '旧版结构' in capsys.readouterr().out
+    
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'call_stacks'").fetchone() == ('view',)
+    assert conn.execute('SELECT COUNT(*) FROM call_stacks').fetchone() == (3,)
+    conn.close()
+    assert len(sample_rows(db_file)) == 2
+    
+    # 旧数据库原样保留
+    legacy = sqlite3.connect(tmp_path / 'performance_data.sqlite.legacy')
+    assert legacy.execute('SELECT symbol FROM call_stacks').fetchall() == [('old_symbol',)]
+    legacy.close()
+
+def synthetic_perf_script(sample_count):
+    """生成不同线程、不同深度调用栈的 perf script 文本"""
+    symbols = [
+        '7a21092cb793 LTestFibonacci;::fibonacci (/tmp/perf-1.map)',
+        '7f001234567b JavaCalls::call_helper (/usr/lib/jvm/lib/server/libjvm.so)',
+        'ffffffff8aec0001 schedule ([kernel.kallsyms])',
+        '7f00aa000000 start_thread (/usr/lib/libc.so.6)',
+    ]
+    threads = [('java', 101), ('VM Thread', 130), ('C2 CompilerThre', 110)]
+    lines = []
+    for index in range(sample_count):
+        comm, tid = threads[index % len(threads)]
+        lines.append(f"{comm} 100/{tid}   {1 + index / 1000:.6f}: ")
+        for level in range(index % 7):
+            lines.append(f"\t    {symbols[(index + level) % len(symbols)]}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def table_contents(db_file):
+    conn = sqlite3.connect(db_file)
+    contents = {
+        table: conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+        for table in ('perf_samples', 'call_stacks', 'symbol_stats', 'stacks', 'symbols', 'dsos')
+    }
+    conn.close()
+    return contents
+
+def test_parallel_import_matches_serial(tmp_path, monkeypatch):
+    perf_script_file = tmp_path / 'perf_script.txt'
+    perf_script_file.write_text(synthetic_perf_script(500))
+    assert import_perf_data(perf_script_file, tmp_path / 'serial.db', 'test', 1)
+    
+    # 小块使记录跨块切分, 让多个块在进程池中并行解析
+    monkeypatch.setattr(export_to_database, 'read_record_chunks', partial(read_record_chunks, chunk_size=256))
+    assert import_perf_data(perf_script_file, tmp_path / 'parallel.db', 'test', 1, jobs=2, batch_size=7)
+    
+    serial = table_contents(tmp_path / 'serial.db')
+    assert len(serial['perf_samples']) == 500
+    assert serial == table_contents(tmp_path / 'parallel.db')